@@ -2,9 +2,35 @@ import os
 import requests
 import json
 import sys
-from flask import Flask, render_template, request, jsonify
-from src.pipeline.predict_pipeline import get_rag_response
-from src.components.model_trainer import load_vector_store
+import time
+from flask import Flask, Response, render_template, request, jsonify, stream_with_context
+from src.pipeline.predict_pipeline import build_prompt, describe_sources, get_rag_response
+from src.pipeline.batch_pipeline import answer_questions, parse_question, read_questions
+from src.components.model_trainer import MODEL_NAME, load_sharded_vector_store, get_embedding_function
+from src.components.index_export import ExportedIndex, get_exported_index_dir
+from src.components.index_manifest import get_index_version, get_manifest_path, load_manifest
+from src.components.lexical_index import LexicalIndex, get_lexical_index_dir
+from src.components.sharding import (
+    DEFAULT_SHARD,
+    ShardedLexicalIndex,
+    get_manifest_shards,
+    get_shard_lexical_index_dir,
+    normalize_shard_name,
+)
+from src.components.reranker import CrossEncoderReranker, DEFAULT_RERANK_MODEL
+from src.components.response_cache import ResponseCache, get_cache_scope
+from src.components.document_attributes import build_metadata_filter
+from src.components.metrics import (
+    CACHE_LOOKUPS,
+    ERRORS,
+    finish_trace,
+    format_server_timing,
+    record_stage,
+    render_metrics,
+    start_trace,
+    trace_stage,
+)
+from src.components.llm_client import GeminiClient, MalformedResponseError, DEFAULT_BASE_URL, DEFAULT_MODEL
 from src.exception import CustomException
 from src.logger import get_logger
 from dotenv import load_dotenv
@@ -21,112 +47,499 @@ logger = get_logger(__name__)
 # Load the vector store once when the application starts
 # This is an efficient way to avoid re-loading the database for every request
 current_dir = os.path.dirname(os.path.abspath(__file__))
-persist_dir = os.path.join(current_dir, 'db')
+persist_dir = os.getenv("PERSIST_DIR", os.path.join(current_dir, 'db'))
 vector_store = None
+embeddings = None
+lexical_index = None
+reranker = None
+# The shards train_pipeline split the index into; just the default one when it is not sharded
+shards = [DEFAULT_SHARD]
+
+# In production mode (see gunicorn.conf.py) the models and indexes are loaded
+# before the server forks its workers, and each worker only opens the vector store
+SERVING_MODE = os.getenv("SERVING_MODE", "development")
+
+# Serve queries from the read-only exported index instead of ChromaDB
+# (see src/components/index_export.py)
+VECTOR_INDEX = os.getenv("VECTOR_INDEX", "chroma").lower()
+EXPORTED_INDEX_DIR = os.getenv("EXPORTED_INDEX_DIR", get_exported_index_dir(persist_dir))
+EXPORTED_INDEX_NPROBE = int(os.getenv("EXPORTED_INDEX_NPROBE", "8"))
+
+# Optional cross-encoder reranking of a larger candidate set
+RERANK_ENABLED = os.getenv("RERANK_ENABLED", "false").lower() in ("1", "true", "yes")
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "40"))
+
+# Queries of concurrent requests are embedded together: a query waits up to
+# QUERY_BATCH_WAIT_MS for others, in batches of at most QUERY_BATCH_SIZE (1 turns batching off)
+QUERY_BATCH_SIZE = int(os.getenv("QUERY_BATCH_SIZE", "16"))
+QUERY_BATCH_WAIT_MS = float(os.getenv("QUERY_BATCH_WAIT_MS", "2"))
+
+# /chat/batch limits: questions per request, LLM calls in flight and started per minute (0 for no limit)
+BATCH_MAX_QUESTIONS = int(os.getenv("BATCH_MAX_QUESTIONS", "1000"))
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "4"))
+BATCH_REQUESTS_PER_MINUTE = float(os.getenv("BATCH_REQUESTS_PER_MINUTE", "0"))
+
+# Answers to repeated and near-duplicate questions are served from memory
+# until they expire or the vector store is rebuilt
+response_cache = ResponseCache(
+    max_entries=int(os.getenv("RESPONSE_CACHE_SIZE", "256")),
+    ttl_seconds=float(os.getenv("RESPONSE_CACHE_TTL", "3600")),
+    similarity_threshold=float(os.getenv("RESPONSE_CACHE_SIMILARITY", "0.95")),
+)
+
+def preload_resources():
+    """
+    Loads the embedding model, the lexical index and the reranker.
+
+    These are read-only after loading, so when this runs in the gunicorn master
+    process the workers share them copy-on-write instead of loading their own.
+    """
+    global embeddings, lexical_index, shards
+    embeddings = get_embedding_function(persist_dir, query_batch_size=QUERY_BATCH_SIZE,
+                                        query_batch_wait_ms=QUERY_BATCH_WAIT_MS)
+    # Embedding one query forces the model to load now rather than on the first request
+    embeddings.embed_query("warm up")
+    logger.info("Embedding model loaded successfully on app startup.")
+
+    shards = get_manifest_shards(load_manifest(get_manifest_path(persist_dir), MODEL_NAME))
+    if shards != [DEFAULT_SHARD]:
+        logger.info(f"The index is split into {len(shards)} shards: {shards}.")
+
+    # Hybrid retrieval is used when train_pipeline has built a lexical index
+    if shards == [DEFAULT_SHARD]:
+        lexical_index_dir = get_lexical_index_dir(persist_dir)
+        if os.path.exists(lexical_index_dir):
+            lexical_index = LexicalIndex(lexical_index_dir)
+        else:
+            logger.warning(f"No lexical index at '{lexical_index_dir}'. Using vector search only.")
+    else:
+        lexical_index_dirs = {shard: get_shard_lexical_index_dir(persist_dir, shard) for shard in shards}
+        lexical_index = ShardedLexicalIndex({
+            shard: LexicalIndex(index_dir) for shard, index_dir in lexical_index_dirs.items() if os.path.exists(index_dir)
+        })
+
+    if RERANK_ENABLED:
+        load_reranker()
+
+def open_vector_store():
+    """
+    Opens the vector store with the preloaded embedding function.
+
+    Its SQLite connections must not cross a fork, so under gunicorn every worker calls this after forking.
+    The exported index is memory-mapped, so its pages are shared by all workers through the OS cache.
+    """
+    global vector_store
+    if VECTOR_INDEX == "exported":
+        if shards != [DEFAULT_SHARD]:
+            raise ValueError("The exported index only covers unsharded vector stores.")
+        vector_store = ExportedIndex(EXPORTED_INDEX_DIR, embeddings, MODEL_NAME, nprobe=EXPORTED_INDEX_NPROBE)
+        logger.info("Exported index loaded successfully on app startup.")
+        return
+    vector_store = load_sharded_vector_store(persist_dir, shards, embeddings=embeddings)
+    logger.info("Vector store loaded successfully on app startup.")
 
 def load_db():
     global vector_store
     try:
-        vector_store = load_vector_store(persist_dir)
-        logger.info("Vector store loaded successfully on app startup.")
+        preload_resources()
+        open_vector_store()
     except Exception as e:
         logger.error(f"Failed to load vector store on startup: {e}")
         vector_store = None
 
-# A thread to load the database without blocking the main app startup
-# This is a good practice for larger projects
-db_loader_thread = threading.Thread(target=load_db)
-db_loader_thread.start()
+def load_reranker():
+    global reranker
+    try:
+        reranker = CrossEncoderReranker(
+            model_name=os.getenv("RERANK_MODEL", DEFAULT_RERANK_MODEL),
+            time_budget_ms=float(os.getenv("RERANK_BUDGET_MS", "300")),
+        )
+        reranker.warm_up()
+        logger.info("Reranker loaded successfully on app startup.")
+    except Exception as e:
+        # Answers are still served in retrieval order without the reranker
+        logger.error(f"Failed to load reranker on startup: {e}")
+        reranker = None
+
+if SERVING_MODE == "production":
+    # Load everything up front so no worker ever answers "not yet ready"
+    preload_resources()
+else:
+    # A thread to load the database without blocking the main app startup
+    # This is a good practice for larger projects
+    db_loader_thread = threading.Thread(target=load_db)
+    db_loader_thread.start()
 
 # --- Gemini API Call Logic ---
+API_KEY_MISSING_RESPONSE = "I'm sorry, the API key is not configured. Please contact the administrator."
+MALFORMED_RESPONSE = "I'm sorry, I couldn't generate a response. The LLM response was malformed."
+CONNECTION_ERROR_RESPONSE = "I'm sorry, there was a problem communicating with the AI model. Please try again later."
+DECODE_ERROR_RESPONSE = "I'm sorry, I couldn't understand the AI model's response."
+UNEXPECTED_ERROR_RESPONSE = "I'm sorry, something went wrong. Please try again."
+
+# Fallback answers that must never be cached
+LLM_ERROR_RESPONSES = {
+    API_KEY_MISSING_RESPONSE,
+    MALFORMED_RESPONSE,
+    CONNECTION_ERROR_RESPONSE,
+    DECODE_ERROR_RESPONSE,
+    UNEXPECTED_ERROR_RESPONSE,
+}
+
+gemini_client = GeminiClient(
+    api_key=API_KEY,
+    model=os.getenv("GEMINI_MODEL", DEFAULT_MODEL),
+    base_url=os.getenv("GEMINI_API_BASE_URL", DEFAULT_BASE_URL),
+    timeout=(5.0, float(os.getenv("GEMINI_TIMEOUT", "60"))),
+    max_retries=int(os.getenv("GEMINI_MAX_RETRIES", "3")),
+    max_concurrency=int(os.getenv("GEMINI_MAX_CONCURRENCY", "8")),
+)
+
 def get_gemini_response(prompt: str) -> str:
     """
     Sends a request to the Gemini API and returns the text response.
     """
     if not API_KEY:
         logger.error("API_KEY environment variable is not set.")
-        return "I'm sorry, the API key is not configured. Please contact the administrator."
-    
-    url = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-flash-preview-05-20:generateContent?key={API_KEY}"
-    
-    payload = {
-        "contents": [
-            {
-                "role": "user",
-                "parts": [{"text": prompt}]
-            }
-        ],
-        "generationConfig": {
-            "responseMimeType": "text/plain"
-        }
-    }
+        ERRORS.labels("llm", "api_key_missing").inc()
+        return API_KEY_MISSING_RESPONSE
 
     try:
-        response = requests.post(url, json=payload)
-        response.raise_for_status() # Raise an exception for bad status codes
-        
-        result = response.json()
-        
-        if result.get("candidates") and result["candidates"][0].get("content") and result["candidates"][0]["content"].get("parts"):
-            text = result["candidates"][0]["content"]["parts"][0]["text"]
-            return text
-        else:
-            logger.error(f"Unexpected API response structure: {result}")
-            return "I'm sorry, I couldn't generate a response. The LLM response was malformed."
+        with trace_stage("llm"):
+            return gemini_client.generate(prompt)
 
+    except MalformedResponseError as e:
+        logger.error(str(e))
+        ERRORS.labels("llm", "malformed").inc()
+        return MALFORMED_RESPONSE
     except requests.exceptions.RequestException as e:
         logger.error(f"Error calling Gemini API: {e}")
-        return "I'm sorry, there was a problem communicating with the AI model. Please try again later."
+        ERRORS.labels("llm", "connection").inc()
+        return CONNECTION_ERROR_RESPONSE
     except json.JSONDecodeError as e:
         logger.error(f"Error decoding JSON response from API: {e}")
-        return "I'm sorry, I couldn't understand the AI model's response."
+        ERRORS.labels("llm", "decode").inc()
+        return DECODE_ERROR_RESPONSE
     except Exception as e:
         logger.error(f"An unexpected error occurred: {e}")
-        return "I'm sorry, something went wrong. Please try again."
+        ERRORS.labels("llm", "unexpected").inc()
+        return UNEXPECTED_ERROR_RESPONSE
+
+def stream_gemini_response(prompt: str):
+    """
+    Sends a request to the Gemini API and yields the text response as it is generated.
+
+    If the call fails before any text arrived, a single fallback message is yielded instead.
+    """
+    if not API_KEY:
+        logger.error("API_KEY environment variable is not set.")
+        ERRORS.labels("llm", "api_key_missing").inc()
+        yield API_KEY_MISSING_RESPONSE
+        return
+
+    received_text = False
+    start_time = time.perf_counter()
+    try:
+        with trace_stage("llm"):
+            for piece in gemini_client.stream(prompt):
+                if not received_text:
+                    # Time to first token is what the user feels while waiting
+                    record_stage("llm_first_token", time.perf_counter() - start_time)
+                received_text = True
+                yield piece
+        if not received_text:
+            logger.error("Gemini API stream ended without any text.")
+            ERRORS.labels("llm", "malformed").inc()
+            yield MALFORMED_RESPONSE
+    except requests.exceptions.RequestException as e:
+        logger.error(f"Error streaming from Gemini API: {e}")
+        ERRORS.labels("llm", "connection").inc()
+        if not received_text:
+            yield CONNECTION_ERROR_RESPONSE
+    except Exception as e:
+        logger.error(f"An unexpected error occurred while streaming: {e}")
+        ERRORS.labels("llm", "unexpected").inc()
+        if not received_text:
+            yield UNEXPECTED_ERROR_RESPONSE
+
+# --- Chat Helpers ---
+NOT_READY_RESPONSE = "The knowledge base is not yet ready. Please run 'train_pipeline.py' first and restart the app."
+EMPTY_QUERY_RESPONSE = "Please enter a question."
+INTERNAL_ERROR_RESPONSE = "An internal server error occurred. Please check the logs."
+UNKNOWN_SHARD_RESPONSE = "Unknown document collection: {}."
+
+def get_requested_shards(data: dict):
+    """
+    Returns the shards a request asked to search, or None to search them all.
+
+    Raises:
+        ValueError: If the shards are not a string or a non-empty list of strings, or a requested shard does not exist.
+    """
+    requested = data.get('shards')
+    if requested is None:
+        return None
+    if isinstance(requested, str):
+        requested = [requested]
+    if not isinstance(requested, list) or not requested or not all(isinstance(shard, str) for shard in requested):
+        raise ValueError("Shards must be a string or a non-empty list of strings, e.g. [\"acme-realty\"].")
+    requested = sorted({normalize_shard_name(shard) for shard in requested})
+    unknown = [shard for shard in requested if shard not in shards]
+    if unknown:
+        raise ValueError(UNKNOWN_SHARD_RESPONSE.format(", ".join(unknown)))
+    return requested
+
+def get_requested_filters(data: dict):
+    """
+    Returns the document attribute filters of a request, or None.
+
+    Raises:
+        ValueError: If a filter is unknown or invalid.
+    """
+    filters = data.get('filters') or None
+    if filters is not None and not isinstance(filters, dict):
+        raise ValueError("Filters must be an object, e.g. {\"doc_type\": \"lease\"}.")
+    build_metadata_filter(filters)
+    return filters
+
+def lookup_cached_response(user_query: str, index_version, cache_scope):
+    """
+    Looks the query up in the response cache, embedding it only if it is not an exact repeat.
+
+    Returns:
+        A tuple of the query embedding, reused for retrieval on a miss, and the cached
+        answer with its sources (see ResponseCache.get) or None.
+        The embedding is None when the answer was found without one.
+    """
+    with trace_stage("cache_lookup"):
+        cached_response = response_cache.get_exact(user_query, index_version, scope=cache_scope)
+    if cached_response is not None:
+        CACHE_LOOKUPS.labels("hit").inc()
+        return None, cached_response
+
+    with trace_stage("embed_query"):
+        query_embedding = vector_store.embeddings.embed_query(user_query)
+    with trace_stage("cache_lookup"):
+        cached_response = response_cache.get(user_query, index_version, query_embedding, scope=cache_scope)
+    CACHE_LOOKUPS.labels("miss" if cached_response is None else "hit").inc()
+    return query_embedding, cached_response
+
+def format_sse(event: str, data: dict) -> str:
+    """Formats one server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.before_request
+def start_request_trace():
+    # /chat/stream is traced inside its generator, which only runs after the view has returned
+    if request.endpoint == "chat":
+        start_trace(request.endpoint)
+
+@app.after_request
+def finish_request_trace(response):
+    trace = finish_trace()
+    if trace is not None and trace["spans"]:
+        response.headers["Server-Timing"] = format_server_timing(trace)
+    return response
 
 @app.route('/')
 def home():
     """Renders the main chat interface page."""
     return render_template('index.html')
 
+@app.route('/healthz')
+def healthz():
+    """Reports that the process is up, whether or not it can answer questions yet."""
+    return jsonify({"status": "ok"})
+
+@app.route('/readyz')
+def readyz():
+    """Reports whether the vector store is loaded and questions can be answered."""
+    if vector_store is None:
+        return jsonify({"status": "loading"}), 503
+    return jsonify({"status": "ready", "lexical_index": lexical_index is not None, "reranker": reranker is not None,
+                    "shards": shards})
+
+@app.route('/metrics')
+def metrics():
+    """Exposes per-stage latency histograms, context size and cache and error counters to Prometheus."""
+    body, content_type = render_metrics()
+    return Response(body, headers={"Content-Type": content_type})
+
 @app.route('/chat', methods=['POST'])
 def chat():
     """Handles user queries and returns a RAG response."""
     if vector_store is None:
-        return jsonify({"response": "The knowledge base is not yet ready. Please run 'train_pipeline.py' first and restart the app."})
+        return jsonify({"response": NOT_READY_RESPONSE})
 
     data = request.json
     user_query = data.get('query')
     
     if not user_query:
-        return jsonify({"response": "Please enter a question."})
+        return jsonify({"response": EMPTY_QUERY_RESPONSE})
+
+    try:
+        requested_shards = get_requested_shards(data)
+        filters = get_requested_filters(data)
+    except ValueError as e:
+        ERRORS.labels("chat", "invalid_request").inc()
+        return jsonify({"response": str(e)})
 
     try:
-        context, docs = get_rag_response(user_query, vector_store)
+        # Serve exact and near-duplicate questions from the cache
+        index_version = get_index_version(persist_dir)
+        cache_scope = get_cache_scope(requested_shards, filters)
+        query_embedding, cached_response = lookup_cached_response(user_query, index_version, cache_scope)
+        if cached_response is not None:
+            return jsonify({"response": cached_response["response"]})
+
+        context, docs = get_rag_response(user_query, vector_store, query_embedding=query_embedding,
+                                         lexical_index=lexical_index, reranker=reranker,
+                                         rerank_k=RERANK_CANDIDATES, shards=requested_shards, filters=filters)
         
-        prompt = f"""
-            You are a helpful real estate assistant. Use the following context to answer the user's question. 
-            If the answer is not in the context, say "I'm sorry, I cannot answer this question based on the provided documents."
-            Do not make up any information.
-            
-            Context:
-            {context}
-            
-            User's question: {user_query}
-            
-            Answer:
-        """
+        with trace_stage("build_prompt"):
+            prompt = build_prompt(context, user_query)
         
         final_response = get_gemini_response(prompt)
+        if final_response not in LLM_ERROR_RESPONSES:
+            response_cache.put(user_query, final_response, index_version, query_embedding, scope=cache_scope,
+                               sources=describe_sources(docs))
         
         return jsonify({"response": final_response})
     
     except CustomException as e:
         logger.error(f"A custom exception occurred: {e}")
-        return jsonify({"response": "An internal server error occurred. Please check the logs."})
+        ERRORS.labels("chat", "internal").inc()
+        return jsonify({"response": INTERNAL_ERROR_RESPONSE})
     except Exception as e:
         logger.error(f"An error occurred during chat processing: {e}")
-        return jsonify({"response": "An internal server error occurred. Please check the logs."})
+        ERRORS.labels("chat", "internal").inc()
+        return jsonify({"response": INTERNAL_ERROR_RESPONSE})
+
+@app.route('/chat/stream', methods=['POST'])
+def chat_stream():
+    """
+    Handles user queries and streams the RAG response as server-sent events.
+
+    Events are 'sources' (the retrieved documents), then one or more 'token'
+    events with pieces of the answer, and finally 'done'. Errors are sent as
+    an 'error' event carrying the message to show.
+    """
+    data = request.json or {}
+    user_query = data.get('query')
+
+    def generate():
+        if vector_store is None:
+            yield format_sse("error", {"message": NOT_READY_RESPONSE})
+            return
+        if not user_query:
+            yield format_sse("error", {"message": EMPTY_QUERY_RESPONSE})
+            return
+
+        try:
+            requested_shards = get_requested_shards(data)
+            filters = get_requested_filters(data)
+        except ValueError as e:
+            ERRORS.labels("chat_stream", "invalid_request").inc()
+            yield format_sse("error", {"message": str(e)})
+            return
+
+        trace = start_trace("chat_stream")
+        try:
+            index_version = get_index_version(persist_dir)
+            cache_scope = get_cache_scope(requested_shards, filters)
+            query_embedding, cached_response = lookup_cached_response(user_query, index_version, cache_scope)
+            if cached_response is not None:
+                yield format_sse("sources", {"sources": cached_response["sources"]})
+                yield format_sse("token", {"text": cached_response["response"]})
+                yield format_sse("done", {})
+                return
+
+            context, docs = get_rag_response(user_query, vector_store, query_embedding=query_embedding,
+                                             lexical_index=lexical_index, reranker=reranker,
+                                             rerank_k=RERANK_CANDIDATES, shards=requested_shards, filters=filters)
+            sources = describe_sources(docs)
+            yield format_sse("sources", {"sources": sources})
+
+            with trace_stage("build_prompt"):
+                prompt = build_prompt(context, user_query)
+            pieces = []
+            for piece in stream_gemini_response(prompt):
+                pieces.append(piece)
+                yield format_sse("token", {"text": piece})
+
+            final_response = "".join(pieces)
+            if final_response not in LLM_ERROR_RESPONSES:
+                response_cache.put(user_query, final_response, index_version, query_embedding, scope=cache_scope,
+                                   sources=sources)
+            yield format_sse("done", {})
+
+        except Exception as e:
+            logger.error(f"An error occurred during streaming chat processing: {e}")
+            ERRORS.labels("chat_stream", "internal").inc()
+            yield format_sse("error", {"message": INTERNAL_ERROR_RESPONSE})
+        finally:
+            finish_trace(trace)
+
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return Response(stream_with_context(generate()), mimetype="text/event-stream", headers=headers)
+
+@app.route('/chat/batch', methods=['POST'])
+def chat_batch():
+    """
+    Answers many questions in one request and streams the answers as JSON lines.
+
+    The body is either JSONL with one question per line, or a JSON object with a
+    'questions' list. Each question is a string or an object with a 'query' and
+    optionally an 'id', 'shards' and 'filters' (see batch_pipeline.parse_question).
+    One line is sent per question as soon as it is answered, holding its 'id',
+    'query', and either the 'response' and its 'sources' or an 'error', so a client
+    can resend just the questions it did not get an answer for.
+    """
+    if vector_store is None:
+        return jsonify({"response": NOT_READY_RESPONSE}), 503
+    if not API_KEY:
+        logger.error("API_KEY environment variable is not set.")
+        ERRORS.labels("llm", "api_key_missing").inc()
+        return jsonify({"response": API_KEY_MISSING_RESPONSE}), 503
+
+    try:
+        if request.is_json:
+            items = (request.get_json() or {}).get('questions') or []
+            questions = [parse_question(item, line_number) for line_number, item in enumerate(items, start=1)]
+        else:
+            questions = read_questions(request.get_data(as_text=True).splitlines())
+    except (ValueError, AttributeError) as e:
+        ERRORS.labels("chat_batch", "invalid_request").inc()
+        return jsonify({"response": str(e)}), 400
+    if not questions:
+        return jsonify({"response": EMPTY_QUERY_RESPONSE}), 400
+    if len(questions) > BATCH_MAX_QUESTIONS:
+        return jsonify({"response": f"A batch can hold at most {BATCH_MAX_QUESTIONS} questions."}), 413
+
+    # Questions with unknown shards or invalid filters are answered with an error right away
+    valid_questions, invalid_records = [], []
+    for question in questions:
+        try:
+            valid_questions.append({**question, "shards": get_requested_shards(question),
+                                    "filters": get_requested_filters(question)})
+        except ValueError as e:
+            invalid_records.append({"id": question["id"], "query": question["query"], "error": str(e)})
+
+    def generate():
+        for record in invalid_records:
+            yield json.dumps(record) + "\n"
+        try:
+            for record in answer_questions(valid_questions, vector_store, gemini_client.generate,
+                                           lexical_index=lexical_index, reranker=reranker, rerank_k=RERANK_CANDIDATES,
+                                           max_concurrency=BATCH_MAX_CONCURRENCY,
+                                           requests_per_minute=BATCH_REQUESTS_PER_MINUTE or None,
+                                           response_cache=response_cache, index_version=get_index_version(persist_dir)):
+                yield json.dumps(record) + "\n"
+        except Exception as e:
+            logger.error(f"An error occurred during batch chat processing: {e}")
+            ERRORS.labels("chat_batch", "internal").inc()
+            yield json.dumps({"error": INTERNAL_ERROR_RESPONSE}) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
 
 if __name__ == '__main__':
     if not os.path.exists(persist_dir):
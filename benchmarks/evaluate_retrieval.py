@@ -0,0 +1,256 @@
+"""
+Evaluating retrieval quality against latency, index size and prompt tokens across chunking and k settings
+"""
+
+import os
+import re
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import itertools
+import numpy as np
+from datetime import datetime
+from typing import Dict, List, Optional
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+RESULTS_DIR = os.path.join(PROJECT_ROOT, "benchmarks", "results")
+RETRIEVAL_MODES = ("vector", "hybrid", "rerank")
+
+def normalize_passage(text: str) -> str:
+    """
+    Lowercases text and collapses whitespace, so passages still match after PDF line wrapping.
+    """
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+def load_questions(questions_path: str) -> List[Dict]:
+    """
+    Reads the evaluation set.
+
+    Args:
+        questions_path: A JSONL file with one object per line holding the 'question',
+            the expected 'answer' passage as it appears in the document and,
+            optionally, the file name of its 'source'.
+
+    Returns:
+        The questions.
+    """
+    with open(questions_path, encoding="utf-8") as file_obj:
+        questions = [json.loads(line) for line in file_obj if line.strip()]
+    missing = [item for item in questions if not item.get("question") or not item.get("answer")]
+    if missing:
+        raise ValueError(f"{len(missing)} questions in '{questions_path}' have no 'question' or 'answer'.")
+    return questions
+
+def is_relevant(passage, question: Dict) -> bool:
+    """
+    Returns whether a retrieved passage contains the expected answer (and comes from its source, if given).
+    """
+    source = question.get("source")
+    if source and os.path.basename(str(passage.metadata.get("source", ""))) != source:
+        return False
+    return normalize_passage(question["answer"]) in normalize_passage(passage.page_content)
+
+def get_directory_size_mb(path: str) -> float:
+    total = 0
+    for root, _, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+    return round(total / (1024 * 1024), 3)
+
+def build_index(pages: List, chunk_size: int, chunk_overlap: int, index_dir: str, embedding_stage, embeddings):
+    """
+    Chunks the pages and builds a vector store and lexical index with these settings.
+
+    Returns:
+        A tuple of the vector store, the lexical index and the build stats.
+    """
+    from src.components.data_transformation import chunk_documents
+    from src.components.index_manifest import assign_chunk_ids
+    from src.components.model_trainer import load_vector_store, add_chunks_to_vector_store
+    from src.components.lexical_index import LexicalIndex, build_lexical_index, get_lexical_index_dir
+
+    persist_dir = os.path.join(index_dir, "db")
+    lexical_index_dir = get_lexical_index_dir(persist_dir)
+
+    start_time = time.perf_counter()
+    chunks, chunk_ids = assign_chunk_ids(chunk_documents(pages, chunk_size=chunk_size, chunk_overlap=chunk_overlap))
+    vector_store = load_vector_store(persist_dir, embeddings=embeddings)
+    add_chunks_to_vector_store(vector_store, chunks, chunk_ids, embedding_stage)
+    build_lexical_index(chunk_ids, [chunk.page_content for chunk in chunks], lexical_index_dir)
+    build_seconds = time.perf_counter() - start_time
+
+    stats = {
+        "chunks": len(chunks),
+        "build_seconds": round(build_seconds, 3),
+        "index_size_mb": round(get_directory_size_mb(persist_dir) + get_directory_size_mb(lexical_index_dir), 3),
+    }
+    return vector_store, LexicalIndex(lexical_index_dir), stats
+
+def evaluate_configuration(questions: List[Dict], query_embeddings: np.ndarray, vector_store, lexical_index,
+                           mode: str, k: int, max_context_tokens: int, reranker=None) -> Dict:
+    """
+    Answers every question with get_rag_response and scores the passages it returns.
+
+    Returns:
+        The recall@k, MRR, mean context tokens and retrieval latency percentiles.
+        Query embeddings are computed up front, as they do not depend on the settings.
+    """
+    from src.components.context_builder import estimate_tokens
+    from src.pipeline.predict_pipeline import get_rag_response
+
+    hits, reciprocal_ranks, context_tokens, latencies = 0, [], [], []
+    for question, query_embedding in zip(questions, query_embeddings):
+        start_time = time.perf_counter()
+        context, passages = get_rag_response(
+            question["question"], vector_store, query_embedding=query_embedding.tolist(),
+            lexical_index=lexical_index if mode in ("hybrid", "rerank") else None, k=k,
+            reranker=reranker if mode == "rerank" else None, max_context_tokens=max_context_tokens,
+        )
+        latencies.append(time.perf_counter() - start_time)
+        context_tokens.append(estimate_tokens(context))
+
+        rank = next((position for position, passage in enumerate(passages, start=1) if is_relevant(passage, question)), None)
+        hits += rank is not None
+        reciprocal_ranks.append(1 / rank if rank is not None else 0.0)
+
+    latencies_ms = np.asarray(latencies) * 1000
+    return {
+        "recall_at_k": round(hits / len(questions), 4),
+        "mrr": round(float(np.mean(reciprocal_ranks)), 4),
+        "mean_context_tokens": round(float(np.mean(context_tokens)), 1),
+        "p50_ms": round(float(np.percentile(latencies_ms, 50)), 2),
+        "p95_ms": round(float(np.percentile(latencies_ms, 95)), 2),
+    }
+
+def pick_cheapest(rows: List[Dict], target_recall: float) -> Optional[Dict]:
+    """
+    Returns the configuration that reaches the target recall with the fewest context tokens, or None.
+    """
+    candidates = [row for row in rows if row["recall_at_k"] >= target_recall]
+    return min(candidates, key=lambda row: (row["mean_context_tokens"], row["p50_ms"])) if candidates else None
+
+def evaluate_retrieval(pdf_paths: List[str], questions: List[Dict], chunk_sizes: List[int], chunk_overlaps: List[int],
+                       ks: List[int], modes: List[str], max_context_tokens: int = 1500,
+                       max_workers: Optional[int] = None) -> List[Dict]:
+    """
+    Sweeps chunk size, chunk overlap, k and retrieval mode over one corpus.
+
+    Each chunking is indexed once in a scratch directory and queried with every
+    k and mode. Overlaps that are not smaller than the chunk size are skipped.
+
+    Args:
+        pdf_paths: The PDFs to index.
+        questions: The evaluation set (see load_questions).
+        chunk_sizes: The chunk sizes in characters.
+        chunk_overlaps: The chunk overlaps in characters.
+        ks: The numbers of chunks retrieved per question.
+        modes: Any of RETRIEVAL_MODES. 'rerank' is hybrid retrieval reordered by the cross-encoder.
+        max_context_tokens: The context token budget, as in the app.
+        max_workers: The number of PDF parsing processes.
+
+    Returns:
+        One row per configuration with its settings, index stats and scores.
+    """
+    from src.components.data_ingestion import iter_documents_from_pdfs
+    from src.components.embedding import EmbeddingStage, CachedEmbeddings
+    from src.components.model_trainer import MODEL_NAME
+    from src.components.reranker import CrossEncoderReranker
+
+    unknown = sorted(set(modes) - set(RETRIEVAL_MODES))
+    if unknown:
+        raise ValueError(f"Unknown retrieval modes: {', '.join(unknown)}. Use any of {', '.join(RETRIEVAL_MODES)}.")
+
+    pages = list(iter_documents_from_pdfs(pdf_paths, max_workers=max_workers))
+    # A generous budget so the cross-encoder always finishes and the scores are comparable between runs
+    reranker = CrossEncoderReranker(time_budget_ms=60000) if "rerank" in modes else None
+    work_dir = tempfile.mkdtemp(prefix="rag_retrieval_eval_")
+    rows = []
+    try:
+        # No embedding cache, so every build embeds its chunks and the build times are comparable
+        with EmbeddingStage(MODEL_NAME) as embedding_stage:
+            embeddings = CachedEmbeddings(embedding_stage)
+            query_embeddings = embedding_stage.embed([item["question"] for item in questions])
+
+            for chunk_size, chunk_overlap in itertools.product(chunk_sizes, chunk_overlaps):
+                if chunk_overlap >= chunk_size:
+                    continue
+                index_dir = os.path.join(work_dir, f"size{chunk_size}_overlap{chunk_overlap}")
+                vector_store, lexical_index, index_stats = build_index(
+                    pages, chunk_size, chunk_overlap, index_dir, embedding_stage, embeddings
+                )
+                for mode, k in itertools.product(modes, ks):
+                    scores = evaluate_configuration(questions, query_embeddings, vector_store, lexical_index,
+                                                    mode, k, max_context_tokens, reranker=reranker)
+                    rows.append({"chunk_size": chunk_size, "chunk_overlap": chunk_overlap, "mode": mode, "k": k,
+                                 **index_stats, **scores})
+                    print(f"size={chunk_size:<5} overlap={chunk_overlap:<4} {mode:<7} k={k:<3} "
+                          f"recall={scores['recall_at_k']:.3f} mrr={scores['mrr']:.3f} "
+                          f"tokens={scores['mean_context_tokens']:<7} p50={scores['p50_ms']}ms "
+                          f"size={index_stats['index_size_mb']}MB build={index_stats['build_seconds']}s")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return rows
+
+if __name__ == "__main__":
+    # Example usage, from the project root:
+    #   python -m benchmarks.evaluate_retrieval --chunk-sizes 500,1000 --k 2,4,8
+    #   python -m benchmarks.evaluate_retrieval --data-dir data --questions my_questions.jsonl
+    from benchmarks.synthetic_corpus import generate_corpus
+    from src.components.index_manifest import find_pdf_files
+
+    def int_list(value: str) -> List[int]:
+        return [int(item) for item in value.split(",") if item.strip()]
+
+    parser = argparse.ArgumentParser(description="Sweep chunking, k and retrieval mode and report quality against cost.")
+    parser.add_argument("--data-dir", help="Evaluate on these PDFs instead of a synthetic corpus.")
+    parser.add_argument("--questions", help="JSONL evaluation set. Defaults to questions.jsonl in --data-dir.")
+    parser.add_argument("--documents", type=int, default=40, help="Number of synthetic PDFs.")
+    parser.add_argument("--pages", type=int, default=5, help="Pages per synthetic PDF.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic corpus.")
+    parser.add_argument("--chunk-sizes", type=int_list, default=[300, 500, 1000, 1500], help="Comma-separated chunk sizes.")
+    parser.add_argument("--chunk-overlaps", type=int_list, default=[0, 100, 200], help="Comma-separated chunk overlaps.")
+    parser.add_argument("--k", type=int_list, default=[2, 4, 8], help="Comma-separated numbers of chunks to retrieve.")
+    parser.add_argument("--modes", default="vector,hybrid", help=f"Comma-separated retrieval modes: {', '.join(RETRIEVAL_MODES)}.")
+    parser.add_argument("--max-context-tokens", type=int, default=1500, help="Context token budget, as in the app.")
+    parser.add_argument("--target-recall", type=float, default=0.9, help="Recall the cheapest configuration must reach.")
+    parser.add_argument("--workers", type=int, default=None, help="Number of PDF parsing processes.")
+    parser.add_argument("--output", help="Where to write the results. Defaults to benchmarks/results/.")
+    args = parser.parse_args()
+
+    corpus_dir = None
+    if args.data_dir:
+        data_dir = args.data_dir
+        eval_questions = load_questions(args.questions or os.path.join(data_dir, "questions.jsonl"))
+    else:
+        corpus_dir = tempfile.mkdtemp(prefix="rag_eval_corpus_")
+        data_dir = corpus_dir
+        eval_questions = generate_corpus(data_dir, args.documents, args.pages, seed=args.seed)
+        if args.questions:
+            eval_questions = load_questions(args.questions)
+
+    try:
+        results = evaluate_retrieval(
+            sorted(find_pdf_files(data_dir).values()), eval_questions, args.chunk_sizes, args.chunk_overlaps,
+            args.k, [mode.strip() for mode in args.modes.split(",") if mode.strip()],
+            max_context_tokens=args.max_context_tokens, max_workers=args.workers,
+        )
+    finally:
+        if corpus_dir:
+            shutil.rmtree(corpus_dir, ignore_errors=True)
+
+    best = pick_cheapest(results, args.target_recall)
+    output_path = args.output or os.path.join(RESULTS_DIR, f"retrieval-eval-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    with open(output_path, "w", encoding="utf-8") as file_obj:
+        json.dump({"created_at": datetime.now().isoformat(timespec="seconds"), "questions": len(eval_questions),
+                   "config": {key: value for key, value in vars(args).items() if key != "output"},
+                   "best": best, "results": results}, file_obj, indent=2)
+
+    if best is None:
+        print(f"No configuration reached a recall of {args.target_recall}.")
+    else:
+        print(f"Fewest context tokens at recall >= {args.target_recall}: chunk_size={best['chunk_size']}, "
+              f"chunk_overlap={best['chunk_overlap']}, mode={best['mode']}, k={best['k']} "
+              f"(recall {best['recall_at_k']}, {best['mean_context_tokens']} tokens).")
+    print(f"Results written to '{output_path}'.")
@@ -0,0 +1,119 @@
+"""
+Profiling how long the app and the CLI entry points take to import, and which modules cost the most
+"""
+
+import os
+import sys
+import json
+import argparse
+import tempfile
+import subprocess
+from datetime import datetime
+from typing import Dict, List
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+RESULTS_DIR = os.path.join(PROJECT_ROOT, "benchmarks", "results")
+ENTRY_POINTS = ["application", "src.pipeline.predict_pipeline", "src.pipeline.train_pipeline"]
+# Modules that should never be imported just to start the app or answer /healthz
+HEAVY_MODULES = ["torch", "sentence_transformers", "transformers", "chromadb", "pypdf"]
+
+# Imports the entry point, then times a /healthz request when it is the app.
+# Threads are not started during the import, so the app's background model loader
+# stays out of the profile; it runs after startup and does not delay it.
+_PROBE = """
+import os, sys, json, time, threading
+start_thread = threading.Thread.start
+threading.Thread.start = lambda thread: None
+start = time.perf_counter()
+import {module} as entry_point
+import_seconds = time.perf_counter() - start
+threading.Thread.start = start_thread
+healthz_seconds = None
+if hasattr(entry_point, "app"):
+    start = time.perf_counter()
+    entry_point.app.test_client().get("/healthz")
+    healthz_seconds = time.perf_counter() - start
+heavy = [name for name in {heavy!r} if name in sys.modules]
+print(json.dumps({{"import_seconds": import_seconds, "healthz_seconds": healthz_seconds, "heavy_modules_loaded": heavy}}))
+sys.stdout.flush()
+os._exit(0)
+"""
+
+def parse_importtime(stderr: str) -> List[Dict]:
+    """
+    Parses the output of python -X importtime.
+
+    Returns:
+        One entry per module with its 'self_ms', 'cumulative_ms' and import 'depth'.
+    """
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        # Nested imports are indented by two spaces per level below the first
+        name = name[1:]
+        depth = (len(name) - len(name.lstrip(" "))) // 2
+        modules.append({"module": name.strip(), "self_ms": int(self_us) / 1000,
+                        "cumulative_ms": int(cumulative_us) / 1000, "depth": depth})
+    return modules
+
+def profile_entry_point(module: str, top: int = 15) -> Dict:
+    """
+    Imports a module in a fresh interpreter with -X importtime.
+
+    The app is pointed at an empty scratch vector store, so profiling never touches the real one.
+
+    Args:
+        module: The module to import, e.g. 'application'.
+        top: The number of slowest packages to report.
+
+    Returns:
+        The wall-clock import time, the /healthz latency for the app, the heavy
+        modules that were loaded, and the top-level packages that took longest to import.
+    """
+    with tempfile.TemporaryDirectory(prefix="rag_import_profile_") as scratch_dir:
+        env = {**os.environ, "PERSIST_DIR": os.path.join(scratch_dir, "db"), "PYTHONPATH": PROJECT_ROOT}
+        completed = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", _PROBE.format(module=module, heavy=HEAVY_MODULES)],
+            cwd=scratch_dir, env=env, capture_output=True, text=True, check=True,
+        )
+    probe = json.loads(completed.stdout.strip().splitlines()[-1])
+
+    # Sum the cost of each top-level package over every place it was first imported from
+    packages = {}
+    for entry in parse_importtime(completed.stderr):
+        package = entry["module"].split(".")[0]
+        packages[package] = packages.get(package, 0.0) + entry["self_ms"]
+    slowest = sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]
+    return {
+        "import_ms": round(probe["import_seconds"] * 1000, 1),
+        "healthz_ms": round(probe["healthz_seconds"] * 1000, 1) if probe["healthz_seconds"] is not None else None,
+        "heavy_modules_loaded": probe["heavy_modules_loaded"],
+        "slowest_packages_ms": {package: round(milliseconds, 1) for package, milliseconds in slowest},
+    }
+
+if __name__ == "__main__":
+    # Example usage, from the project root: python -m benchmarks.profile_imports
+    parser = argparse.ArgumentParser(description="Report the import time of the app and CLI entry points.")
+    parser.add_argument("modules", nargs="*", default=ENTRY_POINTS, help="The modules to profile.")
+    parser.add_argument("--top", type=int, default=15, help="Number of slowest packages to list per module.")
+    parser.add_argument("--output", help="Where to write the report. Defaults to benchmarks/results/.")
+    args = parser.parse_args()
+
+    report = {"created_at": datetime.now().isoformat(timespec="seconds"), "python": sys.version.split()[0],
+              "entry_points": {module: profile_entry_point(module, args.top) for module in args.modules}}
+
+    for module, profile in report["entry_points"].items():
+        healthz = f", first /healthz {profile['healthz_ms']}ms" if profile["healthz_ms"] is not None else ""
+        print(f"{module}: imported in {profile['import_ms']}ms{healthz}")
+        if profile["heavy_modules_loaded"]:
+            print(f"  heavy modules loaded at import: {', '.join(profile['heavy_modules_loaded'])}")
+        for package, milliseconds in profile["slowest_packages_ms"].items():
+            print(f"  {package:<32} {milliseconds:>9.1f}ms")
+
+    output_path = args.output or os.path.join(RESULTS_DIR, f"import-profile-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    with open(output_path, "w", encoding="utf-8") as file_obj:
+        json.dump(report, file_obj, indent=2)
+    print(f"Report written to '{output_path}'.")
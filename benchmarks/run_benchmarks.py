@@ -0,0 +1,324 @@
+"""
+Benchmarking ingestion, chunking, embedding, retrieval and /chat on a reproducible corpus
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import subprocess
+import numpy as np
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+RESULTS_DIR = os.path.join(PROJECT_ROOT, "benchmarks", "results")
+# Bump when metrics are renamed or measured differently, so old result files are not compared blindly
+BENCHMARK_VERSION = 1
+
+# The metrics compared against a baseline, and whether a higher value is better
+HEADLINE_METRICS = {
+    "ingestion.pages_per_sec": True,
+    "chunking.pages_per_sec": True,
+    "embedding.chunks_per_sec": True,
+    "index_build.seconds": False,
+    "query.vector.p50_ms": False,
+    "query.vector.p95_ms": False,
+    "query.vector.p99_ms": False,
+    "query.hybrid.p50_ms": False,
+    "query.hybrid.p95_ms": False,
+    "query.hybrid.p99_ms": False,
+    "chat.requests_per_sec": True,
+    "chat.p95_ms": False,
+}
+
+def summarize_latencies(seconds: List[float]) -> Dict:
+    """
+    Returns the count, mean and p50/p95/p99/max of a list of durations, in milliseconds.
+    """
+    milliseconds = np.asarray(seconds, dtype=np.float64) * 1000
+    return {
+        "count": len(milliseconds),
+        "mean_ms": round(float(milliseconds.mean()), 2),
+        "p50_ms": round(float(np.percentile(milliseconds, 50)), 2),
+        "p95_ms": round(float(np.percentile(milliseconds, 95)), 2),
+        "p99_ms": round(float(np.percentile(milliseconds, 99)), 2),
+        "max_ms": round(float(milliseconds.max()), 2),
+    }
+
+def get_git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def benchmark_ingestion(pdf_paths: List[str], max_workers: Optional[int]):
+    """
+    Parses the PDFs across the process pool, as train_pipeline does.
+
+    Returns:
+        A tuple of the pages and the ingestion stats.
+    """
+    from src.components.data_ingestion import iter_documents_from_pdfs
+
+    stats = {}
+    pages = list(iter_documents_from_pdfs(pdf_paths, max_workers=max_workers, stats=stats))
+    return pages, {key: stats[key] for key in ("files", "pages", "seconds", "pages_per_sec", "peak_rss_mb")}
+
+def benchmark_chunking(pages: List, chunk_size: int, chunk_overlap: int):
+    """
+    Splits the pages into chunks and assigns their content ids.
+
+    Returns:
+        A tuple of the chunks and the chunking stats.
+    """
+    from src.components.data_transformation import chunk_documents
+    from src.components.index_manifest import assign_chunk_ids
+
+    start_time = time.perf_counter()
+    chunks, _ = assign_chunk_ids(chunk_documents(pages, chunk_size=chunk_size, chunk_overlap=chunk_overlap))
+    elapsed = time.perf_counter() - start_time
+    return chunks, {
+        "chunks": len(chunks),
+        "seconds": round(elapsed, 3),
+        "pages_per_sec": round(len(pages) / elapsed, 2),
+        "chunks_per_sec": round(len(chunks) / elapsed, 2),
+    }
+
+def benchmark_embedding(texts: List[str], batch_size: int, num_workers: int) -> Dict:
+    """
+    Embeds the chunk texts without the embedding cache, so every run does the same work.
+    """
+    from src.components.embedding import EmbeddingStage
+    from src.components.model_trainer import MODEL_NAME
+
+    with EmbeddingStage(MODEL_NAME, batch_size=batch_size, num_workers=num_workers) as embedding_stage:
+        # Load the model before the clock starts
+        embedding_stage.embed(["warm up"])
+        start_time = time.perf_counter()
+        embedding_stage.embed(texts)
+        elapsed = time.perf_counter() - start_time
+    return {"chunks": len(texts), "seconds": round(elapsed, 3), "chunks_per_sec": round(len(texts) / elapsed, 2)}
+
+def benchmark_index_build(data_dir: str, persist_dir: str, max_workers: Optional[int], embed_workers: int) -> Dict:
+    """
+    Builds the vector store and lexical index from scratch with the incremental training pipeline.
+    """
+    from src.pipeline.train_pipeline import incremental_train_pipeline
+
+    start_time = time.perf_counter()
+    stats = incremental_train_pipeline(data_dir, persist_dir, max_workers=max_workers, embed_workers=embed_workers)
+    return {"seconds": round(time.perf_counter() - start_time, 3), "documents": stats["updated"],
+            "chunks": stats["chunks_added"], "peak_rss_mb": stats["peak_rss_mb"]}
+
+def benchmark_queries(persist_dir: str, questions: List[str], k: int, warmup: int) -> Dict:
+    """
+    Measures get_rag_response latency, including the query embedding, with vector-only and hybrid retrieval.
+    """
+    from src.components.model_trainer import load_vector_store
+    from src.components.lexical_index import LexicalIndex, get_lexical_index_dir
+    from src.pipeline.predict_pipeline import get_rag_response
+
+    vector_store = load_vector_store(persist_dir)
+    lexical_index = LexicalIndex(get_lexical_index_dir(persist_dir))
+    results = {}
+    for mode, mode_lexical_index in (("vector", None), ("hybrid", lexical_index)):
+        for question in questions[:warmup]:
+            get_rag_response(question, vector_store, lexical_index=mode_lexical_index, k=k)
+        latencies = []
+        for question in questions:
+            start_time = time.perf_counter()
+            get_rag_response(question, vector_store, lexical_index=mode_lexical_index, k=k)
+            latencies.append(time.perf_counter() - start_time)
+        results[mode] = summarize_latencies(latencies)
+    return results
+
+def benchmark_chat(persist_dir: str, questions: List[str], num_requests: int, concurrency: int,
+                   llm_latency: float) -> Dict:
+    """
+    Serves the app on a local port against the stub LLM server and sends concurrent /chat requests.
+
+    The response cache is disabled so every request retrieves and calls the LLM.
+    """
+    import requests
+    from werkzeug.serving import make_server
+    from src.components.llm_stub_server import start_stub_server
+
+    stub_server, stub_url = start_stub_server(answer="This is a benchmark answer from the stub server.",
+                                              latency_seconds=llm_latency)
+    # The app reads its settings when it is imported
+    os.environ.update({
+        "PERSIST_DIR": persist_dir,
+        "SERVING_MODE": "production",
+        "GEMINI_API_KEY": "benchmark",
+        "GEMINI_API_BASE_URL": stub_url,
+        "GEMINI_MAX_CONCURRENCY": str(concurrency),
+        "RESPONSE_CACHE_SIZE": "0",
+    })
+    import application
+    application.open_vector_store()
+
+    http_server = make_server("127.0.0.1", 0, application.app, threaded=True)
+    executor = ThreadPoolExecutor(max_workers=1)
+    executor.submit(http_server.serve_forever)
+    chat_url = f"http://127.0.0.1:{http_server.server_port}/chat"
+
+    session = requests.Session()
+    session.mount("http://", requests.adapters.HTTPAdapter(pool_maxsize=concurrency))
+    def send(question: str) -> float:
+        start_time = time.perf_counter()
+        response = session.post(chat_url, json={"query": question}, timeout=60)
+        response.raise_for_status()
+        return time.perf_counter() - start_time
+
+    try:
+        for question in questions[:concurrency]:
+            send(question)
+        workload = [questions[i % len(questions)] for i in range(num_requests)]
+        start_time = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as clients:
+            latencies = list(clients.map(send, workload))
+        elapsed = time.perf_counter() - start_time
+    finally:
+        http_server.shutdown()
+        executor.shutdown()
+        stub_server.shutdown()
+        session.close()
+
+    return {"requests": num_requests, "concurrency": concurrency, "llm_latency_ms": llm_latency * 1000,
+            "seconds": round(elapsed, 3), "requests_per_sec": round(num_requests / elapsed, 2),
+            **summarize_latencies(latencies)}
+
+def compare_results(current: Dict, baseline: Dict) -> List[Dict]:
+    """
+    Compares the headline metrics of two result files.
+
+    Returns:
+        One row per metric present in both, with the relative 'change' and whether it is a 'regression'.
+    """
+    def lookup(results: Dict, path: str):
+        for key in path.split("."):
+            if not isinstance(results, dict) or key not in results:
+                return None
+            results = results[key]
+        return results
+
+    rows = []
+    for metric, higher_is_better in HEADLINE_METRICS.items():
+        before, after = lookup(baseline["results"], metric), lookup(current["results"], metric)
+        if not before or after is None:
+            continue
+        change = (after - before) / before
+        rows.append({"metric": metric, "baseline": before, "current": after, "change": round(change, 4),
+                     "regression": change < 0 if higher_is_better else change > 0})
+    return rows
+
+def run_benchmarks(args: argparse.Namespace) -> Dict:
+    """
+    Runs every benchmark stage on a synthetic (or given) corpus in a scratch directory.
+
+    Returns:
+        The results with the environment and settings they were measured with.
+    """
+    from benchmarks.synthetic_corpus import generate_corpus
+    from src.components.index_manifest import find_pdf_files
+
+    work_dir = tempfile.mkdtemp(prefix="rag_benchmark_")
+    try:
+        if args.data_dir:
+            data_dir = args.data_dir
+            questions_path = os.path.join(data_dir, "questions.jsonl")
+            if os.path.exists(questions_path):
+                with open(questions_path, encoding="utf-8") as file_obj:
+                    questions = [json.loads(line)["question"] for line in file_obj if line.strip()]
+            else:
+                questions = ["What is the monthly rent?", "What is the purchase price?", "When is the closing date?",
+                             "Who is responsible for repairs?", "What is the zoning for a single-family home?"]
+        else:
+            data_dir = os.path.join(work_dir, "data")
+            questions = [item["question"] for item in
+                         generate_corpus(data_dir, args.documents, args.pages, seed=args.seed)]
+        questions = questions[:args.queries]
+        persist_dir = os.path.join(work_dir, "db")
+        pdf_paths = sorted(find_pdf_files(data_dir).values())
+
+        results = {}
+        pages, results["ingestion"] = benchmark_ingestion(pdf_paths, args.workers)
+        chunks, results["chunking"] = benchmark_chunking(pages, args.chunk_size, args.chunk_overlap)
+        results["embedding"] = benchmark_embedding([chunk.page_content for chunk in chunks], args.embed_batch_size,
+                                                   args.embed_workers)
+        results["index_build"] = benchmark_index_build(data_dir, persist_dir, args.workers, args.embed_workers)
+        results["query"] = benchmark_queries(persist_dir, questions, args.k, args.warmup)
+        if not args.skip_chat:
+            results["chat"] = benchmark_chat(persist_dir, questions, args.chat_requests, args.concurrency,
+                                             args.llm_latency)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    import torch
+    return {
+        "benchmark_version": BENCHMARK_VERSION,
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "git_commit": get_git_commit(),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "torch_threads": torch.get_num_threads(),
+        },
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "baseline")},
+        "results": results,
+    }
+
+if __name__ == "__main__":
+    # Example usage, from the project root:
+    #   python -m benchmarks.run_benchmarks --documents 100 --baseline benchmarks/results/<previous>.json
+    parser = argparse.ArgumentParser(description="Benchmark ingestion, embedding, retrieval and /chat.")
+    parser.add_argument("--data-dir", help="Benchmark these PDFs instead of a synthetic corpus.")
+    parser.add_argument("--documents", type=int, default=40, help="Number of synthetic PDFs.")
+    parser.add_argument("--pages", type=int, default=5, help="Pages per synthetic PDF.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic corpus.")
+    parser.add_argument("--workers", type=int, default=None, help="Number of PDF parsing processes.")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="Chunk size in characters.")
+    parser.add_argument("--chunk-overlap", type=int, default=200, help="Chunk overlap in characters.")
+    parser.add_argument("--embed-batch-size", type=int, default=64, help="Number of chunks per embedding forward pass.")
+    parser.add_argument("--embed-workers", type=int, default=1, help="Number of embedding worker processes.")
+    parser.add_argument("--k", type=int, default=4, help="Number of chunks retrieved per question.")
+    parser.add_argument("--queries", type=int, default=100, help="Number of questions timed per retrieval mode.")
+    parser.add_argument("--warmup", type=int, default=5, help="Number of untimed questions before each mode.")
+    parser.add_argument("--chat-requests", type=int, default=200, help="Number of /chat requests.")
+    parser.add_argument("--concurrency", type=int, default=8, help="Number of concurrent /chat clients.")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="Latency of the stub LLM in seconds.")
+    parser.add_argument("--skip-chat", action="store_true", help="Skip the /chat throughput benchmark.")
+    parser.add_argument("--output", help="Where to write the results. Defaults to benchmarks/results/.")
+    parser.add_argument("--baseline", help="A previous results file to compare against.")
+    parser.add_argument("--regression-threshold", type=float, default=0.1,
+                        help="Exit with an error when a metric is this much worse than the baseline (0.1 = 10%%).")
+    args = parser.parse_args()
+
+    benchmark_results = run_benchmarks(args)
+    output_path = args.output or os.path.join(
+        RESULTS_DIR, f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{benchmark_results['git_commit'] or 'unknown'}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    with open(output_path, "w", encoding="utf-8") as file_obj:
+        json.dump(benchmark_results, file_obj, indent=2)
+    print(json.dumps(benchmark_results["results"], indent=2))
+    print(f"Results written to '{output_path}'.")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as file_obj:
+            baseline_results = json.load(file_obj)
+        if baseline_results.get("benchmark_version") != BENCHMARK_VERSION:
+            print("The baseline was measured with a different benchmark version; comparing anyway.")
+        rows = compare_results(benchmark_results, baseline_results)
+        for row in rows:
+            flag = "REGRESSION" if row["regression"] else ""
+            print(f"{row['metric']:<28} {row['baseline']:>12} -> {row['current']:>12} ({row['change']:+.1%}) {flag}")
+        sys.exit(1 if any(row["regression"] and abs(row["change"]) > args.regression_threshold for row in rows) else 0)
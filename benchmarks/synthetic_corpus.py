@@ -0,0 +1,239 @@
+"""
+Generating a reproducible corpus of synthetic real estate PDFs, with questions whose answers are known
+"""
+
+import os
+import json
+import random
+import argparse
+import textwrap
+from datetime import date, timedelta
+from typing import Dict, List
+
+STREET_NAMES = ["Oak", "Maple", "Cedar", "Willow", "Birch", "Elm", "Pine", "Aspen", "Juniper", "Magnolia",
+                "Chestnut", "Sycamore", "Hawthorn", "Laurel", "Redwood", "Spruce", "Poplar", "Cypress"]
+STREET_SUFFIXES = ["Street", "Avenue", "Road", "Lane", "Drive", "Court", "Place", "Boulevard"]
+PEOPLE = ["Alice Morgan", "Brian Chen", "Carla Diaz", "David Okafor", "Emma Larsen", "Farid Haddad",
+          "Grace Kim", "Hector Alvarez", "Irene Novak", "James Patel", "Karen Walsh", "Luis Romero"]
+COMPANIES = ["Summit Property Management", "Harbor Realty Group", "Keystone Homes", "Bluebird Rentals",
+             "Northgate Estates", "Crescent Title Company"]
+
+# Clauses every document of a type shares, so retrieval has to tell near-identical pages apart
+BOILERPLATE = [
+    "This agreement shall be governed by the laws of the state in which the property is located.",
+    "Any notice required under this agreement must be delivered in writing to the addresses listed above.",
+    "The parties acknowledge that they have read and understood every provision of this document.",
+    "Time is of the essence for all dates and deadlines stated in this agreement.",
+    "No amendment to this agreement is valid unless it is signed by all parties.",
+    "If any provision of this agreement is held invalid, the remaining provisions remain in full force.",
+    "The property is sold or rented in its present condition unless otherwise stated in writing.",
+    "All fixtures attached to the property at the time of signing remain with the property.",
+    "Each party shall bear its own attorney fees unless a court orders otherwise.",
+    "The failure of either party to enforce a provision does not waive the right to enforce it later.",
+    "Smoke detectors and carbon monoxide detectors must be kept in working order at all times.",
+    "Utilities not listed in this agreement are the responsibility of the occupant.",
+    "The property may be shown to prospective buyers or tenants with twenty-four hours notice.",
+    "Disputes arising under this agreement shall first be submitted to mediation.",
+    "This document, together with its addenda, constitutes the entire agreement between the parties.",
+    "Common areas must be kept clean and free of personal belongings.",
+    "Local zoning ordinances and homeowners association rules apply to the use of the property.",
+    "Keys, garage openers and access cards must be returned at the end of the term.",
+]
+
+# One fact per page: the sentence written into the PDF and the question it answers
+FACTS = {
+    "lease": [
+        ("The monthly rent for {address} is ${rent:,}, payable on the first day of each month.",
+         "What is the monthly rent for {address}?"),
+        ("The tenant shall pay a security deposit of ${deposit:,} before moving into {address}.",
+         "How much is the security deposit for {address}?"),
+        ("The lease term for {address} begins on {start_date} and runs for {months} months.",
+         "When does the lease for {address} begin?"),
+        ("Pets are permitted at {address} with a non-refundable pet fee of ${pet_fee}.",
+         "What is the pet fee at {address}?"),
+        ("The landlord, {landlord}, is responsible for repairs to the roof and plumbing at {address}.",
+         "Who is the landlord of {address}?"),
+        ("A late fee of ${late_fee} applies when rent for {address} is more than five days overdue.",
+         "What is the late fee for {address}?"),
+    ],
+    "purchase_agreement": [
+        ("The buyer agrees to pay a purchase price of ${price:,} for the property at {address}.",
+         "What is the purchase price of {address}?"),
+        ("An earnest money deposit of ${earnest:,} for {address} shall be held in escrow by {company}.",
+         "How much earnest money was deposited for {address}?"),
+        ("Closing for {address} shall take place on or before {closing_date}.",
+         "When is the closing date for {address}?"),
+        ("The buyer of {address}, {buyer}, may terminate within {inspection_days} days if the inspection is unsatisfactory.",
+         "How many days does the buyer of {address} have for the inspection contingency?"),
+        ("The seller of {address} will provide a home warranty worth ${warranty} at closing.",
+         "What is the value of the home warranty for {address}?"),
+    ],
+    "inspection": [
+        ("The roof at {address} is approximately {roof_age} years old and shows minor granule loss.",
+         "How old is the roof at {address}?"),
+        ("The water heater at {address} is a {heater_gallons} gallon unit installed in {heater_year}.",
+         "When was the water heater at {address} installed?"),
+        ("A hairline crack of {crack_inches} inches was observed in the foundation wall at {address}.",
+         "How long is the foundation crack at {address}?"),
+        ("The HVAC system at {address} was serviced by {company} and is rated at {seer} SEER.",
+         "What is the SEER rating of the HVAC system at {address}?"),
+    ],
+    "appraisal": [
+        ("The appraised market value of {address} is ${value:,} as of {start_date}.",
+         "What is the appraised value of {address}?"),
+        ("The dwelling at {address} has {sqft:,} square feet of gross living area.",
+         "How many square feet is the home at {address}?"),
+        ("The lot at {address} measures {lot_acres} acres and is zoned R-{zone} residential.",
+         "What is the lot size at {address}?"),
+        ("The closest comparable sale to {address} sold for ${comp:,} within the last six months.",
+         "What did the closest comparable sale to {address} sell for?"),
+    ],
+}
+
+TITLES = {
+    "lease": "RESIDENTIAL LEASE AGREEMENT",
+    "purchase_agreement": "PURCHASE AND SALE AGREEMENT",
+    "inspection": "HOME INSPECTION REPORT",
+    "appraisal": "UNIFORM RESIDENTIAL APPRAISAL REPORT",
+}
+
+LINE_WIDTH = 90
+LINES_PER_PAGE = 52
+
+def write_pdf(pdf_path: str, pages: List[str]):
+    """
+    Writes text pages to a minimal PDF with one Helvetica text stream per page.
+
+    Args:
+        pdf_path: The path of the PDF to write.
+        pages: The text of each page. Lines are wrapped to LINE_WIDTH characters.
+    """
+    objects = []
+    def add_object(body: str) -> int:
+        objects.append(body.encode("latin-1"))
+        return len(objects)
+
+    font_id = add_object("<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    pages_id = 2 + 2 * len(pages)
+    page_ids = []
+    for text in pages:
+        lines = []
+        for paragraph in text.split("\n"):
+            lines.extend(textwrap.wrap(paragraph, LINE_WIDTH) or [""])
+        escaped = [line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)") for line in lines]
+        stream = "BT /F1 10 Tf 50 760 Td 13 TL " + " ".join(f"({line}) Tj T*" for line in escaped) + " ET"
+        content_id = add_object(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        page_ids.append(add_object(
+            f"<< /Type /Page /Parent {pages_id} 0 R /MediaBox [0 0 612 792] /Contents {content_id} 0 R "
+            f"/Resources << /Font << /F1 {font_id} 0 R >> >> >>"
+        ))
+    add_object(f"<< /Type /Pages /Kids [{' '.join(f'{i} 0 R' for i in page_ids)}] /Count {len(page_ids)} >>")
+    catalog_id = add_object(f"<< /Type /Catalog /Pages {pages_id} 0 R >>")
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += f"{number} 0 obj\n".encode("ascii") + body + b"\nendobj\n"
+    xref_offset = len(output)
+    output += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("ascii")
+    output += b"".join(f"{offset:010d} 00000 n \n".encode("ascii") for offset in offsets)
+    output += f"trailer\n<< /Size {len(objects) + 1} /Root {catalog_id} 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n".encode("ascii")
+    with open(pdf_path, "wb") as file_obj:
+        file_obj.write(output)
+
+def _document_values(rng: random.Random, address: str) -> Dict:
+    start = date(2023, 1, 1) + timedelta(days=rng.randrange(730))
+    return {
+        "address": address,
+        "rent": rng.randrange(1200, 6000, 25),
+        "deposit": rng.randrange(1000, 8000, 100),
+        "start_date": start.strftime("%B %d, %Y").replace(" 0", " "),
+        "months": rng.choice([6, 12, 18, 24]),
+        "pet_fee": rng.randrange(150, 600, 25),
+        "landlord": rng.choice(PEOPLE),
+        "late_fee": rng.randrange(25, 200, 5),
+        "price": rng.randrange(180000, 1500000, 500),
+        "earnest": rng.randrange(2000, 50000, 500),
+        "company": rng.choice(COMPANIES),
+        "closing_date": (start + timedelta(days=rng.randrange(30, 90))).strftime("%B %d, %Y").replace(" 0", " "),
+        "buyer": rng.choice(PEOPLE),
+        "inspection_days": rng.choice([7, 10, 14, 17, 21]),
+        "warranty": rng.randrange(300, 900, 25),
+        "roof_age": rng.randrange(2, 30),
+        "heater_gallons": rng.choice([30, 40, 50, 75]),
+        "heater_year": rng.randrange(2005, 2024),
+        "crack_inches": rng.randrange(3, 40),
+        "seer": rng.choice([13, 14, 15, 16, 18, 20]),
+        "value": rng.randrange(180000, 1500000, 1000),
+        "sqft": rng.randrange(700, 5200, 10),
+        "lot_acres": round(rng.uniform(0.08, 2.5), 2),
+        "zone": rng.randrange(1, 5),
+        "comp": rng.randrange(180000, 1500000, 500),
+    }
+
+def generate_corpus(output_dir: str, num_documents: int = 20, pages_per_document: int = 5,
+                    seed: int = 0) -> List[Dict]:
+    """
+    Writes synthetic real estate PDFs and the questions that each of their pages answers.
+
+    Every page holds boilerplate clauses shared across documents plus, while
+    there are facts left for its document type, one fact about the property
+    (rent, price, roof age...). The same seed always produces the same corpus.
+
+    Args:
+        output_dir: The directory to write the PDFs and 'questions.jsonl' to.
+        num_documents: The number of PDFs.
+        pages_per_document: The number of pages per PDF.
+        seed: The seed of the random generator.
+
+    Returns:
+        The questions, each with the 'question', the expected 'answer' passage,
+        and the 'source' file name and 0-based 'page' that contain it.
+    """
+    rng = random.Random(seed)
+    os.makedirs(output_dir, exist_ok=True)
+    doc_types = list(FACTS)
+    addresses = rng.sample(
+        [f"{number} {street} {suffix}" for number in range(100, 1000, 37) for street in STREET_NAMES for suffix in STREET_SUFFIXES],
+        num_documents,
+    )
+
+    questions = []
+    for doc_number, address in enumerate(addresses):
+        doc_type = doc_types[doc_number % len(doc_types)]
+        values = _document_values(rng, address)
+        file_name = f"{doc_type}_{doc_number:04d}.pdf"
+        facts = rng.sample(FACTS[doc_type], len(FACTS[doc_type]))
+
+        pages = []
+        for page_number in range(pages_per_document):
+            sentences = rng.sample(BOILERPLATE, rng.randint(6, 10))
+            if page_number < len(facts):
+                statement, question = facts[page_number]
+                answer = statement.format(**values)
+                sentences.insert(rng.randint(0, len(sentences)), answer)
+                questions.append({"question": question.format(**values), "answer": answer,
+                                  "source": file_name, "page": page_number})
+            header = f"{TITLES[doc_type]}\nProperty: {address}\n" if page_number == 0 else f"{address} - page {page_number + 1}\n"
+            paragraphs = [" ".join(sentences[i:i + 3]) for i in range(0, len(sentences), 3)]
+            pages.append(header + "\n".join(paragraphs))
+
+        write_pdf(os.path.join(output_dir, file_name), pages)
+
+    with open(os.path.join(output_dir, "questions.jsonl"), "w", encoding="utf-8") as file_obj:
+        for question in questions:
+            file_obj.write(json.dumps(question) + "\n")
+    return questions
+
+if __name__ == "__main__":
+    # Example usage: python -m benchmarks.synthetic_corpus --output /tmp/corpus --documents 50
+    parser = argparse.ArgumentParser(description="Generate synthetic real estate PDFs with known questions and answers.")
+    parser.add_argument("--output", required=True, help="The directory to write the PDFs and questions.jsonl to.")
+    parser.add_argument("--documents", type=int, default=20, help="Number of PDFs.")
+    parser.add_argument("--pages", type=int, default=5, help="Pages per PDF.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the random generator.")
+    args = parser.parse_args()
+
+    generated = generate_corpus(args.output, args.documents, args.pages, args.seed)
+    print(f"Wrote {args.documents} PDFs and {len(generated)} questions to '{args.output}'.")
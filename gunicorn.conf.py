@@ -0,0 +1,58 @@
+"""
+Production serving configuration for gunicorn.
+
+Run from the project root with:
+    gunicorn application:app
+
+The app is imported once in the master process with the embedding model,
+lexical index and reranker already loaded (preload_app), then forked into
+workers that share that memory copy-on-write. Each worker opens its own
+vector store connection after the fork and only then starts accepting requests.
+"""
+
+import os
+import shutil
+import tempfile
+import multiprocessing
+
+# Must be set before the app is imported so it loads everything up front
+os.environ.setdefault("SERVING_MODE", "production")
+
+# Workers write their metrics to files here so /metrics reports the whole server, not
+# just the worker that answered the scrape. Leftovers from a previous run are removed.
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "real_estate_assistant_metrics"))
+shutil.rmtree(os.environ["PROMETHEUS_MULTIPROC_DIR"], ignore_errors=True)
+os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", str(max(2, multiprocessing.cpu_count() // 2))))
+# Threads let a worker keep serving while other requests wait on the LLM or stream answers
+worker_class = "gthread"
+threads = int(os.getenv("THREADS_PER_WORKER", "4"))
+preload_app = True
+timeout = int(os.getenv("WORKER_TIMEOUT", "120"))
+keepalive = 5
+
+def post_fork(server, worker):
+    """
+    Opens the vector store in each worker and gives it a fair share of CPU threads for the models.
+    """
+    import torch
+    import application
+    from src.logger import use_process_log_file
+
+    # Workers live as long as the server, so each writes its own log file
+    use_process_log_file()
+
+    torch_threads = int(os.getenv("TORCH_THREADS_PER_WORKER", str(max(1, multiprocessing.cpu_count() // workers))))
+    torch.set_num_threads(torch_threads)
+    application.open_vector_store()
+    server.log.info(f"Worker {worker.pid} ready with {torch_threads} torch threads.")
+
+def child_exit(server, worker):
+    """
+    Stops reporting the live metrics of a worker that exited.
+    """
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
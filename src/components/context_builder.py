@@ -0,0 +1,166 @@
+"""
+Assembling the retrieved chunks into a compact prompt context
+"""
+
+import sys
+from typing import List, Optional, Set, Tuple
+from langchain.docstore.document import Document
+from src.exception import CustomException
+
+# A simple logger for the file
+from src.logger import get_logger
+logger = get_logger(__name__)
+
+# A rough characters-per-token ratio for English text; good enough for budgeting
+CHARS_PER_TOKEN = 4
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimates the number of LLM tokens in a text.
+    """
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+def _shingles(text: str, size: int = 3) -> Set[Tuple[str, ...]]:
+    words = text.lower().split()
+    if len(words) <= size:
+        return {tuple(words)}
+    return {tuple(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+def _jaccard(a: Set, b: Set) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+def _merge_by_position(segment: dict, doc: Document, max_gap: int = 2) -> bool:
+    """
+    Merges a chunk into a segment of the same page when their character ranges overlap or touch.
+    """
+    start = doc.metadata.get("start_index")
+    if start is None or segment["start"] is None:
+        return False
+
+    end = start + len(doc.page_content)
+    if start > segment["end"] + max_gap or segment["start"] > end + max_gap:
+        return False
+
+    if start >= segment["start"]:
+        first_text, first_end, second_text, second_start, second_end = segment["text"], segment["end"], doc.page_content, start, end
+    else:
+        first_text, first_end, second_text, second_start, second_end = doc.page_content, end, segment["text"], segment["start"], segment["end"]
+
+    if second_end <= first_end:
+        text = first_text
+    elif second_start >= first_end:
+        # Adjacent: the splitter dropped the whitespace between the chunks
+        text = f"{first_text} {second_text}"
+    else:
+        text = first_text + second_text[first_end - second_start:]
+
+    segment["text"] = text
+    segment["start"] = min(segment["start"], start)
+    segment["end"] = max(segment["end"], end)
+    return True
+
+def _merge_text(first: str, second: str, min_overlap: int) -> Optional[str]:
+    """
+    Joins two texts if the end of the first repeats the start of the second.
+    """
+    if second in first:
+        return first
+    probe = second[:min_overlap]
+    if len(probe) < min_overlap:
+        return None
+    position = first.find(probe)
+    while position != -1:
+        if second.startswith(first[position:]):
+            return first[:position] + second
+        position = first.find(probe, position + 1)
+    return None
+
+def _merge_by_text(segment: dict, doc: Document, min_overlap: int = 20) -> bool:
+    """
+    Merges a chunk into a segment of the same page when their texts overlap, for chunks without positions.
+    """
+    text = _merge_text(segment["text"], doc.page_content, min_overlap)
+    if text is None:
+        text = _merge_text(doc.page_content, segment["text"], min_overlap)
+    if text is None:
+        return False
+    segment["text"] = text
+    return True
+
+def build_context(docs: List[Document], max_tokens: int = 1500,
+                  duplicate_threshold: float = 0.8) -> Tuple[str, List[Document]]:
+    """
+    Builds the prompt context from retrieved chunks, best first.
+
+    Chunks from the same page that overlap or are adjacent are merged into one
+    passage, so the splitter's overlap is sent only once. Passages that are
+    near-duplicates of a better-ranked passage (e.g. boilerplate repeated across
+    documents) are dropped. The rest are packed in relevance order until the
+    token budget is used up.
+
+    Args:
+        docs: The retrieved chunks, most relevant first.
+        max_tokens: The approximate token budget for the whole context.
+        duplicate_threshold: The word-shingle Jaccard similarity above which a passage is dropped.
+
+    Returns:
+        A tuple containing the context string and the passages it contains.
+    """
+    try:
+        # Step 1: Merge overlapping or adjacent chunks of the same page
+        segments = []
+        for doc in docs:
+            # Table chunks are never merged with the page text or with other parts of their table
+            page_key = (doc.metadata.get("source"), doc.metadata.get("page"),
+                        doc.metadata.get("table_index"), doc.metadata.get("table_part"))
+            merged = False
+            for segment in segments:
+                if segment["page_key"] != page_key:
+                    continue
+                if _merge_by_position(segment, doc) or _merge_by_text(segment, doc):
+                    segment["merged"] += 1
+                    merged = True
+                    break
+            if not merged:
+                start = doc.metadata.get("start_index")
+                segments.append({
+                    "page_key": page_key,
+                    "metadata": dict(doc.metadata),
+                    "text": doc.page_content,
+                    "start": start,
+                    "end": start + len(doc.page_content) if start is not None else None,
+                    "merged": 1,
+                })
+
+        # Step 2: Drop near-duplicates of better-ranked passages
+        kept, kept_shingles = [], []
+        for segment in segments:
+            shingles = _shingles(segment["text"])
+            if any(_jaccard(shingles, other) >= duplicate_threshold for other in kept_shingles):
+                continue
+            kept.append(segment)
+            kept_shingles.append(shingles)
+
+        # Step 3: Pack passages in relevance order within the token budget
+        passages, used_tokens = [], 0
+        for segment in kept:
+            tokens = estimate_tokens(segment["text"])
+            if used_tokens + tokens > max_tokens:
+                if passages:
+                    continue
+                # Always keep the best passage, cut down to the budget
+                segment["text"] = segment["text"][:max_tokens * CHARS_PER_TOKEN]
+                tokens = estimate_tokens(segment["text"])
+            used_tokens += tokens
+            passages.append(Document(page_content=segment["text"], metadata=segment["metadata"]))
+
+        context = "\n\n".join(passage.page_content for passage in passages)
+        logger.info(
+            f"Packed {len(docs)} chunks into {len(passages)} passages "
+            f"(~{used_tokens} tokens, {len(segments) - len(kept)} near-duplicates dropped)."
+        )
+        return context, passages
+    except Exception as e:
+        raise CustomException(e, sys) from e
@@ -4,24 +4,31 @@ Reading the data from a database/ file path
 
 import os
 import sys
-from langchain_community.document_loaders import PyPDFLoader
-from typing import List
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from typing import Dict, Iterator, List, Optional, Tuple
 from langchain.docstore.document import Document
+from src.components.document_attributes import add_document_attributes
+from src.components.pdf_extraction import PageCache, extract_pdf_pages, is_table_chunk
 from src.exception import CustomException
+from src.utils import get_peak_rss_mb
 
 # A simple logger for the file
-from src.logger import get_logger
+from src.logger import get_logger, get_worker_log_queue, init_worker_logging
 logger = get_logger(__name__)
 
-def load_documents_from_pdf(pdf_path: str) -> List[Document]:
+def load_documents_from_pdf(pdf_path: str, page_cache: Optional[PageCache] = None) -> List[Document]:
     """
     Loads documents from a single PDF file.
 
     Args:
         pdf_path: The path to the PDF file.
+        page_cache: The cache of extracted pages, if any.
 
     Returns:
-        A list of Document objects, where each object represents a page in the PDF.
+        A list of Document objects, where each object represents a page in the PDF,
+        followed by the chunks of the tables on that page (see pdf_extraction).
+        Each document's metadata also holds the document's attributes (type, address, date...).
     """
     # Check if the PDF file exists
     if not os.path.exists(pdf_path):
@@ -29,13 +36,91 @@ def load_documents_from_pdf(pdf_path: str) -> List[Document]:
         raise FileNotFoundError(f"The file {pdf_path} does not exist.")
 
     try:
-        loader = PyPDFLoader(pdf_path)
-        documents = loader.load()
-        logger.info(f"Successfully loaded {len(documents)} pages from '{pdf_path}'.")
+        documents, _ = extract_pdf_pages(pdf_path, page_cache)
+        documents = add_document_attributes(documents)
+        logger.info(f"Successfully loaded {sum(not is_table_chunk(doc) for doc in documents)} pages from '{pdf_path}'.")
         return documents
     except Exception as e:
         raise CustomException(e, sys) from e
 
+def _load_pdf_pages(pdf_path: str, page_cache_path: Optional[str]) -> Tuple[str, List[Document], int, Optional[str]]:
+    """
+    Worker function that parses one PDF inside a pool process and extracts its attributes.
+
+    Returns:
+        A tuple of the PDF path, its pages (and table chunks), the number of pages
+        served from the page cache and an error message (None on success).
+    """
+    page_cache = PageCache(page_cache_path) if page_cache_path else None
+    try:
+        documents, cached_pages = extract_pdf_pages(pdf_path, page_cache)
+        return pdf_path, add_document_attributes(documents), cached_pages, None
+    except Exception as e:
+        return pdf_path, [], 0, str(e)
+    finally:
+        if page_cache is not None:
+            page_cache.close()
+
+def iter_documents_from_pdfs(pdf_paths: List[str], max_workers: Optional[int] = None,
+                             stats: Optional[Dict] = None, page_cache_path: Optional[str] = None) -> Iterator[Document]:
+    """
+    Parses many PDFs across a process pool and yields their pages as they are ready.
+
+    Only a bounded number of PDFs is in flight at any time, so memory stays flat
+    no matter how many files are passed in. Pages of one PDF are yielded together.
+    PDFs that fail to parse are logged and skipped. With a page cache, pages
+    extracted by an earlier run are not parsed again.
+
+    Args:
+        pdf_paths: The paths of the PDF files to load.
+        max_workers: The number of worker processes. Defaults to the number of CPUs.
+        stats: An optional dictionary that is filled with 'files', 'pages', 'cached_pages',
+            'table_chunks', 'failed', 'seconds', 'pages_per_sec' and 'peak_rss_mb' once the generator is exhausted.
+        page_cache_path: The path of the page cache (see pdf_extraction.get_page_cache_path), if any.
+
+    Yields:
+        Document objects, one per PDF page, each followed by the chunks of its tables.
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    max_pending = max_workers * 2
+    pending_paths = list(reversed(pdf_paths))
+    run_stats = {"files": 0, "pages": 0, "cached_pages": 0, "table_chunks": 0, "failed": []}
+    start_time = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=init_worker_logging,
+                             initargs=(get_worker_log_queue(),)) as executor:
+        in_flight = set()
+        while pending_paths or in_flight:
+            # Keep the pool busy without queueing the whole corpus up front
+            while pending_paths and len(in_flight) < max_pending:
+                in_flight.add(executor.submit(_load_pdf_pages, pending_paths.pop(), page_cache_path))
+
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                pdf_path, pages, cached_pages, error = future.result()
+                if error is not None:
+                    logger.error(f"Failed to load '{pdf_path}': {error}")
+                    run_stats["failed"].append(pdf_path)
+                    continue
+                table_chunks = sum(is_table_chunk(page) for page in pages)
+                run_stats["files"] += 1
+                run_stats["pages"] += len(pages) - table_chunks
+                run_stats["cached_pages"] += cached_pages
+                run_stats["table_chunks"] += table_chunks
+                yield from pages
+
+    elapsed = time.perf_counter() - start_time
+    run_stats["seconds"] = round(elapsed, 3)
+    run_stats["pages_per_sec"] = round(run_stats["pages"] / elapsed, 2) if elapsed > 0 else 0.0
+    run_stats["peak_rss_mb"] = get_peak_rss_mb()
+    logger.info(
+        f"Loaded {run_stats['pages']} pages ({run_stats['cached_pages']} from the page cache, "
+        f"{run_stats['table_chunks']} table chunks) from {run_stats['files']} PDFs in {run_stats['seconds']}s "
+        f"({run_stats['pages_per_sec']} pages/sec, peak RSS {run_stats['peak_rss_mb']} MB)."
+    )
+    if stats is not None:
+        stats.update(run_stats)
+
 if __name__ == '__main__':
     # Example usage (assuming a 'data' folder with 'sample.pdf')
     # This part can be used for testing the module independently
@@ -3,7 +3,6 @@ Handling the data and transforming it
 """
 
 import sys
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 from typing import List
 from langchain.docstore.document import Document
 from src.exception import CustomException
@@ -16,6 +15,9 @@ def chunk_documents(documents: List[Document], chunk_size: int = 1000, chunk_ove
     """
     Splits a list of documents into smaller, overlapping chunks.
 
+    Each chunk records its character offset in the page under 'start_index',
+    so overlapping chunks can be merged back together at query time.
+
     Args:
         documents: A list of Document objects to be chunked.
         chunk_size: The desired size of each chunk.
@@ -25,10 +27,12 @@ def chunk_documents(documents: List[Document], chunk_size: int = 1000, chunk_ove
         A list of Document objects representing the chunks.
     """
     try:
+        from langchain.text_splitter import RecursiveCharacterTextSplitter
         text_splitter = RecursiveCharacterTextSplitter(
             chunk_size=chunk_size,
             chunk_overlap=chunk_overlap,
             length_function=len,
+            add_start_index=True,
         )
         chunks = text_splitter.split_documents(documents)
         logger.info(f"Split {len(documents)} documents into {len(chunks)} chunks.")
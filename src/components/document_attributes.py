@@ -0,0 +1,223 @@
+"""
+Extracting structured attributes from real estate documents and filtering retrieval by them
+"""
+
+import os
+import re
+from datetime import date
+from typing import Dict, List, Optional
+from langchain.docstore.document import Document
+
+# A simple logger for the file
+from src.logger import get_logger
+logger = get_logger(__name__)
+
+# Bump when the extracted attributes change, so train_pipeline re-indexes existing documents
+ATTRIBUTES_VERSION = 1
+
+# Metadata keys set by add_document_attributes; they are part of each chunk's id
+DOCUMENT_ATTRIBUTE_KEYS = ("doc_type", "file_name", "page_count", "address", "address_key", "doc_date", "doc_date_num")
+
+# Only the first pages are read: titles, parties, addresses and dates are stated up front
+ATTRIBUTE_PAGES = 3
+
+# Key phrases of each document type; the type with the most matches wins
+DOCUMENT_TYPE_KEYWORDS = {
+    "lease": ["lease agreement", "rental agreement", "landlord", "tenant", "lessor", "lessee", "monthly rent", "security deposit"],
+    "purchase_agreement": ["purchase agreement", "purchase and sale", "purchase price", "earnest money", "buyer", "seller", "closing date"],
+    "appraisal": ["appraisal", "appraiser", "appraised value", "market value", "comparable sales"],
+    "inspection": ["inspection report", "inspector", "inspected", "foundation", "roof", "hvac"],
+    "disclosure": ["disclosure", "lead-based paint", "known defects", "material defects"],
+    "listing": ["listing agreement", "list price", "listing price", "mls", "commission"],
+    "title": ["title insurance", "title commitment", "deed", "grantor", "grantee", "easement"],
+    "mortgage": ["mortgage", "promissory note", "lender", "borrower", "loan amount", "interest rate"],
+    "hoa": ["homeowners association", "hoa", "bylaws", "covenants", "association dues"],
+}
+
+STREET_SUFFIXES = {
+    "street": "st", "avenue": "ave", "road": "rd", "boulevard": "blvd", "drive": "dr", "lane": "ln",
+    "court": "ct", "place": "pl", "terrace": "ter", "circle": "cir", "parkway": "pkwy", "highway": "hwy", "way": "way",
+}
+_SUFFIX_PATTERN = "|".join(sorted({*STREET_SUFFIXES, *STREET_SUFFIXES.values()}, key=len, reverse=True))
+ADDRESS_PATTERN = re.compile(
+    rf"\b\d{{1,6}}\s+(?:[A-Z0-9][\w'-]*\.?\s+){{1,4}}(?:{_SUFFIX_PATTERN})\b\.?"
+    r"(?:,?\s+(?:Apt|Unit|Suite|#)\.?\s*[\w-]+)?",
+    re.IGNORECASE,
+)
+
+MONTHS = ["january", "february", "march", "april", "may", "june", "july",
+          "august", "september", "october", "november", "december"]
+DATE_PATTERNS = [
+    (re.compile(r"\b(\d{4})-(\d{1,2})-(\d{1,2})\b"), ("year", "month", "day")),
+    (re.compile(r"\b(\d{1,2})/(\d{1,2})/(\d{4})\b"), ("month", "day", "year")),
+    (re.compile(rf"\b({'|'.join(MONTHS)}|{'|'.join(m[:3] for m in MONTHS)})\.?\s+(\d{{1,2}})(?:st|nd|rd|th)?,?\s+(\d{{4}})\b",
+                re.IGNORECASE), ("month", "day", "year")),
+]
+
+# Filters accepted by get_rag_response and /chat, and the metadata each one applies to
+FILTER_KEYS = ("doc_type", "address", "file_name", "date_from", "date_to", "page_from", "page_to")
+
+def normalize_address(address: str) -> str:
+    """
+    Lowercases an address, drops punctuation and abbreviates street suffixes so variants compare equal.
+    """
+    words = re.sub(r"[^\w#\s-]", " ", address.lower()).split()
+    return " ".join(STREET_SUFFIXES.get(word, word) for word in words)
+
+def _find_date(text: str) -> Optional[date]:
+    found = []
+    for pattern, fields in DATE_PATTERNS:
+        for match in pattern.finditer(text):
+            values = dict(zip(fields, match.groups()))
+            month = values["month"]
+            if month.isdigit():
+                month = int(month)
+            else:
+                month = [name[:3] for name in MONTHS].index(month.lower()[:3]) + 1
+            try:
+                found.append((match.start(), date(int(values["year"]), month, int(values["day"]))))
+            except ValueError:
+                continue
+    # The earliest mention is usually the effective date of the document
+    return min(found)[1] if found else None
+
+def classify_document_type(text: str) -> str:
+    """
+    Returns the document type whose key phrases appear most often, or 'other'.
+    """
+    text = text.lower()
+    scores = {
+        doc_type: sum(len(re.findall(rf"\b{re.escape(keyword)}\b", text)) for keyword in keywords)
+        for doc_type, keywords in DOCUMENT_TYPE_KEYWORDS.items()
+    }
+    best_type = max(scores, key=scores.get)
+    return best_type if scores[best_type] > 0 else "other"
+
+def extract_document_attributes(pages: List[Document]) -> Dict:
+    """
+    Extracts the attributes of one document from its first pages.
+
+    Args:
+        pages: The pages of a single PDF, in order.
+
+    Returns:
+        A dictionary with 'doc_type', 'file_name' and 'page_count', plus 'address',
+        'address_key', 'doc_date' and 'doc_date_num' when they are found.
+        Missing attributes are left out because Chroma metadata can't be None.
+    """
+    text = "\n".join(page.page_content for page in pages[:ATTRIBUTE_PAGES])
+    attributes = {
+        "doc_type": classify_document_type(text),
+        "file_name": os.path.basename(str(pages[0].metadata.get("source", ""))) if pages else "",
+        "page_count": len(pages),
+    }
+
+    address_match = ADDRESS_PATTERN.search(text)
+    if address_match:
+        address = " ".join(address_match.group(0).split()).rstrip(".,")
+        attributes["address"] = address
+        attributes["address_key"] = normalize_address(address)
+
+    doc_date = _find_date(text)
+    if doc_date is not None:
+        attributes["doc_date"] = doc_date.isoformat()
+        # Chroma only compares numbers, so the date is also stored as YYYYMMDD for range filters
+        attributes["doc_date_num"] = int(doc_date.strftime("%Y%m%d"))
+    return attributes
+
+def add_document_attributes(pages: List[Document]) -> List[Document]:
+    """
+    Copies the attributes of a document into the metadata of each of its pages and tables, so every chunk carries them.
+    """
+    if not pages:
+        return pages
+    # Attributes are read from the page text; table chunks only receive them
+    attributes = extract_document_attributes([page for page in pages if page.metadata.get("content_type") != "table"])
+    for page in pages:
+        page.metadata.update(attributes)
+    return pages
+
+def _date_to_number(value: str) -> int:
+    if not isinstance(value, str):
+        raise TypeError("Dates must be strings.")
+    return int(date.fromisoformat(value).strftime("%Y%m%d"))
+
+def build_metadata_filter(filters: Optional[Dict]) -> Optional[Dict]:
+    """
+    Turns user filters into a Chroma 'where' clause.
+
+    Args:
+        filters: A dictionary with any of FILTER_KEYS. 'doc_type' and 'file_name'
+            take a string or a list of strings, 'address' a string, 'date_from' and
+            'date_to' ISO dates, and 'page_from' and 'page_to' 1-based page numbers.
+
+    Returns:
+        The where clause, or None if there is nothing to filter on.
+
+    Raises:
+        ValueError: If a filter is unknown or has an invalid value.
+    """
+    if not filters:
+        return None
+
+    unknown = sorted(set(filters) - set(FILTER_KEYS))
+    if unknown:
+        raise ValueError(f"Unknown filters: {', '.join(unknown)}. Use any of {', '.join(FILTER_KEYS)}.")
+
+    conditions = []
+    for key in ("doc_type", "file_name"):
+        value = filters.get(key)
+        if value is None:
+            continue
+        values = [value] if isinstance(value, str) else value
+        if not isinstance(values, list) or not values or not all(isinstance(item, str) for item in values):
+            raise ValueError(f"Invalid filter value for '{key}': use a string or a non-empty list of strings.")
+        conditions.append({key: {"$in": values}} if len(values) > 1 else {key: {"$eq": values[0]}})
+    if filters.get("address"):
+        if not isinstance(filters["address"], str):
+            raise ValueError("Invalid filter value for 'address': use a string, e.g. \"12 Elm St\".")
+        conditions.append({"address_key": {"$eq": normalize_address(filters["address"])}})
+    for key, operator in (("date_from", "$gte"), ("date_to", "$lte")):
+        if filters.get(key):
+            try:
+                conditions.append({"doc_date_num": {operator: _date_to_number(filters[key])}})
+            except (TypeError, ValueError) as e:
+                raise ValueError(f"Invalid filter value for '{key}': use an ISO date, e.g. \"2023-01-01\".") from e
+    for key, operator in (("page_from", "$gte"), ("page_to", "$lte")):
+        value = filters.get(key)
+        if value is None:
+            continue
+        if isinstance(value, bool) or not isinstance(value, (int, str)) or not str(value).strip().isdigit():
+            raise ValueError(f"Invalid filter value for '{key}': use a page number, e.g. 1.")
+        # Pages are stored 0-based by the PDF loader
+        conditions.append({"page": {operator: int(value) - 1}})
+
+    if not conditions:
+        return None
+    return conditions[0] if len(conditions) == 1 else {"$and": conditions}
+
+def matches_metadata_filter(metadata: Dict, where: Optional[Dict]) -> bool:
+    """
+    Evaluates a where clause built by build_metadata_filter against one chunk's metadata.
+
+    Used by indexes that can't push the filter down into the vector search themselves.
+    """
+    if not where:
+        return True
+    if "$and" in where:
+        return all(matches_metadata_filter(metadata, condition) for condition in where["$and"])
+
+    (key, condition), = where.items()
+    (operator, expected), = condition.items()
+    value = metadata.get(key)
+    if value is None:
+        return False
+    if operator == "$eq":
+        return value == expected
+    if operator == "$in":
+        return value in expected
+    if operator == "$gte":
+        return value >= expected
+    if operator == "$lte":
+        return value <= expected
+    raise ValueError(f"Unsupported filter operator '{operator}'.")
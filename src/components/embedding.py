@@ -0,0 +1,184 @@
+"""
+Turning chunk text into vectors in batches, optionally across several CPU worker processes
+"""
+
+import os
+import sys
+import time
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from typing import TYPE_CHECKING, List, Optional
+from langchain_core.embeddings import Embeddings
+from src.components.embedding_cache import EmbeddingCache, normalize_text
+from src.exception import CustomException
+from src.utils import iter_batches
+
+# A simple logger for the file
+from src.logger import get_logger, get_worker_log_queue, init_worker_logging
+logger = get_logger(__name__)
+
+# sentence-transformers pulls in torch, which takes seconds to import, so it is only
+# imported once a model is actually loaded
+if TYPE_CHECKING:
+    from sentence_transformers import SentenceTransformer
+    from src.components.query_batcher import QueryEmbeddingBatcher
+
+# The model loaded inside each worker process of the pool
+_worker_model = None
+
+def _init_embedding_worker(model_name: str, num_threads: int, log_queue):
+    """
+    Loads the embedding model once per worker process and caps its torch threads.
+    """
+    global _worker_model
+    init_worker_logging(log_queue)
+    import torch
+    from sentence_transformers import SentenceTransformer
+    torch.set_num_threads(num_threads)
+    _worker_model = SentenceTransformer(model_name, device="cpu")
+
+def _embed_in_worker(texts: List[str]) -> np.ndarray:
+    """
+    Embeds one batch of texts inside a worker process.
+    """
+    return _worker_model.encode(texts, batch_size=len(texts), convert_to_numpy=True, show_progress_bar=False)
+
+class EmbeddingStage:
+    """
+    Embeds texts in length-sorted batches, in-process or across a pool of worker processes.
+
+    Sorting by length puts texts of similar size in the same batch, so little
+    compute is wasted on padding. With num_workers > 1, batches are spread over
+    worker processes that each hold their own copy of the model and an equal
+    share of the CPU threads. With a cache, texts embedded before are served from
+    disk and only the misses reach the model. Use it as a context manager so the
+    pool is shut down.
+    """
+    def __init__(self, model_name: str, batch_size: int = 64, num_workers: int = 1,
+                 cache: Optional[EmbeddingCache] = None):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.num_workers = max(1, num_workers)
+        self.cache = cache
+        self._model = None
+        self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """
+        Shuts down the worker pool, if one was started.
+        """
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            num_threads = max(1, (os.cpu_count() or 1) // self.num_workers)
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.num_workers,
+                initializer=_init_embedding_worker,
+                initargs=(self.model_name, num_threads, get_worker_log_queue()),
+            )
+            logger.info(f"Started {self.num_workers} embedding workers with {num_threads} threads each.")
+        return self._executor
+
+    def _get_model(self) -> "SentenceTransformer":
+        if self._model is None:
+            from sentence_transformers import SentenceTransformer
+            self._model = SentenceTransformer(self.model_name, device="cpu")
+        return self._model
+
+    def embed(self, texts: List[str], store: bool = True) -> np.ndarray:
+        """
+        Embeds a list of texts, reusing cached embeddings where possible.
+
+        Args:
+            texts: The texts to embed.
+            store: Whether to add new embeddings to the cache. Queries are looked up but not
+                stored, so user questions can't grow the cache without bound.
+
+        Returns:
+            A float32 array of shape (len(texts), dimension), in the order of texts.
+        """
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+
+        try:
+            texts = [normalize_text(text) for text in texts]
+            cached = self.cache.get_many(self.model_name, texts) if self.cache is not None else {}
+            if len(cached) == len(texts):
+                return np.vstack([cached[i] for i in range(len(texts))])
+
+            missing = [i for i in range(len(texts)) if i not in cached]
+            missing_vectors = self._encode([texts[i] for i in missing])
+            if self.cache is not None and store:
+                self.cache.put_many(self.model_name, [texts[i] for i in missing], missing_vectors)
+            if not cached:
+                return missing_vectors
+
+            vectors = np.empty((len(texts), missing_vectors.shape[1]), dtype=np.float32)
+            vectors[missing] = missing_vectors
+            for i, vector in cached.items():
+                vectors[i] = vector
+            return vectors
+        except Exception as e:
+            raise CustomException(e, sys) from e
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        """
+        Runs texts through the model in length-sorted batches.
+        """
+        start_time = time.perf_counter()
+
+        # Longest first, so the first batches show the worst-case cost early
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]), reverse=True)
+        batches = list(iter_batches([texts[i] for i in order], self.batch_size))
+
+        if self.num_workers > 1 and len(batches) > 1:
+            results = list(self._get_executor().map(_embed_in_worker, batches))
+        else:
+            model = self._get_model()
+            results = [
+                model.encode(batch, batch_size=len(batch), convert_to_numpy=True, show_progress_bar=False)
+                for batch in batches
+            ]
+
+        sorted_vectors = np.vstack(results).astype(np.float32, copy=False)
+        vectors = np.empty_like(sorted_vectors)
+        vectors[order] = sorted_vectors
+
+        elapsed = time.perf_counter() - start_time
+        logger.info(f"Embedded {len(texts)} texts in {elapsed:.2f}s ({len(texts) / elapsed:.1f} texts/sec).")
+        return vectors
+
+class CachedEmbeddings(Embeddings):
+    """
+    A LangChain embedding function backed by an in-process EmbeddingStage.
+
+    It lets the vector store look queries up in the same cache as index builds;
+    new query embeddings are not stored. With a query batcher, the queries of
+    concurrent requests are embedded together.
+    """
+    def __init__(self, stage: EmbeddingStage, query_batcher: Optional["QueryEmbeddingBatcher"] = None):
+        self.stage = stage
+        self.query_batcher = query_batcher
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.stage.embed(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        if self.query_batcher is not None:
+            return self.query_batcher.embed_query(text).tolist()
+        return self.stage.embed([text], store=False)[0].tolist()
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embeds many queries in one call, without storing them in the cache.
+        """
+        return self.stage.embed(texts, store=False).tolist()
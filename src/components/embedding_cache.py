@@ -0,0 +1,171 @@
+"""
+Remembering embeddings on disk so the same text is never run through the model twice
+"""
+
+import os
+import sys
+import sqlite3
+import hashlib
+import threading
+import numpy as np
+from typing import Dict, List
+from src.exception import CustomException
+from src.utils import get_artifacts_dir
+
+# A simple logger for the file
+from src.logger import get_logger
+logger = get_logger(__name__)
+
+EMBEDDING_CACHE_FILE_NAME = "embedding_cache.sqlite3"
+
+# SQLite limits the number of bound parameters per statement
+_LOOKUP_BATCH_SIZE = 500
+
+def get_embedding_cache_path(persist_directory: str) -> str:
+    """
+    Returns the path of the embedding cache, in the vector store's artifacts folder.
+
+    Args:
+        persist_directory: The directory where the ChromaDB database is saved.
+
+    Returns:
+        The path of the SQLite cache file.
+    """
+    return os.path.join(get_artifacts_dir(persist_directory), EMBEDDING_CACHE_FILE_NAME)
+
+def normalize_text(text: str) -> str:
+    """
+    Collapses all whitespace to single spaces, which does not change the model's tokens.
+    """
+    return " ".join(text.split())
+
+def hash_text(text: str) -> str:
+    """
+    Returns the hash used as the cache key for an already normalized text.
+    """
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=20).hexdigest()
+
+class EmbeddingCache:
+    """
+    An on-disk cache of embeddings keyed by (model name, normalized text hash).
+
+    The SQLite connection is opened lazily and re-opened after a fork, so one
+    cache object can be shared by a process that later spawns workers. Hit and
+    miss counters are kept per process and exposed through stats().
+    """
+    def __init__(self, cache_path: str):
+        self.cache_path = cache_path
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._connection = None
+        self._pid = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None or self._pid != os.getpid():
+            os.makedirs(os.path.dirname(os.path.abspath(self.cache_path)), exist_ok=True)
+            # Index builds and every app worker share the file, so wait for the write lock instead of failing
+            connection = sqlite3.connect(self.cache_path, timeout=60, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "model_name TEXT NOT NULL, text_hash TEXT NOT NULL, vector BLOB NOT NULL, "
+                "PRIMARY KEY (model_name, text_hash)) WITHOUT ROWID"
+            )
+            connection.commit()
+            self._connection = connection
+            self._pid = os.getpid()
+        return self._connection
+
+    def get_many(self, model_name: str, texts: List[str]) -> Dict[int, np.ndarray]:
+        """
+        Looks up the embeddings of normalized texts.
+
+        Args:
+            model_name: The embedding model the vectors were computed with.
+            texts: The normalized texts to look up.
+
+        Returns:
+            A dictionary mapping the index of each cached text to its vector.
+        """
+        try:
+            hashes = [hash_text(text) for text in texts]
+            found = {}
+            with self._lock:
+                connection = self._connect()
+                unique_hashes = list(dict.fromkeys(hashes))
+                for start in range(0, len(unique_hashes), _LOOKUP_BATCH_SIZE):
+                    batch = unique_hashes[start:start + _LOOKUP_BATCH_SIZE]
+                    placeholders = ",".join("?" * len(batch))
+                    rows = connection.execute(
+                        f"SELECT text_hash, vector FROM embeddings WHERE model_name = ? AND text_hash IN ({placeholders})",
+                        [model_name, *batch],
+                    ).fetchall()
+                    found.update((text_hash, np.frombuffer(vector, dtype=np.float32)) for text_hash, vector in rows)
+
+                cached = {index: found[text_hash] for index, text_hash in enumerate(hashes) if text_hash in found}
+                self.hits += len(cached)
+                self.misses += len(texts) - len(cached)
+            return cached
+        except Exception as e:
+            raise CustomException(e, sys) from e
+
+    def put_many(self, model_name: str, texts: List[str], vectors: np.ndarray):
+        """
+        Stores the embeddings of normalized texts.
+
+        Args:
+            model_name: The embedding model the vectors were computed with.
+            texts: The normalized texts that were embedded.
+            vectors: The vectors, one row per text.
+        """
+        if not texts:
+            return
+
+        try:
+            rows = [
+                (model_name, hash_text(text), np.asarray(vector, dtype=np.float32).tobytes())
+                for text, vector in zip(texts, vectors)
+            ]
+            with self._lock:
+                connection = self._connect()
+                connection.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?)", rows)
+                connection.commit()
+        except Exception as e:
+            raise CustomException(e, sys) from e
+
+    def stats(self) -> Dict:
+        """
+        Returns the hit and miss counters of this process.
+        """
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+    def close(self):
+        """
+        Closes the SQLite connection.
+        """
+        with self._lock:
+            if self._connection is not None and self._pid == os.getpid():
+                self._connection.close()
+            self._connection = None
+
+if __name__ == '__main__':
+    # Print how many embeddings are cached per model
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    project_root = os.path.join(current_dir, '..', '..')
+    cache_path = get_embedding_cache_path(os.path.join(project_root, 'db'))
+
+    if not os.path.exists(cache_path):
+        logger.warning(f"No embedding cache found at '{cache_path}'.")
+    else:
+        cache = EmbeddingCache(cache_path)
+        rows = cache._connect().execute("SELECT model_name, COUNT(*) FROM embeddings GROUP BY model_name").fetchall()
+        for model_name, count in rows:
+            print(f"{model_name}: {count} cached embeddings")
+        cache.close()
@@ -0,0 +1,268 @@
+"""
+Exporting the vector store to a compact, read-only index that is memory-mapped at query time
+"""
+
+import os
+import sys
+import json
+import argparse
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+from langchain.docstore.document import Document
+from src.components.document_attributes import matches_metadata_filter
+from src.exception import CustomException
+from src.utils import get_artifacts_dir, load_artifact, save_artifact
+
+# A simple logger for the file
+from src.logger import get_logger
+logger = get_logger(__name__)
+
+EXPORTED_INDEX_VERSION = 3
+EXPORTED_INDEX_KIND = "exported_index"
+QUANTIZATIONS = ("int8", "float16")
+
+def get_exported_index_dir(persist_directory: str) -> str:
+    """
+    Returns the default directory of the exported index, in the vector store's artifacts folder.
+    """
+    return os.path.join(get_artifacts_dir(persist_directory), "exported_index")
+
+def _nearest_centroids(vectors: np.ndarray, centroids: np.ndarray, block_size: int = 10000) -> np.ndarray:
+    centroid_norms = (centroids ** 2).sum(axis=1)
+    assignments = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), block_size):
+        block = vectors[start:start + block_size]
+        assignments[start:start + block_size] = np.argmax(2 * block @ centroids.T - centroid_norms, axis=1)
+    return assignments
+
+def _train_centroids(vectors: np.ndarray, num_lists: int, iterations: int = 10,
+                     sample_size: int = 50000, seed: int = 0) -> np.ndarray:
+    """
+    Runs a few rounds of k-means on a sample of the vectors to get the inverted list centroids.
+    """
+    rng = np.random.default_rng(seed)
+    sample = vectors[rng.choice(len(vectors), min(sample_size, len(vectors)), replace=False)]
+    centroids = sample[rng.choice(len(sample), num_lists, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = _nearest_centroids(sample, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, sample)
+        counts = np.bincount(assignments, minlength=num_lists)
+        non_empty = counts > 0
+        centroids[non_empty] = sums[non_empty] / counts[non_empty, None]
+    return centroids
+
+def export_vector_store(vector_store, export_dir: str, model_name: str, quantization: str = "int8",
+                        num_lists: Optional[int] = None, page_size: int = 5000) -> Dict:
+    """
+    Writes every chunk of the vector store to a compact, read-only index directory.
+
+    Vectors are grouped into inverted lists by k-means centroid and stored
+    quantized (int8 with a per-row scale, or float16). Ids, texts and metadata
+    are stored as flat byte arrays with offsets. Every file is a .npy array, so
+    the whole index can be memory-mapped and shared through the page cache.
+
+    Args:
+        vector_store: The ChromaDB vector store.
+        export_dir: The directory to write the index to. It is replaced if it exists.
+        model_name: The embedding model the vectors were computed with.
+        quantization: 'int8' or 'float16'.
+        num_lists: The number of inverted lists. Defaults to about sqrt(number of chunks).
+        page_size: The number of chunks read from the vector store at a time.
+
+    Returns:
+        The metadata written to the artifact header.
+    """
+    if quantization not in QUANTIZATIONS:
+        raise ValueError(f"Quantization must be one of {QUANTIZATIONS}, got '{quantization}'.")
+
+    try:
+        ids, texts, metadatas, vector_pages = [], [], [], []
+        offset = 0
+        while True:
+            page = vector_store.get(include=["documents", "metadatas", "embeddings"], limit=page_size, offset=offset)
+            if not len(page["ids"]):
+                break
+            ids.extend(page["ids"])
+            texts.extend(page["documents"])
+            metadatas.extend(metadata or {} for metadata in page["metadatas"])
+            vector_pages.append(np.asarray(page["embeddings"], dtype=np.float32))
+            offset += len(page["ids"])
+        if not ids:
+            raise ValueError("The vector store is empty; nothing to export.")
+        vectors = np.vstack(vector_pages)
+
+        # Step 1: Group the vectors into inverted lists so a query only scans a few of them
+        num_lists = num_lists or max(1, int(np.sqrt(len(ids))))
+        num_lists = min(num_lists, len(ids))
+        centroids = _train_centroids(vectors, num_lists) if num_lists > 1 else vectors.mean(axis=0, keepdims=True)
+        assignments = _nearest_centroids(vectors, centroids)
+        order = np.argsort(assignments, kind="stable")
+        list_offsets = np.zeros(num_lists + 1, dtype=np.int64)
+        list_offsets[1:] = np.cumsum(np.bincount(assignments, minlength=num_lists))
+        vectors = vectors[order]
+
+        # Step 2: Quantize the vectors and keep what is needed to compute L2 distances
+        if quantization == "int8":
+            scales = np.abs(vectors).max(axis=1) / 127
+            scales[scales == 0] = 1.0
+            stored_vectors = np.round(vectors / scales[:, None]).astype(np.int8)
+            restored = stored_vectors.astype(np.float32) * scales[:, None]
+        else:
+            scales = np.ones(len(vectors), dtype=np.float32)
+            stored_vectors = vectors.astype(np.float16)
+            restored = stored_vectors.astype(np.float32)
+        squared_norms = (restored ** 2).sum(axis=1).astype(np.float32)
+
+        # Step 3: Save it as an artifact, which is written to a temporary directory and swapped in
+        # Ids sorted as fixed-width bytes, with their rows, so lookups binary-search the mapped file
+        encoded_ids = np.array([ids[i].encode("utf-8") for i in order])
+        id_order = np.argsort(encoded_ids, kind="stable")
+        meta = {
+            "version": EXPORTED_INDEX_VERSION,
+            "model_name": model_name,
+            "quantization": quantization,
+            "count": len(ids),
+            "dimension": int(vectors.shape[1]),
+            "num_lists": num_lists,
+        }
+        save_artifact(
+            export_dir, EXPORTED_INDEX_KIND, metadata=meta,
+            arrays={
+                "vectors": stored_vectors,
+                "scales": scales.astype(np.float32),
+                "squared_norms": squared_norms,
+                "centroids": centroids.astype(np.float32),
+                "list_offsets": list_offsets,
+                "sorted_ids": encoded_ids[id_order],
+                "sorted_id_rows": id_order.astype(np.int64),
+            },
+            strings={
+                "ids": [ids[i] for i in order],
+                "texts": [texts[i] for i in order],
+                "metadata": [json.dumps(metadatas[i]) for i in order],
+            },
+        )
+
+        size_mb = sum(os.path.getsize(os.path.join(export_dir, name)) for name in os.listdir(export_dir)) / (1024 * 1024)
+        logger.info(f"Exported {len(ids)} chunks ({quantization}, {num_lists} lists, {size_mb:.1f} MB) to '{export_dir}'.")
+        return meta
+    except Exception as e:
+        raise CustomException(e, sys) from e
+
+class ExportedIndex:
+    """
+    A read-only, memory-mapped index written by export_vector_store.
+
+    Opening it only reads the artifact header and maps the arrays, so startup is almost
+    instant and processes on the same host share the pages through the OS
+    cache. A query scores the centroids, scans the nprobe closest inverted
+    lists and returns approximate squared L2 distances like Chroma does.
+    """
+    def __init__(self, export_dir: str, embeddings, model_name: str, nprobe: int = 8):
+        try:
+            self._artifact = load_artifact(export_dir, kind=EXPORTED_INDEX_KIND)
+            self.meta = self._artifact.metadata
+            if self.meta["version"] != EXPORTED_INDEX_VERSION:
+                raise ValueError(f"Unsupported exported index version {self.meta['version']}.")
+            if self.meta["model_name"] != model_name:
+                raise ValueError(f"Index was built with '{self.meta['model_name']}', not '{model_name}'.")
+
+            self.embeddings = embeddings
+            self.nprobe = nprobe
+            self._arrays = self._artifact.arrays
+            self._centroid_norms = (np.asarray(self._arrays["centroids"]) ** 2).sum(axis=1)
+            logger.info(f"Exported index with {self.meta['count']} chunks opened from '{export_dir}'.")
+        except Exception as e:
+            raise CustomException(e, sys) from e
+
+    def _string(self, name: str, row: int) -> str:
+        return self._artifact.get_string(name, row)
+
+    def _document(self, row: int) -> Document:
+        return Document(page_content=self._string("texts", row), metadata=json.loads(self._string("metadata", row)))
+
+    def query(self, query_embedding: List[float], k: int,
+              where: Optional[Dict] = None) -> List[Tuple[str, Document, float]]:
+        """
+        Finds the approximate nearest chunks to a query embedding.
+
+        Args:
+            query_embedding: The embedding of the user's question.
+            k: The number of results to return.
+            where: A metadata filter. It is checked on the probed chunks, closest first.
+
+        Returns:
+            A list of (chunk id, document, squared L2 distance) tuples, closest first.
+        """
+        query_vector = np.asarray(query_embedding, dtype=np.float32)
+        centroid_scores = 2 * self._arrays["centroids"] @ query_vector - self._centroid_norms
+        probe_count = min(self.nprobe, len(centroid_scores))
+        probed_lists = np.argpartition(-centroid_scores, probe_count - 1)[:probe_count]
+
+        rows, distances = [], []
+        list_offsets = self._arrays["list_offsets"]
+        for list_index in probed_lists:
+            start, end = int(list_offsets[list_index]), int(list_offsets[list_index + 1])
+            if start == end:
+                continue
+            block = self._arrays["vectors"][start:end].astype(np.float32)
+            dots = (block @ query_vector) * self._arrays["scales"][start:end]
+            distances.append(self._arrays["squared_norms"][start:end] - 2 * dots)
+            rows.append(np.arange(start, end))
+        if not rows:
+            return []
+
+        rows, distances = np.concatenate(rows), np.concatenate(distances) + float(query_vector @ query_vector)
+        if where is None:
+            top = np.argsort(distances)[:k]
+            return [(self._string("ids", int(rows[i])), self._document(int(rows[i])), float(distances[i])) for i in top]
+
+        hits = []
+        for i in np.argsort(distances):
+            document = self._document(int(rows[i]))
+            if matches_metadata_filter(document.metadata, where):
+                hits.append((self._string("ids", int(rows[i])), document, float(distances[i])))
+                if len(hits) == k:
+                    break
+        return hits
+
+    def get_by_ids(self, chunk_ids: List[str], where: Optional[Dict] = None) -> Dict[str, Document]:
+        """
+        Fetches chunks by id, leaving out those that don't match the filter.
+
+        Ids are binary-searched in the memory-mapped sorted id array, so no per-process lookup table is built.
+        """
+        sorted_ids = self._arrays["sorted_ids"]
+        if not chunk_ids or not len(sorted_ids):
+            return {}
+        wanted = np.array([chunk_id.encode("utf-8") for chunk_id in chunk_ids])
+        positions = np.minimum(np.searchsorted(sorted_ids, wanted), len(sorted_ids) - 1)
+        found = sorted_ids[positions] == wanted
+        rows = self._arrays["sorted_id_rows"][positions]
+        documents = {
+            chunk_id: self._document(int(row)) for chunk_id, row, is_found in zip(chunk_ids, rows, found) if is_found
+        }
+        return {chunk_id: document for chunk_id, document in documents.items() if matches_metadata_filter(document.metadata, where)}
+
+if __name__ == '__main__':
+    from src.components.model_trainer import MODEL_NAME, load_vector_store
+
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    project_root = os.path.join(current_dir, '..', '..')
+    default_persist_dir = os.path.join(project_root, 'db')
+
+    parser = argparse.ArgumentParser(description="Export the vector store to a compact, memory-mappable index.")
+    parser.add_argument("--persist-dir", default=default_persist_dir, help="Where the vector store is saved.")
+    parser.add_argument("--output", default=None, help="Where to write the exported index.")
+    parser.add_argument("--quantization", choices=QUANTIZATIONS, default="int8", help="How vectors are stored.")
+    parser.add_argument("--num-lists", type=int, default=None, help="Number of inverted lists (defaults to sqrt of the chunk count).")
+    args = parser.parse_args()
+
+    try:
+        vector_store = load_vector_store(args.persist_dir)
+        output_dir = args.output or get_exported_index_dir(args.persist_dir)
+        meta = export_vector_store(vector_store, output_dir, MODEL_NAME, args.quantization, args.num_lists)
+        print(f"Exported {meta['count']} chunks to '{output_dir}'.")
+    except CustomException as e:
+        logger.error(f"Error exporting the vector store: {e}")
@@ -0,0 +1,181 @@
+"""
+Keeping track of what has already been indexed so re-runs only embed what changed
+"""
+
+import os
+import sys
+import json
+import hashlib
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from langchain.docstore.document import Document
+from src.components.document_attributes import DOCUMENT_ATTRIBUTE_KEYS
+from src.exception import CustomException
+
+# A simple logger for the file
+from src.logger import get_logger
+logger = get_logger(__name__)
+
+MANIFEST_FILE_NAME = "index_manifest.json"
+# Bump when the manifest or the chunk ids change; an older manifest is then ignored and the index rebuilt
+MANIFEST_VERSION = 2
+
+def get_manifest_path(persist_directory: str) -> str:
+    """
+    Returns the path of the manifest, inside the vector store directory it describes.
+
+    Args:
+        persist_directory: The directory where the ChromaDB database is saved.
+
+    Returns:
+        The path of the manifest JSON file.
+    """
+    return os.path.join(os.path.abspath(persist_directory), MANIFEST_FILE_NAME)
+
+def get_index_version(persist_directory: str) -> Tuple[int, ...]:
+    """
+    Returns a cheap token that changes whenever the vector store or its manifest is rewritten.
+
+    Args:
+        persist_directory: The directory where the ChromaDB database is saved.
+
+    Returns:
+        A tuple of modification times; compare it with a previous value to detect a rebuild.
+    """
+    sqlite_path = os.path.join(persist_directory, "chroma.sqlite3")
+    paths = [sqlite_path, f"{sqlite_path}-wal", get_manifest_path(persist_directory)]
+    return tuple(os.stat(path).st_mtime_ns if os.path.exists(path) else 0 for path in paths)
+
+def new_manifest(model_name: str) -> Dict:
+    """
+    Returns an empty manifest for the given embedding model.
+    """
+    return {
+        "version": MANIFEST_VERSION,
+        "model_name": model_name,
+        "updated_at": None,
+        "documents": {},
+    }
+
+def load_manifest(manifest_path: str, model_name: str) -> Dict:
+    """
+    Loads the manifest from disk, or returns an empty one if it does not exist or has another version.
+
+    Args:
+        manifest_path: The path of the manifest JSON file.
+        model_name: The embedding model the index is built with.
+
+    Returns:
+        The manifest dictionary.
+    """
+    if not os.path.exists(manifest_path):
+        return new_manifest(model_name)
+
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as file_obj:
+            manifest = json.load(file_obj)
+        if manifest.get("version") != MANIFEST_VERSION:
+            logger.warning(f"Manifest '{manifest_path}' has version {manifest.get('version')}, "
+                           f"expected {MANIFEST_VERSION}. Treating the index as empty.")
+            return new_manifest(model_name)
+        return manifest
+    except Exception as e:
+        raise CustomException(e, sys) from e
+
+def save_manifest(manifest_path: str, manifest: Dict):
+    """
+    Writes the manifest to disk atomically so a crashed run never leaves a half-written file.
+
+    Args:
+        manifest_path: The path of the manifest JSON file.
+        manifest: The manifest dictionary.
+    """
+    try:
+        manifest["updated_at"] = datetime.now().isoformat(timespec="seconds")
+        os.makedirs(os.path.dirname(os.path.abspath(manifest_path)), exist_ok=True)
+        tmp_path = f"{manifest_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file_obj:
+            json.dump(manifest, file_obj, indent=2)
+        os.replace(tmp_path, manifest_path)
+        logger.info(f"Manifest saved to '{manifest_path}' ({len(manifest['documents'])} documents).")
+    except Exception as e:
+        raise CustomException(e, sys) from e
+
+def compute_file_hash(file_path: str, block_size: int = 1 << 20) -> str:
+    """
+    Computes the SHA-256 hash of a file without reading it into memory at once.
+
+    Args:
+        file_path: The path of the file to hash.
+        block_size: The number of bytes read per iteration.
+
+    Returns:
+        The hex digest of the file contents.
+    """
+    hasher = hashlib.sha256()
+    with open(file_path, "rb") as file_obj:
+        for block in iter(lambda: file_obj.read(block_size), b""):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+def compute_chunk_id(chunk: Document, source_key: Optional[str] = None) -> str:
+    """
+    Computes a content-based id for a chunk from its source, page, text and document attributes.
+
+    source_key stands in for the source path, e.g. the path relative to the data
+    directory, so ids don't change when the same corpus is reached through another path.
+    The document attributes are copied into every chunk from the first pages, so they
+    are hashed too: editing page 1 or appending a page gives every chunk of the
+    document a new id, and its metadata is rewritten instead of going stale.
+    """
+    source = source_key if source_key is not None else chunk.metadata.get('source')
+    attributes = json.dumps({key: chunk.metadata.get(key) for key in DOCUMENT_ATTRIBUTE_KEYS}, sort_keys=True)
+    key = f"{source}|{chunk.metadata.get('page')}|{attributes}|{chunk.page_content}"
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+def assign_chunk_ids(chunks: List[Document], source_keys: Optional[Dict[str, str]] = None) -> Tuple[List[Document], List[str]]:
+    """
+    Assigns content-based ids to chunks and drops exact duplicates within the batch.
+
+    The id is also stored in the chunk metadata under 'chunk_id'.
+
+    Args:
+        chunks: A list of Document objects (chunks).
+        source_keys: The key hashed in place of each source path, e.g. its manifest key.
+
+    Returns:
+        A tuple containing the unique chunks and their ids, in the same order.
+    """
+    unique_chunks, chunk_ids, seen = [], [], set()
+    for chunk in chunks:
+        chunk_id = compute_chunk_id(chunk, (source_keys or {}).get(chunk.metadata.get('source')))
+        if chunk_id in seen:
+            continue
+        seen.add(chunk_id)
+        chunk.metadata["chunk_id"] = chunk_id
+        unique_chunks.append(chunk)
+        chunk_ids.append(chunk_id)
+    return unique_chunks, chunk_ids
+
+def find_pdf_files(data_dir: str) -> Dict[str, str]:
+    """
+    Finds every PDF file under a directory.
+
+    Args:
+        data_dir: The directory to scan recursively.
+
+    Returns:
+        A dictionary mapping each PDF path relative to data_dir to its full path.
+    """
+    if not os.path.isdir(data_dir):
+        logger.error(f"Directory not found: {data_dir}")
+        raise FileNotFoundError(f"The directory {data_dir} does not exist.")
+
+    pdf_files = {}
+    for root, _, files in os.walk(data_dir):
+        for file_name in files:
+            if file_name.lower().endswith(".pdf"):
+                full_path = os.path.join(root, file_name)
+                relative_path = os.path.relpath(full_path, data_dir).replace(os.sep, "/")
+                pdf_files[relative_path] = full_path
+    return dict(sorted(pdf_files.items()))
@@ -0,0 +1,200 @@
+"""
+A BM25 inverted index over the chunk texts, for exact matches that embeddings miss
+"""
+
+import os
+import re
+import sys
+import json
+import shutil
+import numpy as np
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+from src.exception import CustomException
+from src.utils import get_artifacts_dir, replace_directory
+
+# A simple logger for the file
+from src.logger import get_logger
+logger = get_logger(__name__)
+
+LEXICAL_INDEX_VERSION = 1
+
+# Keeps parcel numbers, addresses and statute codes such as '123-45-678', '12.3.4' or 'r-1' whole
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[-./:][a-z0-9]+)*")
+TOKEN_PART_PATTERN = re.compile(r"[a-z0-9]+")
+MAX_TOKEN_LENGTH = 40
+
+def get_lexical_index_dir(persist_directory: str, shard: Optional[str] = None) -> str:
+    """
+    Returns the directory of the lexical index, in the vector store's artifacts folder.
+
+    Args:
+        persist_directory: The directory where the ChromaDB database is saved.
+        shard: The shard the index covers. The unsharded index is used if not given.
+
+    Returns:
+        The path of the lexical index directory.
+    """
+    artifacts_dir = get_artifacts_dir(persist_directory)
+    if shard is not None:
+        return os.path.join(artifacts_dir, "lexical_index_shards", shard)
+    return os.path.join(artifacts_dir, "lexical_index")
+
+def tokenize(text: str) -> List[str]:
+    """
+    Splits text into lowercase terms.
+
+    Compound tokens like '123-456' are kept whole and also split into their
+    parts, so both the exact code and its pieces can be matched.
+    """
+    tokens = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        if len(token) > MAX_TOKEN_LENGTH:
+            continue
+        tokens.append(token)
+        if not token.isalnum():
+            tokens.extend(TOKEN_PART_PATTERN.findall(token))
+    return tokens
+
+def build_lexical_index(chunk_ids: List[str], texts: List[str], index_dir: str,
+                        k1: float = 1.5, b: float = 0.75):
+    """
+    Builds a BM25 index and writes it as flat NumPy arrays that can be memory-mapped.
+
+    The index is written to a temporary directory first and swapped in at the end,
+    so readers never see a half-written index.
+
+    Args:
+        chunk_ids: The vector store ids of the chunks.
+        texts: The chunk texts, one per id.
+        index_dir: The directory to write the index to.
+        k1: The BM25 term frequency saturation parameter.
+        b: The BM25 length normalization parameter.
+    """
+    try:
+        postings: Dict[str, List[Tuple[int, int]]] = {}
+        doc_lengths = np.zeros(len(texts), dtype=np.int32)
+        for doc_index, text in enumerate(texts):
+            term_counts = Counter(tokenize(text))
+            doc_lengths[doc_index] = sum(term_counts.values())
+            for term, count in term_counts.items():
+                postings.setdefault(term, []).append((doc_index, count))
+
+        terms = sorted(postings)
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        for term_index, term in enumerate(terms):
+            offsets[term_index + 1] = offsets[term_index] + len(postings[term])
+        posting_docs = np.empty(offsets[-1], dtype=np.int32)
+        posting_tfs = np.empty(offsets[-1], dtype=np.float32)
+        for term_index, term in enumerate(terms):
+            entries = np.asarray(postings[term], dtype=np.int64)
+            posting_docs[offsets[term_index]:offsets[term_index + 1]] = entries[:, 0]
+            posting_tfs[offsets[term_index]:offsets[term_index + 1]] = entries[:, 1]
+
+        # Precompute the per-document part of the BM25 denominator
+        average_length = float(doc_lengths.mean()) if len(texts) else 0.0
+        doc_norms = (k1 * (1 - b + b * doc_lengths / max(average_length, 1e-9))).astype(np.float32)
+
+        tmp_dir = f"{index_dir}.tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        np.save(os.path.join(tmp_dir, "offsets.npy"), offsets)
+        np.save(os.path.join(tmp_dir, "posting_docs.npy"), posting_docs)
+        np.save(os.path.join(tmp_dir, "posting_tfs.npy"), posting_tfs)
+        np.save(os.path.join(tmp_dir, "doc_norms.npy"), doc_norms)
+        with open(os.path.join(tmp_dir, "terms.json"), "w", encoding="utf-8") as file_obj:
+            json.dump(terms, file_obj)
+        with open(os.path.join(tmp_dir, "chunk_ids.json"), "w", encoding="utf-8") as file_obj:
+            json.dump(list(chunk_ids), file_obj)
+        with open(os.path.join(tmp_dir, "meta.json"), "w", encoding="utf-8") as file_obj:
+            json.dump({"version": LEXICAL_INDEX_VERSION, "k1": k1, "b": b, "num_docs": len(texts),
+                       "average_length": average_length}, file_obj)
+
+        replace_directory(tmp_dir, index_dir)
+        logger.info(f"Lexical index with {len(terms)} terms over {len(texts)} chunks saved to '{index_dir}'.")
+    except Exception as e:
+        raise CustomException(e, sys) from e
+
+def build_lexical_index_from_vector_store(vector_store, index_dir: str, page_size: int = 5000):
+    """
+    Rebuilds the lexical index from every chunk currently in the vector store.
+
+    Args:
+        vector_store: The ChromaDB vector store.
+        index_dir: The directory to write the index to.
+        page_size: The number of chunks read from the vector store at a time.
+    """
+    try:
+        chunk_ids, texts = [], []
+        offset = 0
+        while True:
+            page = vector_store.get(include=["documents"], limit=page_size, offset=offset)
+            if not page["ids"]:
+                break
+            chunk_ids.extend(page["ids"])
+            texts.extend(page["documents"])
+            offset += len(page["ids"])
+        build_lexical_index(chunk_ids, texts, index_dir)
+    except Exception as e:
+        raise CustomException(e, sys) from e
+
+class LexicalIndex:
+    """
+    A read-only BM25 index whose postings are memory-mapped from disk.
+
+    Only the vocabulary is held in memory; the posting arrays are paged in
+    by the OS on demand and shared between processes that open the same files.
+    """
+    def __init__(self, index_dir: str):
+        try:
+            with open(os.path.join(index_dir, "meta.json"), "r", encoding="utf-8") as file_obj:
+                meta = json.load(file_obj)
+            if meta["version"] != LEXICAL_INDEX_VERSION:
+                raise ValueError(f"Unsupported lexical index version {meta['version']}.")
+            with open(os.path.join(index_dir, "terms.json"), "r", encoding="utf-8") as file_obj:
+                self.term_ids = {term: term_index for term_index, term in enumerate(json.load(file_obj))}
+            with open(os.path.join(index_dir, "chunk_ids.json"), "r", encoding="utf-8") as file_obj:
+                self.chunk_ids = json.load(file_obj)
+
+            self.k1 = meta["k1"]
+            self.num_docs = meta["num_docs"]
+            self.offsets = np.load(os.path.join(index_dir, "offsets.npy"), mmap_mode="r")
+            self.posting_docs = np.load(os.path.join(index_dir, "posting_docs.npy"), mmap_mode="r")
+            self.posting_tfs = np.load(os.path.join(index_dir, "posting_tfs.npy"), mmap_mode="r")
+            self.doc_norms = np.load(os.path.join(index_dir, "doc_norms.npy"), mmap_mode="r")
+            logger.info(f"Lexical index loaded from '{index_dir}' ({self.num_docs} chunks).")
+        except Exception as e:
+            raise CustomException(e, sys) from e
+
+    def search(self, query: str, k: int = 20) -> List[Tuple[str, float]]:
+        """
+        Scores the chunks against a query with BM25.
+
+        Args:
+            query: The user's question.
+            k: The number of results to return.
+
+        Returns:
+            A list of (chunk id, score) tuples, best first.
+        """
+        term_indices = {self.term_ids[term] for term in tokenize(query) if term in self.term_ids}
+        if not term_indices:
+            return []
+
+        doc_parts, score_parts = [], []
+        for term_index in term_indices:
+            start, end = self.offsets[term_index], self.offsets[term_index + 1]
+            docs = self.posting_docs[start:end]
+            tfs = self.posting_tfs[start:end]
+            document_frequency = end - start
+            idf = np.log(1 + (self.num_docs - document_frequency + 0.5) / (document_frequency + 0.5))
+            doc_parts.append(docs)
+            score_parts.append(idf * tfs * (self.k1 + 1) / (tfs + self.doc_norms[docs]))
+
+        docs = np.concatenate(doc_parts)
+        unique_docs, inverse = np.unique(docs, return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(score_parts))
+
+        top = np.argsort(-scores)[:k] if len(scores) <= k else np.argpartition(-scores, k)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self.chunk_ids[unique_docs[i]], float(scores[i])) for i in top]
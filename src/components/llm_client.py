@@ -0,0 +1,149 @@
+"""
+Talking to the Gemini API over pooled keep-alive connections
+"""
+
+import json
+import time
+import random
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from typing import Iterator, Optional, Tuple
+
+# A simple logger for the file
+from src.logger import get_logger
+logger = get_logger(__name__)
+
+DEFAULT_BASE_URL = "https://generativelanguage.googleapis.com/v1beta"
+DEFAULT_MODEL = "gemini-2.5-flash-preview-05-20"
+
+# Status codes worth retrying: rate limiting and transient server errors
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+class MalformedResponseError(ValueError):
+    """
+    Raised when the API answers with a payload that does not contain any text.
+    """
+
+class GeminiClient:
+    """
+    A thread-safe Gemini client that reuses connections across requests.
+
+    Requests share one requests.Session whose connection pool is sized to
+    max_concurrency, so TLS connections are kept alive between chats. At most
+    max_concurrency calls are in flight at once; further callers wait for a
+    free slot. Connection errors, timeouts, 429 and 5xx responses are retried
+    up to max_retries times with exponential backoff and jitter.
+    """
+    def __init__(self, api_key: str, model: str = DEFAULT_MODEL, base_url: str = DEFAULT_BASE_URL,
+                 timeout: Tuple[float, float] = (5.0, 60.0), max_retries: int = 3,
+                 backoff_seconds: float = 0.5, max_concurrency: int = 8):
+        self.api_key = api_key
+        self.model = model
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_concurrency)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({"Content-Type": "application/json", "x-goog-api-key": api_key})
+
+    def _payload(self, prompt: str) -> dict:
+        return {
+            "contents": [
+                {
+                    "role": "user",
+                    "parts": [{"text": prompt}]
+                }
+            ],
+            "generationConfig": {
+                "responseMimeType": "text/plain"
+            }
+        }
+
+    def _post(self, method: str, prompt: str, stream: bool = False, params: Optional[dict] = None) -> requests.Response:
+        """
+        Posts to the API, retrying transient failures with exponential backoff.
+        """
+        url = f"{self.base_url}/models/{self.model}:{method}"
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self.session.post(url, json=self._payload(prompt), params=params,
+                                             timeout=self.timeout, stream=stream)
+                if response.status_code not in RETRYABLE_STATUS_CODES or attempt == self.max_retries:
+                    response.raise_for_status()
+                    return response
+                retry_after = response.headers.get("Retry-After")
+                response.close()
+                logger.warning(f"Gemini API returned {response.status_code} (attempt {attempt + 1}).")
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                if attempt == self.max_retries:
+                    raise
+                retry_after = None
+                logger.warning(f"Gemini API request failed (attempt {attempt + 1}): {e}")
+
+            delay = self.backoff_seconds * (2 ** attempt) * (1 + random.random())
+            if retry_after is not None and retry_after.isdigit():
+                delay = max(delay, float(retry_after))
+            time.sleep(delay)
+
+    @staticmethod
+    def _extract_text(result: dict) -> str:
+        candidates = result.get("candidates") or []
+        if candidates and candidates[0].get("content") and candidates[0]["content"].get("parts"):
+            return "".join(part.get("text", "") for part in candidates[0]["content"]["parts"])
+        raise MalformedResponseError(f"Unexpected API response structure: {result}")
+
+    def generate(self, prompt: str) -> str:
+        """
+        Sends a prompt and returns the whole answer.
+
+        Args:
+            prompt: The prompt to send.
+
+        Returns:
+            The text of the answer.
+
+        Raises:
+            requests.exceptions.RequestException: If the API can't be reached or keeps failing.
+            MalformedResponseError: If the answer contains no text.
+        """
+        with self._slots:
+            response = self._post("generateContent", prompt)
+            return self._extract_text(response.json())
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        """
+        Sends a prompt and yields the answer text piece by piece as the API produces it.
+
+        Only the initial request is retried; once text has been yielded a failure is raised.
+
+        Args:
+            prompt: The prompt to send.
+
+        Yields:
+            Pieces of the answer text.
+        """
+        with self._slots:
+            response = self._post("streamGenerateContent", prompt, stream=True, params={"alt": "sse"})
+            with response:
+                for line in response.iter_lines(decode_unicode=True):
+                    if not line or not line.startswith("data:"):
+                        continue
+                    try:
+                        text = self._extract_text(json.loads(line[len("data:"):]))
+                    except MalformedResponseError:
+                        # Some events only carry usage or finish metadata
+                        continue
+                    if text:
+                        yield text
+
+    def close(self):
+        """
+        Closes the pooled connections.
+        """
+        self.session.close()
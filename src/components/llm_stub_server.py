@@ -0,0 +1,104 @@
+"""
+A local stand-in for the Gemini API, for exercising the LLM client and the app without network access
+"""
+
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Tuple
+
+# A simple logger for the file
+from src.logger import get_logger
+logger = get_logger(__name__)
+
+def _make_handler(answer: str, latency_seconds: float, chunk_words: int, failures: int, failure_status: int):
+    class StubGeminiHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            logger.debug(format % args)
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            self.rfile.read(length)
+            time.sleep(latency_seconds)
+
+            with self.server.lock:
+                self.server.request_count += 1
+                failing = self.server.request_count <= failures
+            if failing:
+                body = json.dumps({"error": {"code": failure_status, "message": "Injected stub failure."}}).encode("utf-8")
+                self.send_response(failure_status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                return
+
+            if ":streamGenerateContent" in self.path:
+                words = answer.split(" ")
+                pieces = [" ".join(words[i:i + chunk_words]) + " " for i in range(0, len(words), chunk_words)]
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for piece in pieces:
+                    event = json.dumps({"candidates": [{"content": {"parts": [{"text": piece}]}}]})
+                    data = f"data: {event}\r\n\r\n".encode("utf-8")
+                    self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+                    self.wfile.flush()
+                self.wfile.write(b"0\r\n\r\n")
+                return
+
+            body = json.dumps({"candidates": [{"content": {"parts": [{"text": answer}]}}]}).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    return StubGeminiHandler
+
+def start_stub_server(host: str = "127.0.0.1", port: int = 0, answer: str = "This is a stub answer.",
+                      latency_seconds: float = 0.0, chunk_words: int = 3, failures: int = 0,
+                      failure_status: int = 503) -> Tuple[ThreadingHTTPServer, str]:
+    """
+    Starts a stand-in Gemini server on a background thread.
+
+    It answers generateContent with the fixed answer and streamGenerateContent
+    with the same answer split into server-sent events of chunk_words words.
+    The first `failures` requests are answered with failure_status instead, to
+    exercise retries. The server counts requests in its request_count attribute.
+
+    Args:
+        host: The interface to listen on.
+        port: The port to listen on. 0 picks a free port.
+        answer: The text every request is answered with.
+        latency_seconds: An artificial delay before each answer.
+        chunk_words: The number of words per streamed event.
+        failures: The number of initial requests that fail.
+        failure_status: The HTTP status of the failing requests.
+
+    Returns:
+        A tuple containing the server (call shutdown() to stop it) and its base URL.
+    """
+    server = ThreadingHTTPServer((host, port), _make_handler(answer, latency_seconds, chunk_words, failures, failure_status))
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.request_count = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://{host}:{server.server_address[1]}/v1beta"
+    logger.info(f"Stub Gemini server listening on {base_url}.")
+    return server, base_url
+
+if __name__ == '__main__':
+    # Example usage: talk to the stub through the real client
+    from src.components.llm_client import GeminiClient
+
+    server, base_url = start_stub_server(answer="Single-family homes are zoned R-1.", latency_seconds=0.05)
+    client = GeminiClient(api_key="stub", base_url=base_url)
+    print(client.generate("What is the zoning for a single-family home?"))
+    print(list(client.stream("What is the zoning for a single-family home?")))
+    client.close()
+    server.shutdown()
@@ -0,0 +1,150 @@
+"""
+Timing each stage of answering a question and exposing the numbers to Prometheus
+"""
+
+import os
+import time
+import random
+import contextvars
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+from prometheus_client import (
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    generate_latest,
+)
+
+# A simple logger for the file
+from src.logger import get_logger
+logger = get_logger(__name__)
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+STAGE_SECONDS = Histogram(
+    "rag_stage_duration_seconds", "Time spent in each stage of answering a question.",
+    ["stage"], buckets=LATENCY_BUCKETS,
+)
+REQUEST_SECONDS = Histogram(
+    "rag_request_duration_seconds", "End-to-end time to answer a request.",
+    ["endpoint"], buckets=LATENCY_BUCKETS,
+)
+CONTEXT_TOKENS = Histogram(
+    "rag_context_tokens", "Approximate number of tokens in the context sent to the LLM.",
+    buckets=(0, 100, 250, 500, 750, 1000, 1500, 2000, 3000, 4000, 8000),
+)
+RETRIEVED_CHUNKS = Histogram(
+    "rag_retrieved_chunks", "Number of chunks retrieved for a question.",
+    buckets=(0, 1, 2, 4, 8, 16, 32, 64),
+)
+QUERY_EMBEDDING_BATCH_SIZE = Histogram(
+    "rag_query_embedding_batch_size", "Number of concurrent queries embedded in one forward pass.",
+    buckets=(1, 2, 4, 8, 16, 32, 64),
+)
+CACHE_LOOKUPS = Counter(
+    "rag_response_cache_lookups", "Response cache lookups by result.", ["result"],
+)
+ERRORS = Counter(
+    "rag_errors", "Errors while answering questions, by stage and kind.", ["stage", "kind"],
+)
+
+# Share of request traces written to the log; slow requests are always written
+TRACE_LOG_SAMPLE_RATE = float(os.getenv("TRACE_LOG_SAMPLE_RATE", "1.0"))
+TRACE_LOG_SLOW_SECONDS = float(os.getenv("TRACE_LOG_SLOW_SECONDS", "2.0"))
+
+# The trace of the request being handled in this thread (or generator) of execution
+_current_trace = contextvars.ContextVar("rag_trace", default=None)
+
+def start_trace(name: str) -> Dict:
+    """
+    Starts recording the stages of a request.
+
+    Args:
+        name: The name of the request, e.g. the endpoint.
+
+    Returns:
+        The trace; stages timed with trace_stage are appended to its 'spans'.
+    """
+    trace = {"name": name, "start": time.perf_counter(), "spans": []}
+    _current_trace.set(trace)
+    return trace
+
+def finish_trace(trace: Optional[Dict] = None) -> Optional[Dict]:
+    """
+    Stops recording, observes the request latency and logs the stages as structured fields.
+
+    Only TRACE_LOG_SAMPLE_RATE of the traces are logged, plus every request slower
+    than TRACE_LOG_SLOW_SECONDS, so busy servers keep the slow tail without logging every request.
+
+    Args:
+        trace: The trace to finish. Defaults to the current one.
+
+    Returns:
+        The finished trace with its total 'seconds', or None if there was no trace.
+    """
+    trace = trace or _current_trace.get()
+    if trace is None or "seconds" in trace:
+        return trace
+    trace["seconds"] = time.perf_counter() - trace["start"]
+    REQUEST_SECONDS.labels(trace["name"]).observe(trace["seconds"])
+    _current_trace.set(None)
+
+    if trace["seconds"] >= TRACE_LOG_SLOW_SECONDS or random.random() < TRACE_LOG_SAMPLE_RATE:
+        spans_ms = {}
+        for stage, seconds in trace["spans"]:
+            spans_ms[stage] = round(spans_ms.get(stage, 0.0) + seconds * 1000, 2)
+        logger.info(
+            f"Trace {trace['name']}: {trace['seconds'] * 1000:.1f}ms.",
+            extra={"trace": trace["name"], "total_ms": round(trace["seconds"] * 1000, 2), "spans_ms": spans_ms},
+        )
+    return trace
+
+def record_stage(stage: str, seconds: float):
+    """
+    Records the duration of a stage in the stage histogram and the current trace.
+    """
+    STAGE_SECONDS.labels(stage).observe(seconds)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace["spans"].append((stage, seconds))
+
+@contextmanager
+def trace_stage(stage: str):
+    """
+    Times a block and records it with record_stage.
+
+    Args:
+        stage: The name of the stage, e.g. 'embed_query' or 'llm'.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - start)
+
+def format_server_timing(trace: Dict) -> str:
+    """
+    Formats the stages of a trace as a Server-Timing header, so browsers' dev tools show the breakdown.
+    """
+    return ", ".join(f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in trace["spans"])
+
+def render_metrics() -> Tuple[bytes, str]:
+    """
+    Renders all metrics in the Prometheus text format.
+
+    Under gunicorn each worker keeps its own metrics. When PROMETHEUS_MULTIPROC_DIR
+    is set (see gunicorn.conf.py), the workers' values are merged so any worker
+    can answer the scrape for the whole server.
+
+    Returns:
+        A tuple of the response body and its content type.
+    """
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
@@ -4,70 +4,217 @@ In here we load the data andtrain the model
 
 import os
 import sys
-from langchain_community.vectorstores import Chroma
-from langchain_community.embeddings import HuggingFaceEmbeddings
+import numpy as np
 from langchain.docstore.document import Document
-from typing import List
+from typing import TYPE_CHECKING, List, Optional
+from src.components.embedding import EmbeddingStage, CachedEmbeddings
+from src.components.embedding_cache import EmbeddingCache, get_embedding_cache_path
+from src.components.index_manifest import assign_chunk_ids
+from src.components.query_batcher import QueryEmbeddingBatcher
+from src.components.sharding import DEFAULT_COLLECTION_NAME, DEFAULT_SHARD, ShardedVectorStore, get_collection_name
 from src.exception import CustomException
 
 # A simple logger for the file
 from src.logger import get_logger
 logger = get_logger(__name__)
 
+# The Chroma wrapper imports chromadb, which is slow to import, so it is imported where a store is opened
+if TYPE_CHECKING:
+    from langchain_community.vectorstores import Chroma
+
 # Define the model name for the embeddings
 MODEL_NAME = "all-MiniLM-L6-v2"
 
-def setup_vector_store(chunks: List[Document], persist_directory: str) -> Chroma:
+def get_embedding_function(persist_directory: str, query_batch_size: int = 1,
+                           query_batch_wait_ms: float = 0.0) -> CachedEmbeddings:
+    """
+    Returns the embedding function for a vector store, cached on disk next to it.
+
+    Args:
+        persist_directory: The directory where the ChromaDB database is saved.
+        query_batch_size: The most concurrent queries embedded in one forward pass. 1 embeds each query on its own.
+        query_batch_wait_ms: How long a query waits for others to join its batch.
+
+    Returns:
+        A LangChain embedding function.
+    """
+    cache = EmbeddingCache(get_embedding_cache_path(persist_directory))
+    stage = EmbeddingStage(MODEL_NAME, cache=cache)
+    query_batcher = None
+    if query_batch_size > 1:
+        query_batcher = QueryEmbeddingBatcher(stage, max_batch_size=query_batch_size, max_wait_ms=query_batch_wait_ms)
+    return CachedEmbeddings(stage, query_batcher=query_batcher)
+
+def setup_vector_store(chunks: List[Document], persist_directory: str,
+                       embedding_stage: Optional[EmbeddingStage] = None) -> "Chroma":
     """
     Creates a ChromaDB vector store from document chunks.
 
     Args:
         chunks: A list of Document objects (chunks).
         persist_directory: The directory to save the ChromaDB database.
+        embedding_stage: The stage used to embed the chunks. The vector store's own embedding function is used if not given.
 
     Returns:
         A ChromaDB vector store object.
     """
     try:
         # Create an embedding function
-        embeddings = HuggingFaceEmbeddings(model_name=MODEL_NAME)
+        embeddings = get_embedding_function(persist_directory)
         
-        # Create and persist the vector store
-        vector_store = Chroma.from_documents(
-            documents=chunks, 
-            embedding=embeddings, 
-            persist_directory=persist_directory
+        # Create the vector store and bulk-load the chunks under content-based ids
+        from langchain_community.vectorstores import Chroma
+        vector_store = Chroma(
+            persist_directory=persist_directory,
+            embedding_function=embeddings
         )
+        chunks, chunk_ids = assign_chunk_ids(chunks)
+        add_chunks_to_vector_store(vector_store, chunks, chunk_ids, embedding_stage)
         vector_store.persist()
         logger.info(f"Vector store created and saved to '{persist_directory}'.")
         return vector_store
     except Exception as e:
         raise CustomException(e, sys) from e
 
-def load_vector_store(persist_directory: str) -> Chroma:
+def load_vector_store(persist_directory: str, embeddings: Optional[CachedEmbeddings] = None,
+                      collection_name: str = DEFAULT_COLLECTION_NAME) -> "Chroma":
     """
     Loads an existing ChromaDB vector store.
 
     Args:
         persist_directory: The directory where the ChromaDB database is saved.
+        embeddings: An already loaded embedding function to reuse. A new one is created if not given.
+        collection_name: The collection to open, e.g. one shard of a sharded index.
 
     Returns:
         A ChromaDB vector store object.
     """
     try:
         # Create an embedding function
-        embeddings = HuggingFaceEmbeddings(model_name=MODEL_NAME)
+        if embeddings is None:
+            embeddings = get_embedding_function(persist_directory)
         
         # Load the existing vector store
+        from langchain_community.vectorstores import Chroma
         vector_store = Chroma(
+            collection_name=collection_name,
             persist_directory=persist_directory, 
             embedding_function=embeddings
         )
-        logger.info(f"Vector store loaded from '{persist_directory}'.")
+        logger.info(f"Vector store '{collection_name}' loaded from '{persist_directory}'.")
         return vector_store
     except Exception as e:
         raise CustomException(e, sys) from e
 
+def load_sharded_vector_store(persist_directory: str, shards: List[str],
+                              embeddings: Optional[CachedEmbeddings] = None):
+    """
+    Opens every shard of the vector store with one shared embedding function.
+
+    Args:
+        persist_directory: The directory where the ChromaDB database is saved.
+        shards: The shards to open.
+        embeddings: An already loaded embedding function to reuse. A new one is created if not given.
+
+    Returns:
+        A plain ChromaDB vector store when the index is not sharded, otherwise a ShardedVectorStore.
+    """
+    if embeddings is None:
+        embeddings = get_embedding_function(persist_directory)
+    if shards == [DEFAULT_SHARD]:
+        return load_vector_store(persist_directory, embeddings=embeddings)
+
+    vector_stores = {
+        shard: load_vector_store(persist_directory, embeddings=embeddings, collection_name=get_collection_name(shard))
+        for shard in shards
+    }
+    return ShardedVectorStore(vector_stores, embeddings)
+
+def add_chunks_to_vector_store(vector_store: "Chroma", chunks: List[Document], chunk_ids: List[str],
+                               embedding_stage: Optional[EmbeddingStage] = None):
+    """
+    Embeds chunks with the embedding stage and upserts them into the vector store in bulk.
+
+    Args:
+        vector_store: The ChromaDB vector store.
+        chunks: A list of Document objects (chunks).
+        chunk_ids: The ids to store the chunks under, one per chunk.
+        embedding_stage: The stage used to embed the chunks. The vector store's own embedding function is used if not given.
+    """
+    if not chunks:
+        return
+
+    try:
+        if embedding_stage is None:
+            vectors = np.asarray(vector_store._embedding_function.embed_documents([chunk.page_content for chunk in chunks]))
+        else:
+            vectors = embedding_stage.embed([chunk.page_content for chunk in chunks])
+
+        # Write straight to the collection, as large as the client allows per call
+        max_batch_size = vector_store._client.get_max_batch_size()
+        for start in range(0, len(chunks), max_batch_size):
+            end = start + max_batch_size
+            vector_store._collection.upsert(
+                ids=chunk_ids[start:end],
+                embeddings=vectors[start:end].tolist(),
+                metadatas=[chunk.metadata for chunk in chunks[start:end]],
+                documents=[chunk.page_content for chunk in chunks[start:end]],
+            )
+        logger.info(f"Added {len(chunks)} chunks to the vector store.")
+    except Exception as e:
+        raise CustomException(e, sys) from e
+
+def delete_chunks_from_vector_store(vector_store: "Chroma", chunk_ids: List[str]):
+    """
+    Deletes chunks from the vector store by id.
+
+    Args:
+        vector_store: The ChromaDB vector store.
+        chunk_ids: The ids of the chunks to delete.
+    """
+    if not chunk_ids:
+        return
+
+    try:
+        vector_store.delete(ids=list(chunk_ids))
+        logger.info(f"Deleted {len(chunk_ids)} stale chunks from the vector store.")
+    except Exception as e:
+        raise CustomException(e, sys) from e
+
+def clear_vector_store(vector_store: "Chroma", batch_size: int = 5000) -> int:
+    """
+    Deletes every chunk stored in the vector store's database.
+
+    The vector store's own collection is emptied so it stays usable, and every
+    other collection in the same database (e.g. other shards) is dropped.
+
+    Args:
+        vector_store: The ChromaDB vector store.
+        batch_size: The number of chunks deleted per call.
+
+    Returns:
+        The number of chunks deleted.
+    """
+    try:
+        own_collection = vector_store._collection
+        deleted = 0
+        for collection in vector_store._client.list_collections():
+            # Newer Chroma versions list collection names instead of collection objects
+            name = getattr(collection, "name", collection)
+            if name != own_collection.name:
+                deleted += vector_store._client.get_collection(name).count()
+                vector_store._client.delete_collection(name)
+                logger.info(f"Dropped collection '{name}'.")
+
+        while True:
+            chunk_ids = own_collection.get(include=[], limit=batch_size)["ids"]
+            if not chunk_ids:
+                return deleted
+            own_collection.delete(ids=chunk_ids)
+            deleted += len(chunk_ids)
+    except Exception as e:
+        raise CustomException(e, sys) from e
+
 if __name__ == '__main__':
     # Example usage for testing the module
     from src.components.data_ingestion import load_documents_from_pdf
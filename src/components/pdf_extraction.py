@@ -0,0 +1,360 @@
+"""
+Extracting page text and tables from PDFs, with a page-level cache so unchanged pages are never parsed twice
+"""
+
+import os
+import re
+import sys
+import json
+import zlib
+import sqlite3
+import hashlib
+import threading
+from typing import Dict, List, Optional, Tuple
+from langchain.docstore.document import Document
+from src.components.index_manifest import compute_file_hash
+from src.exception import CustomException
+from src.utils import get_artifacts_dir
+
+# A simple logger for the file
+from src.logger import get_logger
+logger = get_logger(__name__)
+
+PAGE_CACHE_FILE_NAME = "page_cache.sqlite3"
+# Bump when the extracted text or tables or the page hash change, so cached pages are extracted again
+EXTRACTION_VERSION = 2
+
+# Table rows are grouped into chunks of at most this many characters, each starting with the header row
+TABLE_CHUNK_CHARS = 1000
+# Layout text lines whose cells are separated by two or more spaces, and which
+# have the same number of cells for at least this many lines, are read as a table
+MIN_TABLE_ROWS = 3
+_CELL_SEPARATOR = re.compile(r"\s{2,}")
+
+def get_page_cache_path(persist_directory: str) -> str:
+    """
+    Returns the path of the page cache, in the vector store's artifacts folder.
+    """
+    return os.path.join(get_artifacts_dir(persist_directory), PAGE_CACHE_FILE_NAME)
+
+def get_extractor_name() -> str:
+    """
+    Returns the extractor in use: pdfplumber when it is installed, which finds tables
+    from ruling lines and word positions, otherwise pypdf's layout mode.
+    """
+    try:
+        import pdfplumber  # noqa: F401
+        return f"pdfplumber-v{EXTRACTION_VERSION}"
+    except ImportError:
+        return f"pypdf-v{EXTRACTION_VERSION}"
+
+class PageCache:
+    """
+    An on-disk cache of extracted pages, keyed by the hash of each page's content stream.
+
+    Each PDF's file hash also maps to the hashes of its pages, so an unchanged
+    file is served without opening it, and a changed file only re-extracts the
+    pages whose content changed. Pages are stored as zlib-compressed JSON.
+    The SQLite connection is opened lazily and re-opened after a fork, so the
+    cache can be used from the ingestion worker processes.
+    """
+    def __init__(self, cache_path: str):
+        self.cache_path = cache_path
+        self._lock = threading.Lock()
+        self._connection = None
+        self._pid = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None or self._pid != os.getpid():
+            os.makedirs(os.path.dirname(os.path.abspath(self.cache_path)), exist_ok=True)
+            # Several ingestion workers write at once, so wait for the lock instead of failing
+            connection = sqlite3.connect(self.cache_path, timeout=60, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS pages ("
+                "extractor TEXT NOT NULL, page_hash TEXT NOT NULL, data BLOB NOT NULL, "
+                "PRIMARY KEY (extractor, page_hash)) WITHOUT ROWID"
+            )
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS documents ("
+                "extractor TEXT NOT NULL, file_hash TEXT NOT NULL, page_hashes TEXT NOT NULL, "
+                "PRIMARY KEY (extractor, file_hash)) WITHOUT ROWID"
+            )
+            connection.commit()
+            self._connection = connection
+            self._pid = os.getpid()
+        return self._connection
+
+    def get_page_hashes(self, extractor: str, file_hash: str) -> Optional[List[str]]:
+        """
+        Returns the page hashes of a PDF seen before, or None.
+        """
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT page_hashes FROM documents WHERE extractor = ? AND file_hash = ?", (extractor, file_hash)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_pages(self, extractor: str, page_hashes: List[str]) -> Dict[str, Dict]:
+        """
+        Returns the cached pages among page_hashes, by hash.
+        """
+        unique_hashes = list(dict.fromkeys(page_hashes))
+        found = {}
+        with self._lock:
+            connection = self._connect()
+            # SQLite limits the number of bound parameters per statement
+            for start in range(0, len(unique_hashes), 500):
+                batch = unique_hashes[start:start + 500]
+                rows = connection.execute(
+                    f"SELECT page_hash, data FROM pages WHERE extractor = ? AND page_hash IN ({','.join('?' * len(batch))})",
+                    [extractor, *batch],
+                ).fetchall()
+                found.update((page_hash, json.loads(zlib.decompress(data))) for page_hash, data in rows)
+        return found
+
+    def put_document(self, extractor: str, file_hash: str, page_hashes: List[str], new_pages: Dict[str, Dict]):
+        """
+        Stores newly extracted pages and the page hashes of a PDF.
+        """
+        rows = [(extractor, page_hash, zlib.compress(json.dumps(page).encode("utf-8")))
+                for page_hash, page in new_pages.items()]
+        with self._lock:
+            connection = self._connect()
+            connection.executemany("INSERT OR REPLACE INTO pages VALUES (?, ?, ?)", rows)
+            connection.execute("INSERT OR REPLACE INTO documents VALUES (?, ?, ?)",
+                               (extractor, file_hash, json.dumps(page_hashes)))
+            connection.commit()
+
+    def close(self):
+        """
+        Closes the SQLite connection.
+        """
+        with self._lock:
+            if self._connection is not None and self._pid == os.getpid():
+                self._connection.close()
+            self._connection = None
+
+def _hash_pdf_object(obj, hasher, seen: set):
+    """
+    Feeds a PDF object into hasher, following references and including the raw bytes
+    of streams, so fonts, ToUnicode maps and form XObjects all count.
+    """
+    from pypdf.generic import ArrayObject, DictionaryObject, IndirectObject, StreamObject
+
+    if isinstance(obj, IndirectObject):
+        # Shared and cyclic objects (e.g. /Parent) are hashed once per page
+        key = (obj.idnum, obj.generation)
+        if key in seen:
+            hasher.update(b"R")
+            return
+        seen.add(key)
+        obj = obj.get_object()
+    if isinstance(obj, DictionaryObject):
+        hasher.update(b"<<")
+        for key in sorted(obj.keys()):
+            # A form's /Parent is part of the page tree, not of what it draws
+            if key == "/Parent":
+                continue
+            hasher.update(key.encode("utf-8"))
+            _hash_pdf_object(obj.raw_get(key), hasher, seen)
+        hasher.update(b">>")
+        if isinstance(obj, StreamObject):
+            # The encoded bytes identify the stream just as well and are not decompressed
+            data = getattr(obj, "_data", None)
+            hasher.update(data if data is not None else obj.get_data())
+    elif isinstance(obj, ArrayObject):
+        hasher.update(b"[")
+        for item in obj:
+            _hash_pdf_object(item, hasher, seen)
+        hasher.update(b"]")
+    else:
+        hasher.update(repr(obj).encode("utf-8"))
+
+def _get_inherited(page, key: str):
+    """
+    Returns a page attribute, looking it up on the parent page tree nodes when the page does not set it.
+    """
+    node = page
+    while node is not None:
+        if key in node:
+            return node.raw_get(key)
+        parent = node.get("/Parent")
+        node = parent.get_object() if parent is not None else None
+    return None
+
+def _hash_page(page) -> str:
+    """
+    Hashes everything that decides a pypdf page's text, without extracting it: the
+    content stream, the resources it draws with (fonts, ToUnicode maps, XObjects,
+    recursively), the page size and the rotation.
+
+    Two pages only share a hash, and so a cache entry, when they produce the same text.
+    """
+    hasher = hashlib.blake2b(digest_size=20)
+    contents = page.get_contents()
+    hasher.update(contents.get_data() if contents is not None else b"")
+    _hash_pdf_object(_get_inherited(page, "/Resources"), hasher, set())
+    hasher.update(repr([float(value) for value in page.mediabox]).encode("ascii"))
+    hasher.update(str(page.rotation).encode("ascii"))
+    return hasher.hexdigest()
+
+def find_layout_tables(layout_text: str) -> List[List[List[str]]]:
+    """
+    Finds tables in layout-preserving text: runs of lines that split into the
+    same number (at least two) of space-separated cells, mostly containing numbers.
+
+    Returns:
+        The tables, each a list of rows of cell strings.
+    """
+    tables, run = [], []
+    def close_run():
+        if len(run) >= MIN_TABLE_ROWS and sum(any(ch.isdigit() for ch in "".join(row)) for row in run) * 2 >= len(run):
+            tables.append(list(run))
+        run.clear()
+
+    for line in layout_text.splitlines():
+        cells = _CELL_SEPARATOR.split(line.strip())
+        if len(cells) < 2:
+            close_run()
+            continue
+        if run and len(cells) != len(run[0]):
+            close_run()
+        run.append(cells)
+    close_run()
+    return tables
+
+def table_to_documents(table: List[List[Optional[str]]], metadata: Dict, table_index: int,
+                       max_chars: int = TABLE_CHUNK_CHARS) -> List[Document]:
+    """
+    Turns a table into chunks of whole rows, each repeating the header row, so every
+    chunk can be read on its own (e.g. one page of a rent roll or fee schedule).
+
+    Args:
+        table: The rows of the table; the first row is the header.
+        metadata: The metadata of the page the table is on.
+        table_index: The position of the table on its page.
+        max_chars: The maximum size of a chunk, unless a single row is longer.
+
+    Returns:
+        The table chunks, with 'content_type' set to 'table'.
+    """
+    rows = [" | ".join(" ".join(str(cell or "").split()) for cell in row) for row in table]
+    rows = [row for row in rows if row.strip(" |")]
+    if len(rows) < 2:
+        return []
+
+    header, documents, part = rows[0], [], []
+    def flush():
+        documents.append(Document(
+            page_content="\n".join([header, *part]),
+            metadata={**metadata, "content_type": "table", "table_index": table_index, "table_part": len(documents)},
+        ))
+        part.clear()
+
+    for row in rows[1:]:
+        if part and len(header) + sum(len(r) + 1 for r in part) + len(row) + 1 > max_chars:
+            flush()
+        part.append(row)
+    flush()
+    return documents
+
+def is_table_chunk(document: Document) -> bool:
+    """
+    Returns whether a document is a table chunk rather than the text of a page.
+    """
+    return document.metadata.get("content_type") == "table"
+
+def _extract_with_pypdf(reader, page_numbers: List[int]) -> Dict[int, Dict]:
+    pages = {}
+    for page_number in page_numbers:
+        page = reader.pages[page_number]
+        # The plain text matches what PyPDFLoader produced, so existing chunk ids stay valid
+        pages[page_number] = {
+            "text": page.extract_text().strip(),
+            "tables": find_layout_tables(page.extract_text(extraction_mode="layout")),
+        }
+    return pages
+
+def _extract_with_pdfplumber(pdf_path: str, page_numbers: List[int]) -> Dict[int, Dict]:
+    import pdfplumber
+
+    pages = {}
+    with pdfplumber.open(pdf_path) as pdf:
+        for page_number in page_numbers:
+            page = pdf.pages[page_number]
+            pages[page_number] = {"text": (page.extract_text() or "").strip(), "tables": page.extract_tables()}
+            # pdfplumber caches layout objects per page; release them as we go
+            page.close()
+    return pages
+
+def extract_pdf_pages(pdf_path: str, cache: Optional[PageCache] = None) -> Tuple[List[Document], int]:
+    """
+    Extracts the text and tables of every page of a PDF.
+
+    With a cache, an unchanged file is served without opening it, and only the
+    pages of a changed file whose content changed are extracted again.
+
+    Args:
+        pdf_path: The path to the PDF file.
+        cache: The page cache, if any.
+
+    Returns:
+        A tuple of the documents and the number of pages served from the cache.
+        There is one document per page, in order, each followed by the chunks of
+        the tables on that page (see table_to_documents).
+    """
+    try:
+        extractor = get_extractor_name()
+        file_hash = compute_file_hash(pdf_path) if cache is not None else None
+        page_hashes = cache.get_page_hashes(extractor, file_hash) if cache is not None else None
+        cached_pages = cache.get_pages(extractor, page_hashes) if page_hashes is not None else {}
+
+        new_pages = {}
+        if page_hashes is None or len(cached_pages) < len(set(page_hashes)):
+            import pypdf
+
+            reader = pypdf.PdfReader(pdf_path)
+            page_hashes = [_hash_page(page) for page in reader.pages]
+            if cache is not None:
+                cached_pages = cache.get_pages(extractor, page_hashes)
+            missing = sorted({number for number, page_hash in enumerate(page_hashes) if page_hash not in cached_pages})
+            if extractor.startswith("pdfplumber"):
+                extracted = _extract_with_pdfplumber(pdf_path, missing)
+            else:
+                extracted = _extract_with_pypdf(reader, missing)
+            labels = reader.page_labels
+            for page_number, page in extracted.items():
+                page["label"] = labels[page_number]
+                new_pages[page_hashes[page_number]] = page
+            if cache is not None:
+                cache.put_document(extractor, file_hash, page_hashes, new_pages)
+
+        pages = {**cached_pages, **new_pages}
+        documents = []
+        for page_number, page_hash in enumerate(page_hashes):
+            page = pages[page_hash]
+            metadata = {"source": pdf_path, "total_pages": len(page_hashes), "page": page_number, "page_label": page["label"]}
+            documents.append(Document(page_content=page["text"], metadata=metadata))
+            for table_index, table in enumerate(page["tables"]):
+                documents.extend(table_to_documents(table, metadata, table_index))
+
+        reused = len(page_hashes) - len(new_pages)
+        logger.info(f"Extracted '{pdf_path}' with {extractor}: {len(page_hashes)} pages, {reused} from the cache.")
+        return documents, reused
+    except Exception as e:
+        raise CustomException(e, sys) from e
+
+if __name__ == '__main__':
+    # Example usage: extract the sample PDF twice; the second run comes from the cache
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    project_root = os.path.join(current_dir, '..', '..')
+    sample_pdf_path = os.path.join(project_root, 'data', 'sample.pdf')
+
+    page_cache = PageCache(get_page_cache_path(os.path.join(project_root, 'db')))
+    for _ in range(2):
+        docs, from_cache = extract_pdf_pages(sample_pdf_path, page_cache)
+        tables = [doc for doc in docs if is_table_chunk(doc)]
+        print(f"{len(docs) - len(tables)} pages, {len(tables)} table chunks, {from_cache} pages from the cache")
+    page_cache.close()
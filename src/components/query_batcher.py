@@ -0,0 +1,120 @@
+"""
+Embedding the queries of concurrent requests together, in one forward pass per batch
+"""
+
+import os
+import sys
+import time
+import queue
+import threading
+import numpy as np
+from concurrent.futures import Future
+from typing import TYPE_CHECKING, List, Tuple
+from src.components.metrics import QUERY_EMBEDDING_BATCH_SIZE
+from src.exception import CustomException
+
+# A simple logger for the file
+from src.logger import get_logger
+logger = get_logger(__name__)
+
+if TYPE_CHECKING:
+    from src.components.embedding import EmbeddingStage
+
+DEFAULT_MAX_BATCH_SIZE = 16
+DEFAULT_MAX_WAIT_MS = 2.0
+
+class QueryEmbeddingBatcher:
+    """
+    Collects the queries of concurrent requests and embeds them in one forward pass.
+
+    The first query of a batch waits at most max_wait_ms for others to arrive, and
+    a batch is embedded as soon as it holds max_batch_size queries. Under load this
+    replaces many batch-size-1 passes, which leave most of the CPU's vector units
+    idle, with a few larger ones. A single background thread runs the model, so
+    request threads no longer compete for torch's threads either.
+
+    The thread is started on first use, and again in each process after a fork,
+    so a batcher created in the gunicorn master works in every worker.
+    """
+    def __init__(self, stage: "EmbeddingStage", max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+                 max_wait_ms: float = DEFAULT_MAX_WAIT_MS):
+        self.stage = stage
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait_seconds = max(0.0, max_wait_ms) / 1000
+        self._lock = threading.Lock()
+        self._queue = None
+        self._pid = None
+
+    def _get_queue(self) -> queue.Queue:
+        """
+        Returns the queue of the current process's worker thread, starting the thread if needed.
+        """
+        with self._lock:
+            if self._queue is None or self._pid != os.getpid():
+                # Threads do not survive a fork, so each process starts its own
+                self._queue = queue.Queue()
+                self._pid = os.getpid()
+                threading.Thread(target=self._run, args=(self._queue,), name="query-embedding-batcher", daemon=True).start()
+            return self._queue
+
+    def embed_query(self, text: str) -> np.ndarray:
+        """
+        Embeds one query, together with any other queries waiting at the same time.
+
+        Args:
+            text: The query to embed.
+
+        Returns:
+            The query's embedding as a float32 vector.
+        """
+        future = Future()
+        self._get_queue().put((text, future))
+        return future.result()
+
+    def _collect_batch(self, pending: queue.Queue) -> List[Tuple[str, Future]]:
+        """
+        Blocks until a query arrives, then gathers more until the batch is full or the wait is over.
+        """
+        batch = [pending.get()]
+        deadline = time.perf_counter() + self.max_wait_seconds
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                # Past the deadline, still take whatever is already queued
+                batch.append(pending.get(timeout=remaining) if remaining > 0 else pending.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self, pending: queue.Queue):
+        while True:
+            batch = self._collect_batch(pending)
+            QUERY_EMBEDDING_BATCH_SIZE.observe(len(batch))
+            try:
+                vectors = self.stage.embed([text for text, _ in batch], store=False)
+            except Exception as e:
+                # Every waiting request gets the error instead of hanging
+                logger.error(f"Failed to embed a batch of {len(batch)} queries: {e}")
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future), vector in zip(batch, vectors):
+                future.set_result(vector)
+
+if __name__ == '__main__':
+    # Example usage: embed queries from several threads at once and report how they were batched
+    from concurrent.futures import ThreadPoolExecutor
+    from src.components.embedding import EmbeddingStage
+
+    try:
+        batcher = QueryEmbeddingBatcher(EmbeddingStage("all-MiniLM-L6-v2"), max_batch_size=16, max_wait_ms=5)
+        batcher.embed_query("warm up")
+        questions = [f"What is the monthly rent for unit {number}?" for number in range(64)]
+
+        start_time = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            results = list(executor.map(batcher.embed_query, questions))
+        elapsed = time.perf_counter() - start_time
+        print(f"Embedded {len(results)} concurrent queries in {elapsed:.3f}s ({len(results) / elapsed:.1f} queries/sec).")
+    except Exception as e:
+        raise CustomException(e, sys) from e
@@ -0,0 +1,119 @@
+"""
+Re-ordering retrieved chunks with a cross-encoder so fewer, better chunks reach the LLM
+"""
+
+import sys
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from typing import TYPE_CHECKING, List, Optional
+from langchain.docstore.document import Document
+from src.components.metrics import ERRORS
+from src.exception import CustomException
+
+# A simple logger for the file
+from src.logger import get_logger
+logger = get_logger(__name__)
+
+# Imported when the model is loaded, so the app starts without paying for torch
+if TYPE_CHECKING:
+    from sentence_transformers import CrossEncoder
+
+DEFAULT_RERANK_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+
+class CrossEncoderReranker:
+    """
+    Scores (query, chunk) pairs with a small cross-encoder in one batched CPU call.
+
+    Each call gets a time budget. If scoring does not finish in time, the
+    candidates are returned in their original retrieval order, so a slow
+    rerank never holds up an answer for longer than the budget. When every
+    worker is already busy, scoring is skipped rather than queued, so
+    requests never wait behind work whose budget has run out.
+    """
+    def __init__(self, model_name: str = DEFAULT_RERANK_MODEL, time_budget_ms: float = 300,
+                 max_length: int = 512, max_workers: int = 2):
+        self.model_name = model_name
+        self.time_budget_ms = time_budget_ms
+        self.max_length = max_length
+        self.max_workers = max_workers
+        self.timeouts = 0
+        self.skipped = 0
+        self._pending = 0
+        self._pending_lock = threading.Lock()
+        self._model = None
+        self._model_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="reranker")
+
+    def _get_model(self) -> "CrossEncoder":
+        with self._model_lock:
+            if self._model is None:
+                from sentence_transformers import CrossEncoder
+                self._model = CrossEncoder(self.model_name, max_length=self.max_length, device="cpu")
+                logger.info(f"Reranker model '{self.model_name}' loaded.")
+            return self._model
+
+    def warm_up(self):
+        """
+        Loads the model and runs one prediction so the first real query is not slowed down.
+        """
+        self._get_model().predict([("warm up", "warm up")], show_progress_bar=False)
+
+    def _score(self, query: str, docs: List[Document]):
+        pairs = [(query, doc.page_content) for doc in docs]
+        return self._get_model().predict(pairs, batch_size=len(pairs), show_progress_bar=False)
+
+    def _finish_pending(self, future):
+        with self._pending_lock:
+            self._pending -= 1
+
+    def rerank(self, query: str, docs: List[Document], top_n: int,
+               time_budget_ms: Optional[float] = None) -> List[Document]:
+        """
+        Returns the top_n documents ordered by cross-encoder score.
+
+        Args:
+            query: The user's question.
+            docs: The candidate documents, in retrieval order.
+            top_n: The number of documents to keep.
+            time_budget_ms: The time allowed for scoring. Defaults to the reranker's budget.
+
+        Returns:
+            The best top_n documents, or the first top_n candidates if the budget ran out.
+        """
+        if len(docs) <= 1:
+            return docs[:top_n]
+
+        budget_ms = self.time_budget_ms if time_budget_ms is None else time_budget_ms
+        start_time = time.perf_counter()
+        with self._pending_lock:
+            if self._pending >= self.max_workers:
+                self.skipped += 1
+                ERRORS.labels("rerank", "busy").inc()
+                logger.warning(f"All {self.max_workers} reranker workers are busy. Using retrieval order.")
+                return docs[:top_n]
+            self._pending += 1
+        try:
+            future = self._executor.submit(self._score, query, docs)
+        except Exception as e:
+            # The slot was reserved for a job that never started, e.g. after shutdown
+            with self._pending_lock:
+                self._pending -= 1
+            raise CustomException(e, sys) from e
+        future.add_done_callback(self._finish_pending)
+        try:
+            scores = future.result(timeout=budget_ms / 1000)
+        except TimeoutError:
+            # A job that has not started yet is dropped; one already scoring runs to the end
+            future.cancel()
+            self.timeouts += 1
+            ERRORS.labels("rerank", "timeout").inc()
+            logger.warning(f"Reranking {len(docs)} candidates exceeded the {budget_ms:.0f} ms budget. Using retrieval order.")
+            return docs[:top_n]
+        except Exception as e:
+            raise CustomException(e, sys) from e
+
+        order = sorted(range(len(docs)), key=lambda i: scores[i], reverse=True)
+        elapsed_ms = (time.perf_counter() - start_time) * 1000
+        logger.info(f"Reranked {len(docs)} candidates in {elapsed_ms:.1f} ms.")
+        return [docs[i] for i in order[:top_n]]
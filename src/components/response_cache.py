@@ -0,0 +1,193 @@
+"""
+Answering repeated and near-duplicate questions without another retrieval and LLM round trip
+"""
+
+import re
+import json
+import time
+import threading
+import numpy as np
+from collections import OrderedDict
+from typing import Dict, FrozenSet, Hashable, List, Optional
+from src.components.lexical_index import tokenize
+
+# A simple logger for the file
+from src.logger import get_logger
+logger = get_logger(__name__)
+
+def normalize_query(query: str) -> str:
+    """
+    Lowercases a query, collapses whitespace and drops trailing punctuation for exact matching.
+    """
+    return re.sub(r"[\s?.!]+$", "", " ".join(query.lower().split()))
+
+def get_identifier_tokens(query: str) -> FrozenSet[str]:
+    """
+    Returns the tokens of a query that contain a digit, such as unit, parcel and street numbers or statute codes.
+
+    Embeddings barely tell 'unit 12' from 'unit 14', so near-duplicate matches must agree on these exactly.
+    """
+    return frozenset(token for token in tokenize(query) if any(ch.isdigit() for ch in token))
+
+def get_cache_scope(shards: Optional[List[str]] = None, filters: Optional[Dict] = None) -> Optional[str]:
+    """
+    Returns the cache scope of a question limited to some shards or document attributes.
+
+    Answers are only reused within the same scope; None stands for the whole index.
+    """
+    if not shards and not filters:
+        return None
+    return json.dumps({"shards": shards, "filters": filters}, sort_keys=True)
+
+class ResponseCache:
+    """
+    An in-memory LRU cache of chat answers with a time-to-live.
+
+    Lookups first try the normalized query text, then the most similar cached
+    query embedding if its cosine similarity reaches similarity_threshold and
+    both questions mention the same numbers and codes (see get_identifier_tokens).
+    Every lookup passes the current index version, and the whole cache is
+    dropped as soon as that version changes, so answers never outlive a rebuild.
+    Answers are only shared between lookups with the same scope (e.g. the
+    shards a question was limited to). The sources an answer was built from
+    are cached with it, so a hit can show them like a fresh answer would.
+    """
+    def __init__(self, max_entries: int = 256, ttl_seconds: float = 3600, similarity_threshold: float = 0.95):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._index_version = None
+        self._lock = threading.Lock()
+
+    def _check_version(self, index_version: Hashable):
+        if index_version != self._index_version:
+            if self._entries:
+                logger.info("Vector store was rebuilt. Clearing the response cache.")
+            self._entries.clear()
+            self._index_version = index_version
+
+    def _evict_expired(self):
+        expiry = time.monotonic() - self.ttl_seconds
+        for key in [key for key, entry in self._entries.items() if entry["created_at"] < expiry]:
+            del self._entries[key]
+
+    def get_exact(self, query: str, index_version: Hashable, scope: Hashable = None) -> Optional[Dict]:
+        """
+        Returns the cached answer and sources for the normalized query text, or None.
+
+        Unlike get, this needs no embedding, so callers can skip embedding the
+        query when it is an exact repeat. A miss is not counted, since the caller
+        is expected to follow up with get.
+
+        Args:
+            query: The user's question.
+            index_version: The current version of the vector store.
+            scope: The part of the index the question was answered from. Defaults to all of it.
+
+        Returns:
+            A dictionary with the cached 'response' and its 'sources', or None if the exact question is not cached.
+        """
+        key = (scope, normalize_query(query))
+        with self._lock:
+            self._check_version(index_version)
+            self._evict_expired()
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            self.exact_hits += 1
+            return _to_result(entry)
+
+    def get(self, query: str, index_version: Hashable, query_embedding: Optional[List[float]] = None,
+            scope: Hashable = None) -> Optional[Dict]:
+        """
+        Returns the cached answer and sources for a query, or None.
+
+        Args:
+            query: The user's question.
+            index_version: The current version of the vector store.
+            query_embedding: The query's embedding, used to match near-duplicate questions.
+            scope: The part of the index the question was answered from. Defaults to all of it.
+
+        Returns:
+            A dictionary with the cached 'response' and its 'sources', or None on a miss.
+        """
+        key = (scope, normalize_query(query))
+        with self._lock:
+            self._check_version(index_version)
+            self._evict_expired()
+
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.exact_hits += 1
+                return _to_result(entry)
+
+            identifiers = get_identifier_tokens(query)
+            keys = [
+                k for k, cached in self._entries.items()
+                if k[0] == scope and cached["embedding"] is not None and cached["identifiers"] == identifiers
+            ]
+            if query_embedding is not None and keys:
+                matrix = np.vstack([self._entries[k]["embedding"] for k in keys])
+                similarities = matrix @ _unit_vector(query_embedding)
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.similarity_threshold:
+                    self._entries.move_to_end(keys[best])
+                    self.semantic_hits += 1
+                    logger.info(f"Semantic cache hit (similarity {similarities[best]:.3f}).")
+                    return _to_result(self._entries[keys[best]])
+
+            self.misses += 1
+            return None
+
+    def put(self, query: str, response: str, index_version: Hashable, query_embedding: Optional[List[float]] = None,
+            scope: Hashable = None, sources: Optional[List[Dict]] = None):
+        """
+        Stores the answer to a query and the sources it was built from, evicting the least recently used entry when full.
+
+        Args:
+            query: The user's question.
+            response: The answer to cache.
+            index_version: The version of the vector store the answer was built from.
+            query_embedding: The query's embedding, used to match near-duplicate questions.
+            scope: The part of the index the answer was built from. Defaults to all of it.
+            sources: The descriptions of the retrieved documents, replayed on a hit.
+        """
+        key = (scope, normalize_query(query))
+        with self._lock:
+            self._check_version(index_version)
+            # Entries without an embedding can still be matched exactly
+            embedding = _unit_vector(query_embedding) if query_embedding is not None else None
+            self._entries[key] = {"response": response, "sources": list(sources or []), "embedding": embedding,
+                                  "identifiers": get_identifier_tokens(query), "created_at": time.monotonic()}
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict:
+        """
+        Returns the hit and miss counters and the current number of entries.
+        """
+        with self._lock:
+            lookups = self.exact_hits + self.semantic_hits + self.misses
+            hits = self.exact_hits + self.semantic_hits
+            return {
+                "entries": len(self._entries),
+                "exact_hits": self.exact_hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            }
+
+def _to_result(entry: Dict) -> Dict:
+    return {"response": entry["response"], "sources": entry["sources"]}
+
+def _unit_vector(vector: List[float]) -> np.ndarray:
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
@@ -0,0 +1,123 @@
+"""
+Finding the chunks that are relevant to a question
+"""
+
+import sys
+import heapq
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+from langchain.docstore.document import Document
+from src.exception import CustomException
+from src.components.index_export import ExportedIndex
+from src.components.sharding import ShardedVectorStore, ShardedLexicalIndex
+
+# A simple logger for the file
+from src.logger import get_logger
+logger = get_logger(__name__)
+
+def query_vector_store(vector_store, query_embedding: List[float], k: int, shards: Optional[List[str]] = None,
+                       where: Optional[Dict] = None) -> List[Tuple[str, Document, float]]:
+    """
+    Runs a nearest-neighbour search and keeps the vector store ids of the hits.
+
+    Args:
+        vector_store: The ChromaDB vector store, an exported index or a sharded store.
+        query_embedding: The embedding of the user's question.
+        k: The number of results to return.
+        shards: The shards of a sharded store to search. Defaults to all of them.
+        where: A metadata filter (see build_metadata_filter). Chroma applies it before ranking.
+
+    Returns:
+        A list of (chunk id, document, distance) tuples, closest first.
+    """
+    try:
+        if isinstance(vector_store, ShardedVectorStore):
+            # Every shard uses the same embedding model, so their distances can be merged directly
+            shard_hits = vector_store.fan_out(lambda store: query_vector_store(store, query_embedding, k, where=where), shards)
+            return heapq.nsmallest(k, (hit for hits in shard_hits for hit in hits), key=lambda hit: hit[2])
+        if isinstance(vector_store, ExportedIndex):
+            return vector_store.query(query_embedding, k, where=where)
+        results = vector_store._collection.query(
+            query_embeddings=[query_embedding],
+            n_results=k,
+            where=where,
+            include=["documents", "metadatas", "distances"],
+        )
+        return [
+            (chunk_id, Document(page_content=text, metadata=metadata or {}), distance)
+            for chunk_id, text, metadata, distance in zip(
+                results["ids"][0], results["documents"][0], results["metadatas"][0], results["distances"][0]
+            )
+        ]
+    except Exception as e:
+        raise CustomException(e, sys) from e
+
+def get_documents_by_ids(vector_store, chunk_ids: List[str], shards: Optional[List[str]] = None,
+                         where: Optional[Dict] = None) -> Dict[str, Document]:
+    """
+    Fetches chunks from the vector store by id.
+
+    Args:
+        vector_store: The ChromaDB vector store, an exported index or a sharded store.
+        chunk_ids: The ids of the chunks to fetch.
+        shards: The shards of a sharded store to look in. Defaults to all of them.
+        where: A metadata filter; chunks that don't match it are left out.
+
+    Returns:
+        A dictionary mapping each id that still exists (and matches the filter) to its document.
+    """
+    if not chunk_ids:
+        return {}
+
+    try:
+        if isinstance(vector_store, ShardedVectorStore):
+            documents = {}
+            for shard_documents in vector_store.fan_out(lambda store: get_documents_by_ids(store, chunk_ids, where=where), shards):
+                documents.update(shard_documents)
+            return documents
+        if isinstance(vector_store, ExportedIndex):
+            return vector_store.get_by_ids(chunk_ids, where=where)
+        results = vector_store.get(ids=list(chunk_ids), where=where, include=["documents", "metadatas"])
+        return {
+            chunk_id: Document(page_content=text, metadata=metadata or {})
+            for chunk_id, text, metadata in zip(results["ids"], results["documents"], results["metadatas"])
+        }
+    except Exception as e:
+        raise CustomException(e, sys) from e
+
+def search_lexical_index(lexical_index, query: str, k: int, shards: Optional[List[str]] = None) -> List[Tuple[str, float]]:
+    """
+    Runs a BM25 search, restricted to the given shards when the index is sharded.
+
+    Args:
+        lexical_index: The lexical index or sharded lexical index.
+        query: The user's question.
+        k: The number of results to return.
+        shards: The shards of a sharded index to search. Defaults to all of them.
+
+    Returns:
+        A list of (chunk id, score) tuples, best first.
+    """
+    if isinstance(lexical_index, ShardedLexicalIndex):
+        return lexical_index.search(query, k, shards=shards)
+    return lexical_index.search(query, k)
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = 60) -> List[str]:
+    """
+    Merges several rankings of ids into one with reciprocal rank fusion.
+
+    Each id scores the sum of 1 / (k + rank) over the rankings it appears in,
+    so ids ranked well by several retrievers rise to the top.
+
+    Args:
+        rankings: The rankings to merge, each a list of ids with the best first.
+        k: The constant that dampens the weight of the top ranks.
+
+    Returns:
+        The fused list of ids, best first.
+    """
+    scores = defaultdict(float)
+    for ranking in rankings:
+        for rank, chunk_id in enumerate(ranking, start=1):
+            scores[chunk_id] += 1.0 / (k + rank)
+    return sorted(scores, key=scores.get, reverse=True)
@@ -0,0 +1,119 @@
+"""
+Splitting the index into shards (e.g. one per brokerage or region) and searching them in parallel
+"""
+
+import re
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+from src.components.lexical_index import get_lexical_index_dir
+from src.exception import CustomException
+
+# A simple logger for the file
+from src.logger import get_logger
+logger = get_logger(__name__)
+
+DEFAULT_SHARD = "default"
+# 'none' keeps everything in one collection; 'directory' uses the top-level folder under the data directory
+SHARD_STRATEGIES = ("none", "directory")
+# The collection LangChain's Chroma wrapper uses when no name is given, so unsharded stores keep working
+DEFAULT_COLLECTION_NAME = "langchain"
+
+def normalize_shard_name(name: str) -> str:
+    """
+    Turns a folder or tenant name into a shard name that is safe to use in a collection name.
+    """
+    shard = re.sub(r"[^a-z0-9_-]+", "-", name.strip().lower()).strip("-_")[:50]
+    return shard or DEFAULT_SHARD
+
+def get_shard_name(relative_path: str, shard_by: str) -> str:
+    """
+    Returns the shard a document belongs to.
+
+    Args:
+        relative_path: The path of the PDF relative to the data directory.
+        shard_by: One of SHARD_STRATEGIES.
+
+    Returns:
+        The shard name. Documents at the top of the data directory go to the default shard.
+    """
+    if shard_by == "none":
+        return DEFAULT_SHARD
+    if shard_by == "directory":
+        parts = relative_path.replace("\\", "/").split("/")
+        return normalize_shard_name(parts[0]) if len(parts) > 1 else DEFAULT_SHARD
+    raise ValueError(f"Unknown sharding strategy '{shard_by}'. Use one of {SHARD_STRATEGIES}.")
+
+def get_collection_name(shard: str) -> str:
+    """
+    Returns the Chroma collection that stores a shard.
+    """
+    return DEFAULT_COLLECTION_NAME if shard == DEFAULT_SHARD else f"shard-{shard}"
+
+def get_shard_lexical_index_dir(persist_directory: str, shard: str) -> str:
+    """
+    Returns the lexical index directory of a shard. The default shard uses the unsharded location.
+    """
+    return get_lexical_index_dir(persist_directory, None if shard == DEFAULT_SHARD else shard)
+
+def get_manifest_shards(manifest: Dict) -> List[str]:
+    """
+    Returns the shards that hold at least one indexed document, or just the default shard.
+    """
+    shards = sorted({entry.get("shard", DEFAULT_SHARD) for entry in manifest["documents"].values()})
+    return shards or [DEFAULT_SHARD]
+
+class ShardedVectorStore:
+    """
+    A set of vector stores, one per shard, that share one embedding function.
+
+    A search can be routed to a subset of the shards. When it covers several,
+    they are queried concurrently and their hits merged, so latency follows the
+    largest shard searched rather than the size of the whole corpus.
+    """
+    def __init__(self, vector_stores: Dict, embeddings, max_workers: Optional[int] = None):
+        self.vector_stores = vector_stores
+        self.embeddings = embeddings
+        self._executor = ThreadPoolExecutor(max_workers=max_workers or len(vector_stores),
+                                            thread_name_prefix="shard-search")
+
+    @property
+    def shards(self) -> List[str]:
+        return sorted(self.vector_stores)
+
+    def fan_out(self, search: Callable, shards: Optional[List[str]] = None) -> List:
+        """
+        Runs search(vector_store) on every selected shard concurrently.
+
+        Args:
+            search: The function to run against each shard's vector store.
+            shards: The shards to search. Defaults to all of them; unknown names are ignored.
+
+        Returns:
+            The result of each search, in shard order.
+        """
+        selected = [self.vector_stores[shard] for shard in (shards or self.shards) if shard in self.vector_stores]
+        try:
+            # One shard does not need a thread hop
+            if len(selected) == 1:
+                return [search(selected[0])]
+            return list(self._executor.map(search, selected))
+        except Exception as e:
+            raise CustomException(e, sys) from e
+
+class ShardedLexicalIndex:
+    """
+    A BM25 index per shard. Hits are merged by score; each shard uses its own term statistics.
+    """
+    def __init__(self, indexes: Dict):
+        self.indexes = indexes
+
+    def search(self, query: str, k: int, shards: Optional[List[str]] = None) -> List[Tuple[str, float]]:
+        """
+        Returns the best k (chunk id, score) tuples across the selected shards, or all of them.
+        """
+        hits = []
+        for shard in shards or sorted(self.indexes):
+            if shard in self.indexes:
+                hits.extend(self.indexes[shard].search(query, k))
+        return sorted(hits, key=lambda hit: hit[1], reverse=True)[:k]
@@ -1,26 +1,176 @@
 import logging
 import os
+import json
+import copy
+import queue
+import atexit
+import multiprocessing
 from  datetime import datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler, WatchedFileHandler
 
 # Define the log directory
-LOG_DIR = "logs"
+# Resolved once, so processes forked after a chdir still write next to the others
+LOG_DIR = os.path.abspath("logs")
 os.makedirs(LOG_DIR, exist_ok=True)
 
 # Define the log file path with a daily timestamp
 LOG_FILE = f"{datetime.now().strftime('%Y-%m-%d')}.log"
 LOG_FILE_PATH = os.path.join(LOG_DIR, LOG_FILE)
 
-# Configure the logger
-logging.basicConfig(
-    filename=LOG_FILE_PATH,
-    format="[ %(asctime)s ] %(lineno)d %(name)s - %(levelname)s - %(message)s",
-    level=logging.INFO,
-)
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# Messages longer than this are cut before they are queued, so one huge payload can't stall the writer
+LOG_MAX_MESSAGE_CHARS = int(os.getenv("LOG_MAX_MESSAGE_CHARS", "2000"))
+# The file is rotated when it reaches this size; 0 disables rotation and reopens the file
+# when logrotate moves it away
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "5"))
+# Records waiting to be written; when the writer falls this far behind, new records are dropped
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+# Attributes every LogRecord has; anything else was passed with 'extra' and is written as a field
+_STANDARD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formats each record as one JSON object per line, including any fields passed with 'extra'.
+    """
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "line": record.lineno,
+            "process": record.process,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _STANDARD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    Hands records to the writer thread without ever waiting on it.
+
+    The message is formatted and truncated here, in the caller's thread, so the
+    queued record holds no references to large objects. If the queue is full
+    the record is dropped and counted instead of blocking the request.
+    """
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        message = record.getMessage()
+        if len(message) > LOG_MAX_MESSAGE_CHARS:
+            message = f"{message[:LOG_MAX_MESSAGE_CHARS]}... [{len(message) - LOG_MAX_MESSAGE_CHARS} more characters]"
+        record.msg, record.args = message, None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+def _make_file_handler(log_file_path: str) -> logging.Handler:
+    if LOG_MAX_BYTES > 0:
+        handler = RotatingFileHandler(log_file_path, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding="utf-8")
+    else:
+        handler = WatchedFileHandler(log_file_path, encoding="utf-8")
+    handler.setFormatter(JsonFormatter())
+    return handler
+
+def _start_listener() -> QueueListener:
+    listener = QueueListener(queue_handler.queue, file_handler, respect_handler_level=True)
+    listener.start()
+    return listener
+
+def _stop_listener():
+    # Writes out whatever is still queued
+    if listener._thread is not None:
+        listener.stop()
+
+def _restart_listener_after_fork():
+    # The writer thread does not survive a fork, so the child gets its own queue and writer
+    global listener, _worker_queue, _worker_listener
+    queue_handler.queue = queue.Queue(LOG_QUEUE_SIZE)
+    listener = _start_listener()
+    _worker_queue = _worker_listener = None
+
+def use_process_log_file():
+    """
+    Switches the current process to its own 'logs/<date>.<pid>.log' file.
+
+    Long-lived forked processes such as gunicorn workers call this after forking.
+    Every file then has a single writer, so rotating one never leaves another
+    process writing into the renamed backup.
+    """
+    global listener, file_handler
+    _stop_listener()
+    file_handler.close()
+    file_handler = _make_file_handler(os.path.join(LOG_DIR, f"{os.path.splitext(LOG_FILE)[0]}.{os.getpid()}.log"))
+    listener = _start_listener()
+
+def get_worker_log_queue() -> multiprocessing.Queue:
+    """
+    Returns the queue through which pool worker processes send their records to this process's log file.
+
+    Pass it to init_worker_logging as the initializer of a ProcessPoolExecutor.
+    """
+    global _worker_queue, _worker_listener
+    if _worker_queue is None:
+        _worker_queue = multiprocessing.Queue(LOG_QUEUE_SIZE)
+        _worker_listener = QueueListener(_worker_queue, file_handler, respect_handler_level=True)
+        _worker_listener.start()
+    return _worker_queue
+
+def init_worker_logging(log_queue: multiprocessing.Queue):
+    """
+    Sends the records of a pool worker process to its parent instead of writing them itself.
+
+    Pool workers exit without running atexit handlers, so records left in their
+    own writer's queue would be lost. The multiprocessing queue is flushed when
+    the worker exits, and the parent writes the records to its file.
+
+    Args:
+        log_queue: The queue returned by get_worker_log_queue in the parent.
+    """
+    _stop_listener()
+    queue_handler.queue = log_queue
+
+def _stop_worker_listener():
+    if _worker_listener is not None:
+        _worker_listener.stop()
+
+# Configure the logger: callers only enqueue, a background thread writes JSON lines to a size-rotated file.
+# Pool workers send their records to the parent (init_worker_logging), and gunicorn workers
+# write to their own '<date>.<pid>.log' file (use_process_log_file), so each file has a single writer.
+file_handler = _make_file_handler(LOG_FILE_PATH)
+queue_handler = NonBlockingQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+
+root_logger = logging.getLogger()
+root_logger.setLevel(LOG_LEVEL)
+root_logger.addHandler(queue_handler)
+
+listener = _start_listener()
+_worker_queue = None
+_worker_listener = None
+os.register_at_fork(after_in_child=_restart_listener_after_fork)
+# Flush whatever is still queued when the process exits
+atexit.register(_stop_listener)
+atexit.register(_stop_worker_listener)
 
 def get_logger(name: str):
     """
     Returns a logger instance with the specified name.
-    
+
     This allows for module-specific logging.
     """
     return logging.getLogger(name)
@@ -30,4 +180,4 @@ def get_logger(name: str):
 if __name__ == "__main__":
     logger = get_logger(__name__)
     logging.info("Logging has started")
-"""
\ No newline at end of file
+"""
@@ -0,0 +1,336 @@
+"""
+Answering a file of questions in bulk, e.g. an analyst's review of a whole portfolio
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set
+from dotenv import load_dotenv
+from src.components.model_trainer import MODEL_NAME, load_sharded_vector_store
+from src.components.index_manifest import get_manifest_path, load_manifest
+from src.components.lexical_index import LexicalIndex, get_lexical_index_dir
+from src.components.sharding import DEFAULT_SHARD, ShardedLexicalIndex, get_manifest_shards, get_shard_lexical_index_dir
+from src.components.response_cache import ResponseCache, get_cache_scope, normalize_query
+from src.components.metrics import CACHE_LOOKUPS, ERRORS
+from src.pipeline.predict_pipeline import build_prompt, describe_sources, get_rag_response
+from src.exception import CustomException
+from src.utils import iter_batches
+
+# A simple logger for the file
+from src.logger import get_logger
+logger = get_logger(__name__)
+
+DEFAULT_MAX_CONCURRENCY = 4
+# Questions are embedded and retrieved this many at a time, while the LLM answers the previous ones
+DEFAULT_RETRIEVAL_BATCH_SIZE = 32
+
+class RateLimiter:
+    """
+    Spaces calls evenly so that at most requests_per_minute start in any minute.
+
+    Spacing calls out, rather than allowing bursts, keeps a large batch under the
+    LLM provider's quota instead of running into 429 responses and backoff.
+    """
+    def __init__(self, requests_per_minute: Optional[float] = None):
+        self.interval = 60.0 / requests_per_minute if requests_per_minute else 0.0
+        self._lock = threading.Lock()
+        self._next_start = 0.0
+
+    def wait(self):
+        """
+        Blocks until the caller may start its call.
+        """
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_start)
+            self._next_start = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+def parse_question(item, line_number: int) -> Dict:
+    """
+    Reads one question, either a string or an object with a 'query' (or 'question')
+    and optionally an 'id', 'shards' and 'filters'. The id defaults to the line number.
+
+    Raises:
+        ValueError: If the item holds no question.
+    """
+    if isinstance(item, str):
+        item = {"query": item}
+    if not isinstance(item, dict):
+        raise ValueError(f"Line {line_number}: expected a question string or object.")
+    query = str(item.get("query") or item.get("question") or "").strip()
+    if not query:
+        raise ValueError(f"Line {line_number}: the question is empty.")
+    return {**item, "id": item.get("id", line_number), "query": query}
+
+def read_questions(lines: Iterable[str]) -> List[Dict]:
+    """
+    Parses questions from JSONL lines, skipping blank ones.
+
+    Raises:
+        ValueError: If a line is not valid JSON or holds no question.
+    """
+    questions = []
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            item = json.loads(line)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Line {line_number}: invalid JSON ({e}).") from e
+        questions.append(parse_question(item, line_number))
+    return questions
+
+def load_questions(input_path: str) -> List[Dict]:
+    """
+    Loads the questions of a JSONL file (see parse_question).
+    """
+    with open(input_path, "r", encoding="utf-8") as file_obj:
+        return read_questions(file_obj)
+
+def get_question_key(question: Dict) -> str:
+    """
+    Returns the key under which questions are deduplicated: the normalized question
+    and the shards and filters it is asked against.
+    """
+    return json.dumps([normalize_query(question["query"]), question.get("shards"), question.get("filters")], sort_keys=True)
+
+def load_completed_ids(output_path: str) -> Set:
+    """
+    Returns the ids already answered in an output file. Failed questions are not
+    included, so they are asked again, and a line cut short by a crash is ignored.
+    """
+    completed = set()
+    if not os.path.exists(output_path):
+        return completed
+    with open(output_path, "r", encoding="utf-8") as file_obj:
+        for line in file_obj:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if "error" not in record:
+                completed.add(record["id"])
+    return completed
+
+def answer_questions(questions: List[Dict], vector_store, generate: Callable[[str], str],
+                     lexical_index=None, reranker=None, rerank_k: int = 40,
+                     max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+                     requests_per_minute: Optional[float] = None,
+                     retrieval_batch_size: int = DEFAULT_RETRIEVAL_BATCH_SIZE,
+                     response_cache: Optional[ResponseCache] = None, index_version=None) -> Iterator[Dict]:
+    """
+    Answers many questions, asking each distinct question only once.
+
+    Questions are embedded a batch at a time in one call to the embedding model,
+    then retrieved, and their prompts are sent to the LLM from a pool of
+    max_concurrency threads. Retrieval of the next batch overlaps with the LLM
+    calls of the previous ones. With a response cache, questions it already
+    holds are answered from it with their cached sources, and new answers are
+    added to it.
+
+    Args:
+        questions: The questions, as returned by parse_question.
+        vector_store: The vector store to search.
+        generate: Sends a prompt to the LLM and returns its answer; it raises on failure.
+        lexical_index: The BM25 index to combine with the vector search, if any.
+        reranker: The cross-encoder used to reorder the candidates, if any.
+        rerank_k: The number of candidates passed to the reranker.
+        max_concurrency: The most LLM calls in flight at once.
+        requests_per_minute: The most LLM calls started per minute, if limited.
+        retrieval_batch_size: The number of distinct questions embedded and retrieved together.
+        response_cache: The cache of previous answers to read and fill, if any.
+        index_version: The current version of the vector store, checked by the response cache.
+
+    Yields:
+        One record per question, in the order answers arrive: its 'id', 'query',
+        and either the 'response' and its 'sources' or an 'error'.
+    """
+    groups = {}
+    for question in questions:
+        groups.setdefault(get_question_key(question), []).append(question)
+    logger.info(f"Answering {len(questions)} questions, {len(groups)} of them distinct.")
+
+    rate_limiter = RateLimiter(requests_per_minute)
+    def ask(prompt: str) -> str:
+        rate_limiter.wait()
+        return generate(prompt)
+
+    def to_records(group: List[Dict], **fields) -> List[Dict]:
+        return [{"id": question["id"], "query": question["query"], **fields} for question in group]
+
+    def lookup(group: List[Dict], query_embedding=None) -> Optional[Dict]:
+        question = group[0]
+        scope = get_cache_scope(question.get("shards"), question.get("filters"))
+        if query_embedding is None:
+            cached = response_cache.get_exact(question["query"], index_version, scope=scope)
+        else:
+            cached = response_cache.get(question["query"], index_version, query_embedding, scope=scope)
+        # An exact-only miss is followed by a full lookup once the query is embedded
+        if cached is not None or query_embedding is not None:
+            CACHE_LOOKUPS.labels("miss" if cached is None else "hit").inc()
+        return cached
+
+    def finish(future) -> List[Dict]:
+        group, sources, query_embedding = pending.pop(future)
+        try:
+            response = future.result()
+        except Exception as e:
+            logger.error(f"Failed to answer '{group[0]['query']}': {e}")
+            ERRORS.labels("batch", "llm").inc()
+            return to_records(group, error=str(e))
+        if response_cache is not None:
+            question = group[0]
+            response_cache.put(question["query"], response, index_version, query_embedding,
+                               scope=get_cache_scope(question.get("shards"), question.get("filters")), sources=sources)
+        return to_records(group, response=response, sources=sources)
+
+    pending = {}
+    executor = ThreadPoolExecutor(max_workers=max(1, max_concurrency), thread_name_prefix="batch-llm")
+    try:
+        for batch in iter_batches(groups.values(), retrieval_batch_size):
+            # Exact repeats of cached questions are answered before anything is embedded
+            if response_cache is not None:
+                misses = []
+                for group in batch:
+                    cached = lookup(group)
+                    if cached is None:
+                        misses.append(group)
+                    else:
+                        yield from to_records(group, **cached)
+                batch = misses
+
+            query_embeddings = vector_store.embeddings.embed_queries([group[0]["query"] for group in batch]) if batch else []
+            for group, query_embedding in zip(batch, query_embeddings):
+                question = group[0]
+                if response_cache is not None:
+                    cached = lookup(group, query_embedding)
+                    if cached is not None:
+                        yield from to_records(group, **cached)
+                        continue
+                try:
+                    context, docs = get_rag_response(question["query"], vector_store, query_embedding=query_embedding,
+                                                     lexical_index=lexical_index, reranker=reranker, rerank_k=rerank_k,
+                                                     shards=question.get("shards"), filters=question.get("filters"))
+                except Exception as e:
+                    logger.error(f"Failed to retrieve documents for '{question['query']}': {e}")
+                    ERRORS.labels("batch", "retrieval").inc()
+                    yield from to_records(group, error=str(e))
+                    continue
+                future = executor.submit(ask, build_prompt(context, question["query"]))
+                pending[future] = (group, describe_sources(docs), query_embedding)
+
+            # Hand back the answers that are ready before retrieving the next batch
+            for future in [future for future in pending if future.done()]:
+                yield from finish(future)
+
+        for future in as_completed(list(pending)):
+            yield from finish(future)
+    finally:
+        # Stop waiting on calls nobody will read when the caller goes away early
+        executor.shutdown(wait=False, cancel_futures=True)
+
+def run_batch(input_path: str, output_path: str, vector_store, generate: Callable[[str], str], **kwargs) -> Dict:
+    """
+    Answers a JSONL file of questions and appends each answer to a JSONL file as soon as it arrives.
+
+    Running it again with the same files resumes: questions already answered in
+    the output are skipped, and questions that failed are asked again.
+
+    Args:
+        input_path: The JSONL file of questions (see parse_question).
+        output_path: The JSONL file the answers are appended to.
+        vector_store: The vector store to search.
+        generate: Sends a prompt to the LLM and returns its answer.
+        **kwargs: Passed on to answer_questions.
+
+    Returns:
+        The number of questions answered, failed and skipped, and the elapsed seconds.
+    """
+    try:
+        start_time = time.perf_counter()
+        questions = load_questions(input_path)
+        completed = load_completed_ids(output_path)
+        remaining = [question for question in questions if question["id"] not in completed]
+        if completed:
+            logger.info(f"Resuming: {len(questions) - len(remaining)} of {len(questions)} questions are already answered.")
+
+        stats = {"questions": len(questions), "answered": 0, "failed": 0, "skipped": len(questions) - len(remaining)}
+        os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+        with open(output_path, "a+", encoding="utf-8") as file_obj:
+            # A crash can leave the last line unfinished; start on a fresh line
+            if file_obj.tell() > 0:
+                file_obj.seek(file_obj.tell() - 1)
+                if file_obj.read(1) != "\n":
+                    file_obj.write("\n")
+            for record in answer_questions(remaining, vector_store, generate, **kwargs):
+                file_obj.write(json.dumps(record) + "\n")
+                file_obj.flush()
+                stats["failed" if "error" in record else "answered"] += 1
+
+        stats["seconds"] = round(time.perf_counter() - start_time, 2)
+        logger.info(f"Batch finished: {stats}.")
+        return stats
+    except Exception as e:
+        raise CustomException(e, sys) from e
+
+if __name__ == "__main__":
+    # Example usage: python src/pipeline/batch_pipeline.py questions.jsonl --output answers.jsonl
+    from src.components.llm_client import GeminiClient, DEFAULT_BASE_URL, DEFAULT_MODEL
+
+    load_dotenv()
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    project_root = os.path.join(current_dir, '..', '..')
+
+    parser = argparse.ArgumentParser(description="Answer a JSONL file of questions about the indexed documents.")
+    parser.add_argument("input", help="JSONL file with one question per line, e.g. {\"id\": 1, \"query\": \"...\"}.")
+    parser.add_argument("--output", help="Where the answers are appended. Defaults to <input>.answers.jsonl.")
+    parser.add_argument("--persist-dir", default=os.path.join(project_root, 'db'), help="Where the vector store is saved.")
+    parser.add_argument("--max-concurrency", type=int, default=DEFAULT_MAX_CONCURRENCY, help="Most LLM calls in flight at once.")
+    parser.add_argument("--requests-per-minute", type=float, default=None, help="Most LLM calls started per minute.")
+    parser.add_argument("--retrieval-batch-size", type=int, default=DEFAULT_RETRIEVAL_BATCH_SIZE,
+                        help="Number of questions embedded and retrieved together.")
+    args = parser.parse_args()
+
+    api_key = os.getenv("GEMINI_API_KEY", "")
+    if not os.path.exists(args.persist_dir):
+        logger.error(f"Vector store not found at '{args.persist_dir}'. Please run 'train_pipeline.py' first.")
+    elif not api_key:
+        logger.error("GEMINI_API_KEY environment variable is not set.")
+    else:
+        try:
+            shards = get_manifest_shards(load_manifest(get_manifest_path(args.persist_dir), MODEL_NAME))
+            vector_store = load_sharded_vector_store(args.persist_dir, shards)
+            if shards == [DEFAULT_SHARD]:
+                lexical_index_dir = get_lexical_index_dir(args.persist_dir)
+                lexical_index = LexicalIndex(lexical_index_dir) if os.path.exists(lexical_index_dir) else None
+            else:
+                lexical_index_dirs = {shard: get_shard_lexical_index_dir(args.persist_dir, shard) for shard in shards}
+                lexical_index = ShardedLexicalIndex({
+                    shard: LexicalIndex(index_dir) for shard, index_dir in lexical_index_dirs.items() if os.path.exists(index_dir)
+                })
+
+            client = GeminiClient(
+                api_key=api_key,
+                model=os.getenv("GEMINI_MODEL", DEFAULT_MODEL),
+                base_url=os.getenv("GEMINI_API_BASE_URL", DEFAULT_BASE_URL),
+                timeout=(5.0, float(os.getenv("GEMINI_TIMEOUT", "60"))),
+                max_retries=int(os.getenv("GEMINI_MAX_RETRIES", "3")),
+                max_concurrency=args.max_concurrency,
+            )
+            output_path = args.output or f"{os.path.splitext(args.input)[0]}.answers.jsonl"
+            stats = run_batch(args.input, output_path, vector_store, client.generate, lexical_index=lexical_index,
+                              max_concurrency=args.max_concurrency, requests_per_minute=args.requests_per_minute,
+                              retrieval_batch_size=args.retrieval_batch_size)
+            print(f"Answered {stats['answered']} questions, {stats['failed']} failed, {stats['skipped']} already answered "
+                  f"({stats['seconds']}s). Answers are in '{output_path}'.")
+        except CustomException as e:
+            logger.error(f"Error running batch pipeline: {e}")
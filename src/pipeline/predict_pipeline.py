@@ -1,42 +1,143 @@
 import os
 import sys
+import logging
 from src.components.model_trainer import load_vector_store
+from src.components.lexical_index import LexicalIndex, get_lexical_index_dir
+from src.components.reranker import CrossEncoderReranker
+from src.components.context_builder import build_context, estimate_tokens
+from src.components.metrics import trace_stage, RETRIEVED_CHUNKS, CONTEXT_TOKENS
+from src.components.document_attributes import build_metadata_filter
+from src.components.retrieval import query_vector_store, get_documents_by_ids, search_lexical_index, reciprocal_rank_fusion
 from src.exception import CustomException
 from src.logger import get_logger
 from langchain.docstore.document import Document
-from typing import List, Tuple
+from typing import Dict, List, Optional, Tuple
 
 logger = get_logger(__name__)
 
-def get_rag_response(query: str, vector_store) -> Tuple[str, List[Document]]:
+# BM25 can't apply metadata filters itself, so it over-fetches and drops the hits that don't match
+FILTERED_LEXICAL_OVERFETCH = 5
+
+def get_rag_response(query: str, vector_store, query_embedding: Optional[List[float]] = None,
+                     lexical_index: Optional[LexicalIndex] = None, k: int = 4,
+                     fetch_k: int = 20, reranker: Optional[CrossEncoderReranker] = None,
+                     rerank_k: int = 40, max_context_tokens: int = 1500,
+                     shards: Optional[List[str]] = None, filters: Optional[Dict] = None) -> Tuple[str, List[Document]]:
     """
     Performs a retrieval-augmented generation query.
 
+    With a lexical index, the top fetch_k vector hits and the top fetch_k BM25
+    hits are merged with reciprocal rank fusion before keeping the best k.
+    With a reranker, rerank_k candidates are retrieved instead and the
+    cross-encoder picks the best k of them. The chunks are then merged,
+    deduplicated and packed into at most max_context_tokens of context.
+    With a sharded store, only the given shards are searched, concurrently.
+    Filters on document attributes restrict the candidates before the vector search.
+
     Args:
         query: The user's question.
-        vector_store: The ChromaDB vector store.
+        vector_store: The ChromaDB vector store, an exported index or a sharded store.
+        query_embedding: The query's embedding, if the caller already computed it.
+        lexical_index: The BM25 index to combine with the vector search, if any.
+        k: The number of documents to retrieve.
+        fetch_k: The number of candidates each retriever contributes to the fusion.
+        reranker: The cross-encoder used to reorder the candidates, if any.
+        rerank_k: The number of candidates passed to the reranker.
+        max_context_tokens: The approximate token budget of the context.
+        shards: The shards to search, e.g. one tenant's documents. Defaults to all of them.
+        filters: Document attributes to filter on, e.g. {"doc_type": "lease"} (see build_metadata_filter).
 
     Returns:
-        A tuple containing the LLM's response and the retrieved source documents.
+        A tuple containing the context for the LLM and the passages it was built from.
+
+    Raises:
+        ValueError: If the filters are invalid.
     """
+    where = build_metadata_filter(filters)
     try:
         # Step 1: Retrieve relevant documents (chunks)
-        retrieved_docs = vector_store.similarity_search(query, k=4)
-        
-        # Step 2: Format the retrieved documents as context for the LLM
-        context = "\n\n".join([doc.page_content for doc in retrieved_docs])
+        if query_embedding is None:
+            with trace_stage("embed_query"):
+                query_embedding = vector_store.embeddings.embed_query(query)
+
+        candidates_k = max(rerank_k, k) if reranker is not None else k
+        if lexical_index is None:
+            with trace_stage("vector_search"):
+                retrieved_docs = [
+                    doc for _, doc, _ in query_vector_store(vector_store, query_embedding, k=candidates_k, shards=shards, where=where)
+                ]
+        else:
+            lexical_k = max(fetch_k, candidates_k)
+            with trace_stage("vector_search"):
+                vector_hits = query_vector_store(vector_store, query_embedding, k=lexical_k, shards=shards, where=where)
+            docs_by_id = {chunk_id: doc for chunk_id, doc, _ in vector_hits}
+            with trace_stage("lexical_search"):
+                if where is None:
+                    lexical_hits = search_lexical_index(lexical_index, query, k=lexical_k, shards=shards)
+                else:
+                    lexical_hits = search_lexical_index(lexical_index, query, k=lexical_k * FILTERED_LEXICAL_OVERFETCH, shards=shards)
+                    docs_by_id.update(get_documents_by_ids(
+                        vector_store, [chunk_id for chunk_id, _ in lexical_hits if chunk_id not in docs_by_id], shards=shards, where=where
+                    ))
+                    lexical_hits = [hit for hit in lexical_hits if hit[0] in docs_by_id][:lexical_k]
+            with trace_stage("fusion"):
+                fused_ids = reciprocal_rank_fusion([
+                    [chunk_id for chunk_id, _, _ in vector_hits],
+                    [chunk_id for chunk_id, _ in lexical_hits],
+                ])[:candidates_k]
+
+                # Lexical-only hits still need their text and metadata
+                docs_by_id.update(get_documents_by_ids(vector_store, [i for i in fused_ids if i not in docs_by_id], shards=shards))
+                retrieved_docs = [docs_by_id[chunk_id] for chunk_id in fused_ids if chunk_id in docs_by_id]
+
+        # Step 1b: Keep the candidates the cross-encoder scores highest
+        if reranker is not None:
+            with trace_stage("rerank"):
+                retrieved_docs = reranker.rerank(query, retrieved_docs, top_n=k)
+        RETRIEVED_CHUNKS.observe(len(retrieved_docs))
         
         logger.info(f"Retrieved {len(retrieved_docs)} documents for the query.")
-        logger.info(f"The documents retrieved are: {retrieved_docs}.")
+        # Only the sources are logged; writing whole chunks on every request is slow and bloats the log
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Retrieved chunks: {[(doc.metadata.get('source'), doc.metadata.get('page')) for doc in retrieved_docs]}.")
+
+        # Step 2: Merge, deduplicate and pack the retrieved documents into the LLM context
+        with trace_stage("build_context"):
+            context, passages = build_context(retrieved_docs, max_tokens=max_context_tokens)
+        CONTEXT_TOKENS.observe(estimate_tokens(context))
 
         # The actual LLM call will be handled by the Flask application,
         # which will combine the context and the query.
-        return context, retrieved_docs
+        return context, passages
         
     except Exception as e:
         raise CustomException(e, sys) from e
         # return "An error occurred while processing your request.", []
 
+def build_prompt(context: str, user_query: str) -> str:
+    """Combines the retrieved context and the user's question into the LLM prompt."""
+    return f"""
+            You are a helpful real estate assistant. Use the following context to answer the user's question. 
+            If the answer is not in the context, say "I'm sorry, I cannot answer this question based on the provided documents."
+            Do not make up any information.
+            
+            Context:
+            {context}
+            
+            User's question: {user_query}
+            
+            Answer:
+        """
+
+def describe_sources(docs) -> list:
+    """Returns the source file and page of each retrieved document, without duplicates."""
+    sources = []
+    for doc in docs:
+        source = {"source": os.path.basename(str(doc.metadata.get('source', ''))), "page": doc.metadata.get('page')}
+        if source not in sources:
+            sources.append(source)
+    return sources
+
 if __name__ == "__main__":
     current_dir = os.path.dirname(os.path.abspath(__file__))
     project_root = os.path.join(current_dir, '..', '..')
@@ -47,8 +148,10 @@ if __name__ == "__main__":
     else:
         try:
             vector_store = load_vector_store(persist_dir)
+            lexical_index_dir = get_lexical_index_dir(persist_dir)
+            lexical_index = LexicalIndex(lexical_index_dir) if os.path.exists(lexical_index_dir) else None
             test_query = "What is the zoning for a single-family home?"
-            context, docs = get_rag_response(test_query, vector_store)
+            context, docs = get_rag_response(test_query, vector_store, lexical_index=lexical_index)
             print("\n--- Retrieved Context ---")
             print(context[:500] + "...")
             print("\n--- Source Documents ---")
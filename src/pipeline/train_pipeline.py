@@ -1,9 +1,41 @@
 import os
 import sys
-from src.components.data_ingestion import load_documents_from_pdf
+import shutil
+import argparse
+from src.components.data_ingestion import load_documents_from_pdf, iter_documents_from_pdfs
 from src.components.data_transformation import chunk_documents
-from src.components.model_trainer import setup_vector_store
+from src.components.model_trainer import (
+    MODEL_NAME,
+    get_embedding_function,
+    setup_vector_store,
+    load_vector_store,
+    add_chunks_to_vector_store,
+    delete_chunks_from_vector_store,
+    clear_vector_store,
+)
+from src.components.embedding import EmbeddingStage
+from src.components.embedding_cache import EmbeddingCache, get_embedding_cache_path
+from src.components.lexical_index import build_lexical_index_from_vector_store, get_lexical_index_dir
+from src.components.document_attributes import ATTRIBUTES_VERSION
+from src.components.pdf_extraction import get_extractor_name, get_page_cache_path, is_table_chunk
+from src.components.sharding import (
+    DEFAULT_SHARD,
+    SHARD_STRATEGIES,
+    get_shard_name,
+    get_collection_name,
+    get_shard_lexical_index_dir,
+)
+from src.components.index_manifest import (
+    get_manifest_path,
+    load_manifest,
+    new_manifest,
+    save_manifest,
+    compute_file_hash,
+    assign_chunk_ids,
+    find_pdf_files,
+)
 from src.exception import CustomException
+from src.utils import iter_batches, get_peak_rss_mb
 from src.logger import get_logger
 from dotenv import load_dotenv
 
@@ -37,21 +69,238 @@ def train_pipeline(pdf_path: str):
         
         vector_store = setup_vector_store(chunks, persist_dir)
         
+        # Step 4: Build the lexical index next to the vector store
+        build_lexical_index_from_vector_store(vector_store, get_lexical_index_dir(persist_dir))
+        
         logger.info("Training pipeline completed successfully.")
     except Exception as e:
         raise CustomException(e, sys) from e
     
+def incremental_train_pipeline(data_dir: str, persist_dir: str, max_workers: int = None, batch_size: int = 64,
+                               embed_batch_size: int = 64, embed_workers: int = 1, shard_by: str = "none") -> dict:
+    """
+    Indexes every PDF under a directory, embedding only new or changed chunks.
+
+    A manifest next to the vector store records the hash of each PDF and the ids
+    of its chunks. Unchanged PDFs are skipped, changed PDFs only embed chunks
+    whose content hash is new, and chunks of removed or edited documents are
+    deleted from the vector store.
+
+    Changed PDFs are parsed across a process pool and their pages are chunked
+    and embedded in batches of batch_size pages, so memory stays flat however
+    large the corpus is.
+
+    With shard_by='directory', each top-level folder of the data directory
+    (e.g. one per brokerage or region) is stored in its own collection with its
+    own lexical index, so queries can be limited to the shards they need.
+
+    Args:
+        data_dir: The directory containing the PDF files to be processed.
+        persist_dir: The directory where the ChromaDB database is saved.
+        max_workers: The number of PDF parsing processes. Defaults to the number of CPUs.
+        batch_size: The number of pages chunked and embedded together.
+        embed_batch_size: The number of chunks per embedding forward pass.
+        embed_workers: The number of embedding worker processes.
+        shard_by: How documents are split into shards, one of SHARD_STRATEGIES.
+
+    Returns:
+        A dictionary with counts of the work done in this run.
+    """
+    if shard_by not in SHARD_STRATEGIES:
+        raise ValueError(f"Unknown sharding strategy '{shard_by}'. Use one of {SHARD_STRATEGIES}.")
+
+    try:
+        logger.info(f"Starting the incremental training pipeline over '{data_dir}'.")
+        stats = {"unchanged": 0, "updated": 0, "removed": 0, "chunks_added": 0, "chunks_deleted": 0}
+
+        manifest_path = get_manifest_path(persist_dir)
+        manifest = load_manifest(manifest_path, MODEL_NAME)
+
+        # One collection per shard, all opened with the same embedding function
+        embeddings = get_embedding_function(persist_dir)
+        vector_stores = {}
+        def get_vector_store(shard: str):
+            if shard not in vector_stores:
+                vector_stores[shard] = load_vector_store(persist_dir, embeddings=embeddings,
+                                                         collection_name=get_collection_name(shard))
+            return vector_stores[shard]
+
+        # Without a manifest, e.g. a store built before it existed or by an older version,
+        # nothing says which chunks are stale, so the store is emptied and rebuilt
+        if not manifest["documents"] and os.path.exists(os.path.join(persist_dir, "chroma.sqlite3")):
+            deleted = clear_vector_store(get_vector_store(DEFAULT_SHARD))
+            if deleted:
+                logger.warning(f"No usable manifest in '{persist_dir}'. Deleted {deleted} chunks to rebuild the index.")
+            stats["chunks_deleted"] += deleted
+
+        previous_shards = {entry.get("shard", DEFAULT_SHARD) for entry in manifest["documents"].values()}
+        changed_shards = set()
+
+        # Vectors from a different embedding model can't be reused, documents can't
+        # move between shards in place, and unchanged files are not re-read when the
+        # attribute extraction changes. A new PDF extractor may find tables the old
+        # one missed in unchanged files. In all these cases start over.
+        previous_shard_by = manifest.get("shard_by", "none")
+        previous_attributes_version = manifest.get("attributes_version")
+        previous_extractor = manifest.get("extractor")
+        extractor = get_extractor_name()
+        if (manifest.get("model_name") != MODEL_NAME or previous_shard_by != shard_by
+                or (manifest["documents"] and previous_attributes_version != ATTRIBUTES_VERSION)
+                or (manifest["documents"] and previous_extractor != extractor)):
+            logger.warning(
+                f"Index settings changed (model '{manifest.get('model_name')}' -> '{MODEL_NAME}', "
+                f"sharding '{previous_shard_by}' -> '{shard_by}', "
+                f"attributes v{previous_attributes_version} -> v{ATTRIBUTES_VERSION}, "
+                f"extractor '{previous_extractor}' -> '{extractor}'). Re-indexing everything."
+            )
+            for entry in manifest["documents"].values():
+                delete_chunks_from_vector_store(get_vector_store(entry.get("shard", DEFAULT_SHARD)), entry["chunk_ids"])
+                stats["chunks_deleted"] += len(entry["chunk_ids"])
+            manifest = new_manifest(MODEL_NAME)
+        manifest["shard_by"] = shard_by
+        manifest["attributes_version"] = ATTRIBUTES_VERSION
+        manifest["extractor"] = extractor
+
+        indexed_documents = manifest["documents"]
+        pdf_files = find_pdf_files(data_dir)
+
+        # Step 1: Drop documents that are no longer in the data directory
+        for relative_path in sorted(set(indexed_documents) - set(pdf_files)):
+            entry = indexed_documents.pop(relative_path)
+            stale_ids = entry["chunk_ids"]
+            delete_chunks_from_vector_store(get_vector_store(entry.get("shard", DEFAULT_SHARD)), stale_ids)
+            changed_shards.add(entry.get("shard", DEFAULT_SHARD))
+            stats["removed"] += 1
+            stats["chunks_deleted"] += len(stale_ids)
+            logger.info(f"Removed '{relative_path}' from the index.")
+
+        # Step 2: Find documents that are new or whose contents changed
+        changed_files = {}
+        for relative_path, pdf_path in pdf_files.items():
+            file_hash = compute_file_hash(pdf_path)
+            entry = indexed_documents.get(relative_path)
+            if entry is not None and entry["file_hash"] == file_hash:
+                stats["unchanged"] += 1
+                continue
+            changed_files[pdf_path] = (relative_path, file_hash)
+        shard_of = {pdf_path: get_shard_name(relative_path, shard_by) for pdf_path, (relative_path, _) in changed_files.items()}
+
+        # Step 3: Stream their pages from the process pool and chunk/embed them in bounded batches
+        old_ids = {
+            pdf_path: set(indexed_documents[relative_path]["chunk_ids"]) if relative_path in indexed_documents else set()
+            for pdf_path, (relative_path, _) in changed_files.items()
+        }
+        seen_ids = {pdf_path: {} for pdf_path in changed_files}
+        page_counts = {pdf_path: 0 for pdf_path in changed_files}
+        relative_paths = {pdf_path: relative_path for pdf_path, (relative_path, _) in changed_files.items()}
+        ingestion_stats = {}
+
+        pages = iter_documents_from_pdfs(list(changed_files), max_workers=max_workers, stats=ingestion_stats,
+                                         page_cache_path=get_page_cache_path(persist_dir))
+        embedding_cache = EmbeddingCache(get_embedding_cache_path(persist_dir))
+        with EmbeddingStage(MODEL_NAME, batch_size=embed_batch_size, num_workers=embed_workers,
+                            cache=embedding_cache) as embedding_stage:
+            for page_batch in iter_batches(pages, batch_size):
+                for page in page_batch:
+                    if not is_table_chunk(page):
+                        page_counts[page.metadata["source"]] += 1
+
+                # Ids hash the manifest key, not the full path, so moving the corpus keeps them stable
+                chunks, chunk_ids = assign_chunk_ids(chunk_documents(page_batch), source_keys=relative_paths)
+                new_chunks = {}
+                for chunk, chunk_id in zip(chunks, chunk_ids):
+                    pdf_path = chunk.metadata["source"]
+                    seen_ids[pdf_path][chunk_id] = None
+                    if chunk_id not in old_ids[pdf_path]:
+                        shard_chunks, shard_ids = new_chunks.setdefault(shard_of[pdf_path], ([], []))
+                        shard_chunks.append(chunk)
+                        shard_ids.append(chunk_id)
+
+                for shard, (shard_chunks, shard_ids) in new_chunks.items():
+                    add_chunks_to_vector_store(get_vector_store(shard), shard_chunks, shard_ids, embedding_stage)
+                    changed_shards.add(shard)
+                    stats["chunks_added"] += len(shard_ids)
+
+        # Step 4: Delete chunks that no longer exist and record the new state of each document.
+        # PDFs that failed to parse keep their previous entry so they are retried next run.
+        for pdf_path, (relative_path, file_hash) in changed_files.items():
+            if page_counts[pdf_path] == 0:
+                continue
+            chunk_ids = list(seen_ids[pdf_path])
+            stale_ids = sorted(old_ids[pdf_path] - set(chunk_ids))
+            delete_chunks_from_vector_store(get_vector_store(shard_of[pdf_path]), stale_ids)
+            if stale_ids:
+                changed_shards.add(shard_of[pdf_path])
+
+            indexed_documents[relative_path] = {
+                "file_hash": file_hash,
+                "shard": shard_of[pdf_path],
+                "pages": page_counts[pdf_path],
+                "chunk_ids": chunk_ids,
+            }
+            stats["updated"] += 1
+            stats["chunks_deleted"] += len(stale_ids)
+            logger.info(f"Indexed '{relative_path}': {len(chunk_ids)} chunks, {len(stale_ids)} stale chunks removed.")
+
+        stats["failed"] = len(ingestion_stats.get("failed", []))
+        stats["pages_per_sec"] = ingestion_stats.get("pages_per_sec")
+        stats["cached_pages"] = ingestion_stats.get("cached_pages", 0)
+        stats["table_chunks"] = ingestion_stats.get("table_chunks", 0)
+        stats["peak_rss_mb"] = get_peak_rss_mb()
+        stats["embedding_cache"] = embedding_cache.stats()
+        embedding_cache.close()
+
+        # Step 5: Rebuild the lexical index of every shard that changed, drop shards
+        # that no longer hold any document, then persist the manifest
+        current_shards = {entry.get("shard", DEFAULT_SHARD) for entry in indexed_documents.values()}
+        for shard in sorted(current_shards):
+            lexical_index_dir = get_shard_lexical_index_dir(persist_dir, shard)
+            if shard in changed_shards or not os.path.exists(lexical_index_dir):
+                build_lexical_index_from_vector_store(get_vector_store(shard), lexical_index_dir)
+        for shard in sorted((previous_shards | changed_shards) - current_shards):
+            if shard != DEFAULT_SHARD:
+                get_vector_store(shard).delete_collection()
+            shutil.rmtree(get_shard_lexical_index_dir(persist_dir, shard), ignore_errors=True)
+            logger.info(f"Shard '{shard}' has no documents left and was removed.")
+        stats["shards"] = sorted(current_shards)
+        save_manifest(manifest_path, manifest)
+
+        logger.info(f"Incremental training pipeline completed successfully: {stats}")
+        logger.info(f"Ingestion throughput: {stats['pages_per_sec']} pages/sec, peak RSS {stats['peak_rss_mb']} MB.")
+        return stats
+    except Exception as e:
+        raise CustomException(e, sys) from e
+
 if __name__ == "__main__":
     # Load environment variables
     load_dotenv()
-    
+
     # Example usage:
     current_dir = os.path.dirname(os.path.abspath(__file__))
     project_root = os.path.join(current_dir, '..', '..')
     # Assuming the PDF is in a 'data' folder at the project root
     sample_pdf = os.path.join(project_root, 'data', 'sample.pdf')
-    
-    if not os.path.exists(sample_pdf):
+
+    parser = argparse.ArgumentParser(description="Build the vector store from real estate documents.")
+    parser.add_argument("--data-dir", help="Index every PDF under this directory incrementally instead of data/sample.pdf.")
+    parser.add_argument("--persist-dir", default=os.path.join(project_root, 'db'), help="Where the vector store is saved.")
+    parser.add_argument("--workers", type=int, default=None, help="Number of PDF parsing processes (defaults to the CPU count).")
+    parser.add_argument("--batch-size", type=int, default=64, help="Number of pages chunked and embedded together.")
+    parser.add_argument("--embed-batch-size", type=int, default=64, help="Number of chunks per embedding forward pass.")
+    parser.add_argument("--embed-workers", type=int, default=1, help="Number of embedding worker processes.")
+    parser.add_argument("--shard-by", choices=SHARD_STRATEGIES, default="none",
+                        help="Split the index into shards, e.g. one per top-level folder of --data-dir.")
+    args = parser.parse_args()
+
+    if args.data_dir:
+        try:
+            stats = incremental_train_pipeline(args.data_dir, args.persist_dir, max_workers=args.workers, batch_size=args.batch_size,
+                                               embed_batch_size=args.embed_batch_size, embed_workers=args.embed_workers,
+                                               shard_by=args.shard_by)
+            print(f"Ingested {stats['updated']} documents at {stats['pages_per_sec']} pages/sec (peak RSS {stats['peak_rss_mb']} MB).")
+        except (CustomException, FileNotFoundError) as e:
+            logger.error(f"Error running incremental training pipeline: {e}")
+    elif not os.path.exists(sample_pdf):
         logger.error(f"Please create a 'data' folder and place a PDF file named 'sample.pdf' inside it. Path: {sample_pdf}")
     else:
         try:
@@ -3,39 +3,211 @@ Common Functions that you will use throughout the project.
 """
 import os
 import sys
-import pickle
-import dill
+import json
+import shutil
+import numpy as np
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional
 from src.exception import CustomException
 
 
-def save_object(filepath: str, obj: object):
+# Bump when the on-disk layout of artifacts changes; older artifacts are then rejected instead of misread
+ARTIFACT_FORMAT_VERSION = 1
+ARTIFACT_HEADER_FILE_NAME = "header.json"
+
+def get_artifacts_dir(persist_directory: str) -> str:
+    """
+    Returns the folder of the derived files of one vector store (lexical index, caches, exports).
+
+    It is 'artifacts/<name of the vector store directory>' next to the vector store,
+    so vector stores that share a parent directory never share derived files.
+
+    Args:
+        persist_directory (str): The directory where the ChromaDB database is saved.
+
+    Returns:
+        str: The path of the artifacts folder.
+    """
+    persist_directory = os.path.abspath(persist_directory)
+    return os.path.join(os.path.dirname(persist_directory), "artifacts", os.path.basename(persist_directory))
+
+def save_strings(path: str, values: List[str]):
+    """
+    Writes strings as one UTF-8 byte array plus an offsets array, both loadable with mmap.
+
+    Args:
+        path (str): The path prefix; '<path>_offsets.npy' and '<path>_bytes.npy' are written.
+        values (List[str]): The strings to write.
+    """
+    encoded = [value.encode("utf-8") for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(value) for value in encoded])
+    np.save(f"{path}_offsets.npy", offsets)
+    np.save(f"{path}_bytes.npy", np.frombuffer(b"".join(encoded), dtype=np.uint8))
+
+def replace_directory(tmp_dir: str, target_dir: str):
     """
-    Saves a Python object to a file.
+    Swaps a fully written temporary directory in place of target_dir.
+
+    A reader never sees a half-written directory: it opens either the old one or
+    the new one. Between the two renames target_dir briefly does not exist, so a
+    reader opening it at that moment gets an error and must retry.
 
     Args:
-        filepath (str): The path where the object should be saved.
-        obj (object): The object to save.
+        tmp_dir (str): The directory holding the new contents.
+        target_dir (str): The directory to replace.
+    """
+    old_dir = f"{target_dir}.old"
+    shutil.rmtree(old_dir, ignore_errors=True)
+    if os.path.exists(target_dir):
+        os.replace(target_dir, old_dir)
+    os.replace(tmp_dir, target_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+def save_artifact(artifact_dir: str, kind: str, arrays: Optional[Dict[str, np.ndarray]] = None,
+                  strings: Optional[Dict[str, List[str]]] = None, metadata: Optional[Dict] = None):
+    """
+    Saves a pipeline artifact, such as a chunk list or an embedding matrix, as a directory of .npy files.
+
+    Nothing is pickled: arrays are saved with allow_pickle=False, strings as UTF-8
+    bytes plus offsets (see save_strings), and metadata as JSON in a versioned
+    header. Loading an artifact therefore never runs code, and its arrays can be
+    memory-mapped by several processes at once.
+
+    Args:
+        artifact_dir (str): The directory to write. An existing one is replaced.
+        kind (str): What the artifact holds, e.g. 'documents'; checked when it is loaded.
+        arrays (Dict[str, np.ndarray]): Numeric arrays by name.
+        strings (Dict[str, List[str]]): String columns by name.
+        metadata (Dict): JSON-serializable values, e.g. a manifest.
     """
     try:
-        dir_path = os.path.dirname(filepath)
-        os.makedirs(dir_path, exist_ok=True)
-        with open(filepath, "wb") as file_obj:
-            dill.dump(obj, file_obj)
+        arrays, strings = arrays or {}, strings or {}
+        tmp_dir = f"{artifact_dir}.tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+
+        header = {
+            "format_version": ARTIFACT_FORMAT_VERSION,
+            "kind": kind,
+            "arrays": {},
+            "strings": {},
+            "metadata": metadata or {},
+        }
+        for name, array in arrays.items():
+            array = np.ascontiguousarray(array)
+            np.save(os.path.join(tmp_dir, f"{name}.npy"), array, allow_pickle=False)
+            header["arrays"][name] = {"dtype": array.dtype.str, "shape": list(array.shape)}
+        for name, values in strings.items():
+            save_strings(os.path.join(tmp_dir, name), values)
+            header["strings"][name] = {"count": len(values)}
+        with open(os.path.join(tmp_dir, ARTIFACT_HEADER_FILE_NAME), "w", encoding="utf-8") as file_obj:
+            json.dump(header, file_obj, indent=2)
+
+        replace_directory(tmp_dir, artifact_dir)
     except Exception as e:
         raise CustomException(e, sys) from e
 
-def load_object(filepath: str) -> object:
+class Artifact:
+    """
+    A pipeline artifact written by save_artifact.
+
+    Opening it only reads the header and maps the arrays; array data and strings
+    are read from disk when they are accessed.
+    """
+    def __init__(self, artifact_dir: str, kind: Optional[str] = None, mmap: bool = True):
+        try:
+            with open(os.path.join(artifact_dir, ARTIFACT_HEADER_FILE_NAME), "r", encoding="utf-8") as file_obj:
+                header = json.load(file_obj)
+            if header.get("format_version") != ARTIFACT_FORMAT_VERSION:
+                raise ValueError(f"Unsupported artifact format version {header.get('format_version')} in '{artifact_dir}'.")
+            if kind is not None and header["kind"] != kind:
+                raise ValueError(f"'{artifact_dir}' holds a '{header['kind']}' artifact, not '{kind}'.")
+
+            self.kind = header["kind"]
+            self.metadata = header["metadata"]
+            mmap_mode = "r" if mmap else None
+            self.arrays = {
+                name: np.load(os.path.join(artifact_dir, f"{name}.npy"), mmap_mode=mmap_mode, allow_pickle=False)
+                for name in header["arrays"]
+            }
+            self._strings = {
+                name: (np.load(os.path.join(artifact_dir, f"{name}_offsets.npy"), mmap_mode=mmap_mode, allow_pickle=False),
+                       np.load(os.path.join(artifact_dir, f"{name}_bytes.npy"), mmap_mode=mmap_mode, allow_pickle=False))
+                for name in header["strings"]
+            }
+        except Exception as e:
+            raise CustomException(e, sys) from e
+
+    def num_strings(self, name: str) -> int:
+        """
+        Returns the number of strings in a string column.
+        """
+        return len(self._strings[name][0]) - 1
+
+    def get_string(self, name: str, row: int) -> str:
+        """
+        Reads one string of a string column.
+        """
+        offsets, data = self._strings[name]
+        return data[offsets[row]:offsets[row + 1]].tobytes().decode("utf-8")
+
+    def get_strings(self, name: str) -> List[str]:
+        """
+        Reads a whole string column.
+        """
+        offsets, data = self._strings[name]
+        data = data.tobytes()
+        return [data[start:end].decode("utf-8") for start, end in zip(offsets[:-1].tolist(), offsets[1:].tolist())]
+
+def load_artifact(artifact_dir: str, kind: Optional[str] = None, mmap: bool = True) -> Artifact:
+    """
+    Opens an artifact written by save_artifact.
+
+    Args:
+        artifact_dir (str): The artifact's directory.
+        kind (str): The kind of artifact expected, if it should be checked.
+        mmap (bool): Whether to memory-map the arrays instead of reading them into memory.
+
+    Returns:
+        Artifact: The opened artifact.
     """
-    Loads a Python object from a file.
+    return Artifact(artifact_dir, kind=kind, mmap=mmap)
+
+def iter_batches(iterable: Iterable, batch_size: int) -> Iterator[List]:
+    """
+    Groups the items of an iterable into lists of at most batch_size items.
 
     Args:
-        filepath (str): The path to the object file.
+        iterable (Iterable): The items to group. It is consumed lazily.
+        batch_size (int): The maximum number of items per batch.
+
+    Yields:
+        List: The next batch of items.
+    """
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
+def get_peak_rss_mb() -> Optional[float]:
+    """
+    Returns the peak resident memory of this process and its finished children in MB.
 
     Returns:
-        object: The loaded Python object.
+        Optional[float]: The peak RSS in MB, or None where the platform does not report it.
     """
     try:
-        with open(filepath, "rb") as file_obj:
-            return pickle.load(file_obj)
-    except Exception as e:
-        raise CustomException(e, sys) from e
\ No newline at end of file
+        import resource
+    except ImportError:
+        return None
+
+    peak = max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    )
+    # ru_maxrss is reported in bytes on macOS and in kilobytes elsewhere
+    divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return round(peak / divisor, 1)
\ No newline at end of file
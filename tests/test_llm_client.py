@@ -0,0 +1,57 @@
+import pytest
+import requests
+from src.components.llm_client import GeminiClient
+from src.components.llm_stub_server import start_stub_server
+
+ANSWER = "Single-family homes are zoned R-1."
+
+@pytest.fixture
+def make_client():
+    servers, clients = [], []
+
+    def make(max_retries: int = 3, **server_options):
+        server, base_url = start_stub_server(answer=ANSWER, **server_options)
+        client = GeminiClient(api_key="stub", base_url=base_url, max_retries=max_retries, backoff_seconds=0.001)
+        servers.append(server)
+        clients.append(client)
+        return client, server
+
+    yield make
+    for client in clients:
+        client.close()
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+def test_generate_returns_answer(make_client):
+    client, server = make_client()
+    assert client.generate("What is the zoning?") == ANSWER
+    assert server.request_count == 1
+
+def test_generate_retries_then_succeeds(make_client):
+    client, server = make_client(max_retries=3, failures=2)
+    assert client.generate("What is the zoning?") == ANSWER
+    assert server.request_count == 3
+
+def test_generate_raises_when_retries_are_exhausted(make_client):
+    client, server = make_client(max_retries=2, failures=5, failure_status=429)
+    with pytest.raises(requests.exceptions.HTTPError):
+        client.generate("What is the zoning?")
+    assert server.request_count == 3
+
+def test_generate_does_not_retry_client_errors(make_client):
+    client, server = make_client(max_retries=3, failures=1, failure_status=400)
+    with pytest.raises(requests.exceptions.HTTPError):
+        client.generate("What is the zoning?")
+    assert server.request_count == 1
+
+def test_stream_yields_answer_in_pieces(make_client):
+    client, server = make_client(chunk_words=2)
+    pieces = list(client.stream("What is the zoning?"))
+    assert len(pieces) == 3
+    assert "".join(pieces).strip() == ANSWER
+
+def test_stream_retries_then_succeeds(make_client):
+    client, server = make_client(max_retries=1, failures=1)
+    assert "".join(client.stream("What is the zoning?")).strip() == ANSWER
+    assert server.request_count == 2